@@ -0,0 +1,6 @@
+"""
+Núcleo de datos del dashboard IMDC.
+
+Este paquete no tiene efectos de UI al importarse (sin st.markdown, sidebar,
+etc.), así que puede usarse desde procesos worker, scripts y herramientas.
+"""
@@ -0,0 +1,99 @@
+"""
+Importaciones diferidas para dependencias pesadas y registro de su costo.
+
+- `diferido("plotly.express")` devuelve un módulo sustituto: el import real
+  ocurre en el primer acceso a un atributo (px.bar, go.Figure, ...), no al
+  importar utils, así que la primera pintura de una página no lo paga.
+- Cada import real (diferido, `importar` o un bloque `medido`) queda en el
+  registro con sus milisegundos; `reporte_imports()` lo muestra en el modo
+  técnico para detectar cuándo algo nuevo empeora el arranque.
+
+Los milisegundos incluyen las dependencias que ese módulo cargó por primera
+vez; lo que ya estaba en sys.modules cuenta como 0 (marcado "ya cargado").
+"""
+from __future__ import annotations
+
+import importlib
+import sys
+import time
+import types
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+_T0 = time.perf_counter()
+_REGISTRO: Dict[str, dict] = {}
+
+
+def registrar_import(nombre: str, inicio: float, ya_cargado: bool = False) -> None:
+    """Anota el import de nombre que empezó en inicio (perf_counter); solo la primera vez cuenta."""
+    fin = time.perf_counter()
+    _REGISTRO.setdefault(nombre, dict(
+        modulo=nombre,
+        ms=0.0 if ya_cargado else (fin - inicio) * 1000,
+        a_los_s=fin - _T0,
+        ya_cargado=ya_cargado,
+    ))
+
+
+def importar(nombre: str) -> types.ModuleType:
+    """importlib.import_module con registro de tiempo."""
+    mod = sys.modules.get(nombre)
+    if mod is not None:
+        if nombre not in _REGISTRO:
+            registrar_import(nombre, time.perf_counter(), ya_cargado=True)
+        return mod
+    inicio = time.perf_counter()
+    mod = importlib.import_module(nombre)
+    registrar_import(nombre, inicio)
+    return mod
+
+
+@contextmanager
+def medido(nombre: str) -> Iterator[None]:
+    """Registra lo que tarda un bloque de imports (p. ej. varios `from reportlab... import`)."""
+    inicio = time.perf_counter()
+    ya_cargado = nombre in sys.modules
+    yield
+    registrar_import(nombre, inicio, ya_cargado=ya_cargado)
+
+
+class ModuloDiferido(types.ModuleType):
+    """Sustituto de un módulo que lo importa en el primer acceso a un atributo."""
+
+    def __init__(self, nombre: str):
+        super().__init__(nombre)
+        self.__dict__["_modulo"] = None
+
+    def _cargar(self) -> types.ModuleType:
+        mod = self.__dict__["_modulo"]
+        if mod is None:
+            mod = self.__dict__["_modulo"] = importar(self.__name__)
+        return mod
+
+    def __getattr__(self, attr: str):
+        return getattr(self._cargar(), attr)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._cargar())
+
+    def __repr__(self) -> str:
+        estado = "cargado" if self.__dict__["_modulo"] is not None else "diferido"
+        return f"<módulo {estado} {self.__name__!r}>"
+
+
+def diferido(nombre: str) -> types.ModuleType:
+    """El módulo si ya está en sys.modules; si no, un ModuloDiferido."""
+    return importar(nombre) if nombre in sys.modules else ModuloDiferido(nombre)
+
+
+def funcion_diferida(modulo: types.ModuleType, nombre: str):
+    """Función que resuelve modulo.nombre recién al llamarla (módulo diferido)."""
+    def _llamar(*args, **kwargs):
+        return getattr(modulo, nombre)(*args, **kwargs)
+    _llamar.__name__ = _llamar.__qualname__ = nombre
+    return _llamar
+
+
+def reporte_imports() -> List[dict]:
+    """Imports registrados, del más lento al más rápido."""
+    return sorted(_REGISTRO.values(), key=lambda r: -r["ms"])
@@ -0,0 +1,38 @@
+"""
+Estructuras derivadas de un DataFrame asociadas por identidad: la tabla de
+particiones, el índice de filtros y el cubo de df_all.
+
+Un solo registro por proceso, id(df) -> (weakref a df, {nombre: valor}). Solo
+vale para ese objeto exacto: una copia o un filtro no heredan nada, y la
+entrada se borra cuando df se libera. Cada valor tiene `filas` (el largo de df
+al construirlo); si df ya no tiene ese largo, no se devuelve.
+"""
+from __future__ import annotations
+
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+_REGISTRO: Dict[int, Tuple[weakref.ref, Dict[str, Any]]] = {}
+
+
+def asociar(df: pd.DataFrame, nombre: str, valor: Any) -> None:
+    """Asocia valor a este DataFrame bajo nombre (reemplaza el anterior con ese nombre)."""
+    clave = id(df)
+    entrada = _REGISTRO.get(clave)
+    if entrada is None or entrada[0]() is not df:
+        entrada = (weakref.ref(df, lambda _r, k=clave: _REGISTRO.pop(k, None)), {})
+        _REGISTRO[clave] = entrada
+    entrada[1][nombre] = valor
+
+
+def asociado(df: pd.DataFrame, nombre: str) -> Optional[Any]:
+    """Valor asociado a df bajo nombre si existe y df no cambió de largo; si no, None."""
+    entrada = _REGISTRO.get(id(df))
+    if entrada is None or entrada[0]() is not df:
+        return None
+    valor = entrada[1].get(nombre)
+    if valor is None or valor.filas != len(df):
+        return None
+    return valor
@@ -0,0 +1,120 @@
+"""
+Benchmark de add_total_alloc: implementación vectorizada vs. la versión con
+groupby("DOC_KEY") (referencia). Verifica igualdad exacta de Total_alloc en
+los dos formatos de origen y mide ambos.
+
+    python -m imdc_core.bench_alloc [--docs 200000] [--lineas 5] [--reps 3]
+
+Formatos:
+  - repetido: Total del documento repetido en cada línea (se prorratea por Sub Total)
+  - linea:    Total ya viene por línea (Total_alloc = Total)
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+from .carga import add_total_alloc, doc_id
+
+
+def _add_total_alloc_referencia(df: pd.DataFrame) -> pd.DataFrame:
+    """Versión anterior (tres groupby por DOC_KEY + map); se conserva solo para comparar."""
+    if df.empty:
+        df["Total_alloc"] = 0.0
+        return df
+
+    if "DOC_KEY" not in df.columns:
+        df["Total_alloc"] = pd.to_numeric(df.get("Total", 0.0), errors="coerce").fillna(0.0)
+        return df
+
+    total_col = "Total"
+    sub_col = "Sub Total"
+    if total_col not in df.columns:
+        df["Total_alloc"] = 0.0
+        return df
+    if sub_col not in df.columns:
+        df[sub_col] = 0.0
+
+    df[total_col] = pd.to_numeric(df[total_col], errors="coerce").fillna(0.0)
+    df[sub_col] = pd.to_numeric(df[sub_col], errors="coerce").fillna(0.0)
+
+    nun = df.groupby("DOC_KEY")[total_col].nunique(dropna=False)
+    rep_share = float((nun == 1).mean()) if len(nun) else 1.0
+
+    if rep_share >= 0.90:
+        total_doc = df.groupby("DOC_KEY")[total_col].first()
+        sub_doc = df.groupby("DOC_KEY")[sub_col].sum().replace(0, np.nan)
+        factor = (total_doc / sub_doc).replace([np.inf, -np.inf], np.nan).fillna(1.0)
+        df["Total_alloc"] = (df[sub_col] * df["DOC_KEY"].map(factor)).astype(float)
+    else:
+        df["Total_alloc"] = df[total_col].astype(float)
+
+    return df
+
+
+def datos_sinteticos(n_docs: int, lineas: int, formato: str, seed: int = 0) -> pd.DataFrame:
+    """Ventas sintéticas con documentos de 1..2*lineas líneas, en orden de archivo (no agrupado)."""
+    rng = np.random.default_rng(seed)
+    largos = rng.integers(1, 2 * lineas, n_docs)
+    doc = np.repeat(np.arange(n_docs), largos)
+    rng.shuffle(doc)  # las líneas de un documento no vienen juntas
+    n = len(doc)
+    sub = np.round(rng.gamma(2.0, 150.0, n), 2)
+    sub[rng.random(n) < 0.02] = 0.0          # líneas en cero (documentos con Sub Total 0)
+    sub[rng.random(n) < 0.01] *= -1          # devoluciones
+    if formato == "repetido":
+        sub_doc = np.bincount(doc, weights=sub, minlength=n_docs)
+        total = np.round(sub_doc * 1.16, 2)[doc]
+    else:
+        total = np.round(sub * 1.16, 2)
+    df = pd.DataFrame({
+        "DOC_KEY": pd.Series(doc).map(lambda d: f"FAC|{d}|ALM{d % 37}|2025-01-01"),
+        "Sub Total": sub,
+        "Total": total,
+    })
+    df["DOC_ID"] = doc_id(df["DOC_KEY"])
+    return df
+
+
+def _medir(fn: Callable[[pd.DataFrame], pd.DataFrame], df: pd.DataFrame, reps: int):
+    mejor, out = float("inf"), None
+    for _ in range(reps):
+        d = df.copy()
+        t0 = time.perf_counter()
+        out = fn(d)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, out["Total_alloc"].to_numpy()
+
+
+def comparar(n_docs: int = 200_000, lineas: int = 5, reps: int = 3) -> Dict[str, dict]:
+    resultados: Dict[str, dict] = {}
+    for formato in ("repetido", "linea"):
+        df = datos_sinteticos(n_docs, lineas, formato)
+        t_ref, ref = _medir(_add_total_alloc_referencia, df, reps)
+        t_new, new = _medir(add_total_alloc, df, reps)
+        # igualdad bit a bit (incluye posiciones NaN)
+        igual = np.array_equal(ref.view(np.int64), new.view(np.int64))
+        resultados[formato] = dict(filas=len(df), igual=igual, referencia_s=t_ref, vectorizado_s=t_new)
+        print(f"{formato:9s} filas={len(df):>10,}  igual={igual}  "
+              f"referencia={t_ref:7.3f}s  vectorizado={t_new:7.3f}s  x{t_ref / max(t_new, 1e-9):.1f}")
+    return resultados
+
+
+def _main() -> None:
+    ap = argparse.ArgumentParser(description="Compara add_total_alloc vectorizado contra la versión groupby.")
+    ap.add_argument("--docs", type=int, default=200_000)
+    ap.add_argument("--lineas", type=int, default=5, help="Líneas promedio por documento.")
+    ap.add_argument("--reps", type=int, default=3)
+    args = ap.parse_args()
+    res = comparar(args.docs, args.lineas, args.reps)
+    if not all(r["igual"] for r in res.values()):
+        raise SystemExit("❌ Total_alloc difiere de la versión de referencia")
+    print("✅ Total_alloc idéntico en ambos formatos")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,649 @@
+"""
+Ingesta de parquets: enriquecido por archivo, particiones incrementales,
+snapshot enriquecido y carga paralela.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .catalogo import (
+    FAMILIA_ID_CANDIDATOS, FAMILIA_NOMBRE_CANDIDATOS,
+    CatalogoFamilias, _cat_familia_path, attach_familia_nombre, catalogo_familias, load_cat_familia,
+)
+from .config import (
+    CACHE_DIR, ENRIQUECIMIENTO_VERSION, INGESTA_WORKERS, MANIFEST_PATH,
+    OUTPUT_DIR, PARQUET_GLOB, PARTICIONES_DIR, PERIODO_DESDE, PERIODO_HASTA,
+)
+from .drive import md5_por_nombre
+from .esquema import aplicar_esquema
+from .ipc import abrir_ipc, escribir_ipc
+from .particionado import (
+    TablaParticiones, _tabla_desde_df, escribir_dataset, leer_dataset,
+    ordenar_para_particion,
+)
+from .texto import _clean_text_series, normalize_almacen
+
+# ------------------------------------------------------------
+# Anti-duplicado / Ventas CON IVA
+# ------------------------------------------------------------
+def _codigos_documento(df: pd.DataFrame) -> Tuple[np.ndarray, int]:
+    """
+    Código entero por fila del documento (DOC_ID si existe, si no DOC_KEY),
+    asignado en orden de primera aparición; -1 = sin llave.
+    """
+    key = df["DOC_ID"] if "DOC_ID" in df.columns else df["DOC_KEY"]
+    codes, uniques = pd.factorize(key)
+    return codes.astype(np.int64, copy=False), len(uniques)
+
+def _primera_fila(codes: np.ndarray) -> np.ndarray:
+    """Posición de la primera fila de cada código (factorize numera por aparición)."""
+    visto = np.maximum.accumulate(codes)
+    return np.flatnonzero(np.diff(np.concatenate(([-1], visto))) > 0)
+
+def _suma_por_codigo(codes: np.ndarray, n: int, valores: np.ndarray) -> np.ndarray:
+    """
+    Suma por código con compensación de Kahan, acumulando en el orden de las
+    filas: bit a bit igual que groupby(...).sum() de pandas. Se recorre por
+    "número de línea dentro del documento", con los documentos ordenados de
+    mayor a menor, así cada nivel es un prefijo y el trabajo total es O(filas).
+    """
+    validos = codes >= 0
+    orden = np.argsort(codes[validos], kind="stable")
+    filas = np.flatnonzero(validos)[orden]
+    cs = codes[filas]
+    if len(cs) == 0:
+        return np.zeros(n)
+    ini = np.flatnonzero(np.concatenate(([True], cs[1:] != cs[:-1])))
+    largo = np.diff(np.concatenate((ini, [len(cs)])))
+    por_largo = np.argsort(-largo, kind="stable")
+    ini, largo, grupo = ini[por_largo], largo[por_largo], cs[ini[por_largo]]
+    vals = valores[filas]
+
+    suma = np.zeros(len(grupo))
+    comp = np.zeros(len(grupo))
+    activos = len(grupo)
+    for r in range(int(largo[0])):
+        while largo[activos - 1] <= r:
+            activos -= 1
+        s, c = suma[:activos], comp[:activos]
+        y = vals[ini[:activos] + r] - c
+        t = s + y
+        c_nueva = (t - s) - y
+        c_nueva[np.isnan(c_nueva)] = 0.0  # ±inf: igual que pandas, no propagar NaN
+        comp[:activos] = c_nueva
+        suma[:activos] = t
+    out = np.zeros(n)
+    out[grupo] = suma
+    return out
+
+def _primero_y_uniforme(codes: np.ndarray, n: int, valores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """first y (nunique(dropna=False) == 1) por código: uniforme <=> todas las filas iguales a la primera."""
+    first = valores[_primera_fila(codes)]
+    validos = codes >= 0
+    c = codes[validos]
+    v, f = valores[validos], first[c]
+    distinto = ~((v == f) | (np.isnan(v) & np.isnan(f)))
+    return first, np.bincount(c[distinto], minlength=n) == 0
+
+def add_total_alloc(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Crea Total_alloc:
+      - Si Total ya viene por línea (NO repetido por doc) -> Total_alloc = Total
+      - Si Total viene repetido por doc -> prorratea vía Sub Total (Factor IVA)
+    Requiere DOC_KEY (o DOC_ID). Agregados por documento en una sola pasada
+    sobre códigos enteros (ver imdc_core.bench_alloc para la equivalencia).
+    """
+    if df.empty:
+        df["Total_alloc"] = 0.0
+        return df
+
+    if "DOC_KEY" not in df.columns and "DOC_ID" not in df.columns:
+        df["Total_alloc"] = pd.to_numeric(df.get("Total", 0.0), errors="coerce").fillna(0.0)
+        return df
+
+    total_col = "Total"
+    sub_col = "Sub Total"
+    if total_col not in df.columns:
+        df["Total_alloc"] = 0.0
+        return df
+    if sub_col not in df.columns:
+        df[sub_col] = 0.0
+
+    df[total_col] = pd.to_numeric(df[total_col], errors="coerce").fillna(0.0)
+    df[sub_col] = pd.to_numeric(df[sub_col], errors="coerce").fillna(0.0)
+
+    # Detecta si Total está repetido por doc
+    codes, n_docs = _codigos_documento(df)
+    total_doc, uniforme = _primero_y_uniforme(codes, n_docs, df[total_col].to_numpy(dtype="float64"))
+    rep_share = float(uniforme.mean()) if n_docs else 1.0
+
+    if rep_share >= 0.90:
+        # Casi todo repetido -> prorratear
+        sub = df[sub_col].to_numpy(dtype="float64")
+        sub_doc = _suma_por_codigo(codes, n_docs, sub)
+        sub_doc[sub_doc == 0] = np.nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            factor = total_doc / sub_doc
+        factor[~np.isfinite(factor)] = 1.0
+        # take por código; filas sin llave -> NaN (como el map anterior)
+        alloc = sub * np.append(factor, np.nan).take(np.where(codes >= 0, codes, len(factor)))
+        df["Total_alloc"] = alloc.astype(float)
+    else:
+        # Total ya viene a nivel línea -> usar directo
+        df["Total_alloc"] = df[total_col].astype(float)
+
+    return df
+
+def doc_id(doc_key: pd.Series) -> pd.Series:
+    """Id entero de transacción a partir de DOC_KEY (hash de 64 bits, determinista)."""
+    return pd.util.hash_pandas_object(doc_key, index=False).astype("int64")
+
+# ------------------------------------------------------------
+# Carga
+# ------------------------------------------------------------
+CSV_USECOLS = [
+    "Año","Mes","Hora",
+    "Almacen","Vendedor","Cliente","Tipo",
+    "Documento",
+    "Familia","Marca",
+    "Cantidad","Costo Entrada",
+    "Sub Total","Total",
+    "Descuento $","Utilidad $",
+    "es_rem","factura_del_dia","nota_facturada","cancelado",
+]
+# Columnas de las que se puede derivar SKU_KEY (la primera que exista)
+SKU_CANDIDATOS = ["Articulo", "Cve_prod", "SKU", "Clave", "Codbar", "Descripcion"]
+# Proyección al leer cada parquet: el resto de columnas nunca se materializa
+COLUMNAS_LECTURA = list(dict.fromkeys(
+    CSV_USECOLS + SKU_CANDIDATOS + FAMILIA_ID_CANDIDATOS + FAMILIA_NOMBRE_CANDIDATOS
+))
+
+def _firma_lectura() -> str:
+    """Ventana de periodos vigente; forma parte de la huella del snapshot y del manifest."""
+    return f"{PERIODO_DESDE}|{PERIODO_HASTA}"
+
+def _filtro_periodo(schema: pa.Schema) -> Optional[ds.Expression]:
+    """
+    Predicado Año/Mes para el scanner de pyarrow (poda row groups por estadísticas).
+    Solo se arma si Año y Mes son enteros en el archivo; si no, el recorte se
+    hace en pandas después de _coerce_base_types.
+    """
+    if PERIODO_DESDE is None and PERIODO_HASTA is None:
+        return None
+    for c in ("Año", "Mes"):
+        if c not in schema.names or not pa.types.is_integer(schema.field(c).type):
+            return None
+    anio, mes = ds.field("Año"), ds.field("Mes")
+    filtro = None
+    if PERIODO_DESDE is not None:
+        a, m = PERIODO_DESDE
+        filtro = (anio >= a) & ((anio > a) | (mes >= m))
+    if PERIODO_HASTA is not None:
+        a, m = PERIODO_HASTA
+        hasta = (anio <= a) & ((anio < a) | (mes <= m))
+        filtro = hasta if filtro is None else (filtro & hasta)
+    return filtro
+
+def _recortar_periodo(df: pd.DataFrame) -> pd.DataFrame:
+    """Mismo recorte que _filtro_periodo, en pandas (archivos con Año/Mes no enteros)."""
+    if (PERIODO_DESDE is None and PERIODO_HASTA is None) or "Año" not in df.columns or "Mes" not in df.columns:
+        return df
+    per = df["Año"].astype("float64") * 12 + df["Mes"].astype("float64")
+    mask = per.notna()
+    if PERIODO_DESDE is not None:
+        mask &= per >= PERIODO_DESDE[0] * 12 + PERIODO_DESDE[1]
+    if PERIODO_HASTA is not None:
+        mask &= per <= PERIODO_HASTA[0] * 12 + PERIODO_HASTA[1]
+    return df if bool(mask.all()) else df.loc[mask].reset_index(drop=True)
+
+def _leer_parquet(fp: Path) -> pd.DataFrame:
+    """Lee solo COLUMNAS_LECTURA y con la ventana Año/Mes empujada al scanner."""
+    dataset = ds.dataset(fp, format="parquet")
+    cols = [c for c in dataset.schema.names if c in COLUMNAS_LECTURA]
+    return dataset.to_table(columns=cols, filter=_filtro_periodo(dataset.schema)).to_pandas()
+
+def _ensure_cols(df: pd.DataFrame) -> pd.DataFrame:
+    # Asegurar columnas clave aunque falten
+    for c in ["Descuento $","Utilidad $","es_rem","factura_del_dia","nota_facturada","cancelado"]:
+        if c not in df.columns:
+            df[c] = 0
+    return df
+
+def _coerce_base_types(df: pd.DataFrame) -> pd.DataFrame:
+    for c in ["Año","Mes"]:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
+    for c in ["Sub Total","Total","Descuento $","Utilidad $"]:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0.0)
+    for c in ["es_rem","factura_del_dia","nota_facturada","cancelado"]:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype(int)
+    return df
+
+def _enriquecer_archivo(fp: Path, cat: Optional[CatalogoFamilias] = None) -> Optional[pd.DataFrame]:
+    """Lee un parquet y lo deja con las columnas derivadas (CANON, Tipo2, DOC_KEY, Total_alloc, familias...)."""
+    try:
+        # leer solo las columnas necesarias (intersección) y la ventana de periodos
+        df = _leer_parquet(fp)
+    except Exception:
+        return None
+    df = _ensure_cols(df)
+    df = _coerce_base_types(df)
+    df = _recortar_periodo(df)
+
+    # Canon almacen
+    if "Almacen" in df.columns:
+        df["Almacen_CANON"] = normalize_almacen(df["Almacen"])
+    else:
+        df["Almacen_CANON"] = ""
+
+    # Tipo2 (CONTADO/CREDITO)
+    if "Tipo" in df.columns:
+        t = df["Tipo"].astype("string").fillna("")
+        df["Tipo2"] = np.where(_clean_text_series(t).str.contains("CRED", na=False), "CREDITO", "CONTADO")
+    else:
+        df["Tipo2"] = "CONTADO"
+
+    # Documento string
+    if "Documento" in df.columns:
+        df["Documento"] = df["Documento"].astype("string").fillna("").str.strip()
+    else:
+        df["Documento"] = ""
+
+    # DOC_KEY real: Año|Mes|Almacen|Documento|Tipo2
+    df["DOC_KEY"] = (
+        df["Año"].astype("string").fillna("") + "|" +
+        df["Mes"].astype("string").fillna("") + "|" +
+        df["Almacen_CANON"].astype("string").fillna("") + "|" +
+        df["Documento"].astype("string").fillna("") + "|" +
+        df["Tipo2"].astype("string").fillna("")
+    )
+    # DOC_ID: hash int64 del DOC_KEY. Es el que se usa para contar transacciones
+    # (nunique sobre int64 en vez de strings); estable entre archivos y cargas.
+    df["DOC_ID"] = doc_id(df["DOC_KEY"])
+
+    # Utilidad (SIN IVA) por línea: preferir "Utilidad $" -> columna "Utilidad"
+    df["Utilidad"] = pd.to_numeric(df.get("Utilidad $", 0.0), errors="coerce").fillna(0.0)
+
+    # Total_alloc (CON IVA) correcto
+    df = add_total_alloc(df)
+
+    # Flags inteligentes si faltan
+    if "es_rem" not in df.columns:
+        df["es_rem"] = 0
+    df["incluye_base"] = 1
+    df["incluye_kpi_rem_on"] = 1
+    df["incluye_kpi_rem_off"] = np.where(df["es_rem"].astype(int) == 1, 0, 1)
+
+    # Catálogo familia
+    df = attach_familia_nombre(df, cat)
+
+    # Marca normalizada texto (display)
+    if "Marca" in df.columns:
+        df["Marca"] = df["Marca"].astype("string").fillna("").str.strip()
+        df["Marca_Nombre"] = df["Marca"].replace("", pd.NA).fillna("SIN MARCA")
+    else:
+        df["Marca_Nombre"] = "SIN MARCA"
+
+    # Vendedor normalizado (display)
+    if "Vendedor" in df.columns:
+        df["Vendedor"] = df["Vendedor"].astype("string").fillna("").str.strip()
+        df["Vendedor_Nombre"] = df["Vendedor"].replace("", pd.NA).fillna("SIN VENDEDOR")
+    else:
+        df["Vendedor_Nombre"] = "SIN VENDEDOR"
+
+    # SKU key (para SKUs por ticket)
+    sku_col = None
+    for cand in SKU_CANDIDATOS:
+        if cand in df.columns:
+            sku_col = cand
+            break
+    if sku_col:
+        df["SKU_KEY"] = df[sku_col].astype("string").fillna("").str.strip()
+        df["SKU_KEY"] = df["SKU_KEY"].replace("", pd.NA)
+    else:
+        df["SKU_KEY"] = pd.NA
+
+    return df
+
+def _huella_entradas(files: List[Path]) -> str:
+    """
+    Huella barata (nombre, tamaño, mtime) de los parquets + catálogo de familias.
+    Si cambia cualquier insumo, cambia la huella y se reconstruye el snapshot.
+    """
+    h = hashlib.sha1(f"v{ENRIQUECIMIENTO_VERSION}|{_firma_lectura()}".encode())
+    cat_fp = _cat_familia_path()
+    for fp in list(files) + ([cat_fp] if cat_fp is not None else []):
+        try:
+            stt = fp.stat()
+        except OSError:
+            continue
+        h.update(f"|{fp.name}|{stt.st_size}|{stt.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+def _firma_catalogo() -> str:
+    fp = _cat_familia_path()
+    if fp is None:
+        return ""
+    stt = fp.stat()
+    return f"{fp.name}|{stt.st_size}|{stt.st_mtime_ns}"
+
+def _md5_archivo(fp: Path, bloque: int = 1 << 20) -> str:
+    h = hashlib.md5()
+    with open(fp, "rb") as f:
+        for chunk in iter(lambda: f.read(bloque), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _escribir_parquet_atomico(df: Union[pd.DataFrame, pa.Table], fp: Path) -> bool:
+    tmp = fp.with_suffix(".tmp")
+    try:
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(df, pa.Table):
+            pq.write_table(df, tmp)
+        else:
+            df.to_parquet(tmp, index=False)
+        os.replace(tmp, fp)
+        return True
+    except Exception as e:
+        # Sin cache en disco solo se pierde velocidad en la próxima carga
+        print(f"⚠️  No se pudo escribir {fp.name}: {e}")
+        tmp.unlink(missing_ok=True)
+        return False
+
+# ------------------------------------------------------------
+# Manifest + particiones enriquecidas por archivo (ingesta incremental)
+# ------------------------------------------------------------
+def _leer_manifest() -> dict:
+    try:
+        m = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return m if isinstance(m, dict) else {}
+
+def _escribir_manifest(manifest: dict) -> None:
+    tmp = MANIFEST_PATH.with_suffix(".tmp")
+    try:
+        MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(manifest, indent=1, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, MANIFEST_PATH)
+    except OSError as e:
+        print(f"⚠️  No se pudo escribir manifest: {e}")
+
+def _leer_particion(fp: Path, entrada: Optional[dict], md5_drive: Optional[str] = None) -> Optional[pa.Table]:
+    """
+    Partición enriquecida vigente para fp (mismo tamaño y mtime, o mismo md5), si existe.
+    md5_drive: md5Checksum de Drive para fp, si la sync lo conoce (evita hashear el archivo).
+    """
+    if not entrada:
+        return None
+    part = PARTICIONES_DIR / entrada.get("particion", "")
+    if not part.is_file():
+        return None
+    stt = fp.stat()
+    if entrada.get("size") != stt.st_size:
+        return None
+    if entrada.get("mtime_ns") != stt.st_mtime_ns and entrada.get("md5") != (md5_drive or _md5_archivo(fp)):
+        return None
+    try:
+        return pq.read_table(part)
+    except Exception:
+        return None
+
+def invalidar_archivos(nombres: List[str]) -> int:
+    """
+    Descarta del manifest (y del disco) las particiones de estos archivos de
+    entrada, p.ej. los que la sync de Drive acaba de bajar o borrar. El resto
+    de particiones y el snapshot de huellas sin cambios siguen vigentes.
+    """
+    manifest = _leer_manifest()
+    archivos = manifest.get("archivos", {})
+    quitadas = 0
+    for nombre in nombres:
+        entrada = archivos.pop(nombre, None)
+        if entrada is None:
+            continue
+        (PARTICIONES_DIR / entrada.get("particion", "")).unlink(missing_ok=True)
+        quitadas += 1
+    if quitadas:
+        _escribir_manifest(manifest)
+    return quitadas
+
+def _nombre_particion(fp: Path, md5: str) -> str:
+    return f"{fp.stem}_{md5[:12]}.parquet"
+
+def _procesar_archivo(fp: str, cat: Optional[CatalogoFamilias], destino: str) -> Optional[Tuple[pa.Table, str]]:
+    """
+    Worker de ingesta (corre en otro proceso): enriquece un parquet, escribe su
+    partición y devuelve (tabla Arrow, md5). Devolver Arrow evita re-serializar
+    el DataFrame con pickle al volver al proceso padre.
+    """
+    fp = Path(fp)
+    df = _enriquecer_archivo(fp, cat)
+    if df is None:
+        return None
+    md5 = _md5_archivo(fp)
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    _escribir_parquet_atomico(tabla, Path(destino) / _nombre_particion(fp, md5))
+    return tabla, md5
+
+def _n_workers(pendientes: int) -> int:
+    n = INGESTA_WORKERS if INGESTA_WORKERS > 0 else (os.cpu_count() or 1)
+    return max(1, min(n, pendientes))
+
+def _procesar_pendientes(pendientes: List[Path]) -> List[Optional[Tuple[pa.Table, str]]]:
+    """Enriquece los archivos pendientes; en paralelo si hay más de uno y más de un worker."""
+    if not pendientes:
+        return []
+    # El catálogo se compila una vez aquí y viaja a los workers (vacío = sin catálogo)
+    cat = catalogo_familias()
+    args = ([str(fp) for fp in pendientes], repeat(cat), repeat(str(PARTICIONES_DIR)))
+
+    n = _n_workers(len(pendientes))
+    if n > 1:
+        try:
+            # spawn: los workers solo importan imdc_core (sin la UI de utils.py)
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=n, mp_context=ctx) as ex:
+                return list(ex.map(_procesar_archivo, *args))
+        except Exception as e:
+            print(f"⚠️  Ingesta paralela no disponible ({e}); se procesa en serie.")
+    return list(map(_procesar_archivo, *args))
+
+def _cargar_incremental(files: List[Path]) -> List[pa.Table]:
+    """
+    Re-enriquece solo los parquets nuevos o modificados (en paralelo, ver
+    INGESTA_WORKERS); el resto se lee de su partición enriquecida. Un cambio de
+    catálogo, de ventana de periodos o de ENRIQUECIMIENTO_VERSION invalida
+    todas las particiones.
+    """
+    manifest = _leer_manifest()
+    firma_cat = _firma_catalogo()
+    vigente = (
+        manifest.get("version") == ENRIQUECIMIENTO_VERSION
+        and manifest.get("catalogo") == firma_cat
+        and manifest.get("lectura") == _firma_lectura()
+    )
+    previas = manifest.get("archivos", {}) if vigente else {}
+
+    md5_drive = md5_por_nombre(OUTPUT_DIR)
+    entradas: Dict[str, dict] = {}
+    tablas: Dict[str, pa.Table] = {}
+    pendientes: List[Path] = []
+    for fp in files:
+        tabla = _leer_particion(fp, previas.get(fp.name), md5_drive.get(fp.name))
+        if tabla is not None:
+            entradas[fp.name] = dict(previas[fp.name], mtime_ns=fp.stat().st_mtime_ns)
+            tablas[fp.name] = tabla
+        else:
+            pendientes.append(fp)
+    reusadas = len(tablas)
+
+    for fp, res in zip(pendientes, _procesar_pendientes(pendientes)):
+        if res is None:
+            continue
+        tabla, md5 = res
+        stt = fp.stat()
+        entradas[fp.name] = dict(
+            size=stt.st_size, mtime_ns=stt.st_mtime_ns, md5=md5,
+            filas=int(tabla.num_rows), particion=_nombre_particion(fp, md5),
+        )
+        tablas[fp.name] = tabla
+
+    # Particiones huérfanas (archivos borrados o reemplazados)
+    vivas = {e["particion"] for e in entradas.values()}
+    if PARTICIONES_DIR.exists():
+        for old in PARTICIONES_DIR.glob("*.parquet"):
+            if old.name not in vivas:
+                old.unlink(missing_ok=True)
+
+    _escribir_manifest(dict(
+        version=ENRIQUECIMIENTO_VERSION,
+        catalogo=firma_cat,
+        lectura=_firma_lectura(),
+        ultima_carga=dict(reusadas=reusadas, enriquecidas=len(tablas) - reusadas),
+        archivos=entradas,
+    ))
+    # Mismo orden que files (el orden de filas de df_all no depende de qué se reusó)
+    return [tablas[fp.name] for fp in files if fp.name in tablas]
+
+def _concatenar(tablas: List[pa.Table]) -> pd.DataFrame:
+    """Concat Arrow (sin copiar buffers) y una sola conversión a pandas."""
+    try:
+        return pa.concat_tables(tablas, promote_options="default").to_pandas()
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Esquemas incompatibles entre archivos (ej. misma columna con tipos distintos)
+        return pd.concat([t.to_pandas() for t in tablas], ignore_index=True)
+
+def _snapshot_path(huella: str) -> Path:
+    """Snapshot enriquecido = dataset hive (ver imdc_core.particionado) por huella."""
+    return CACHE_DIR / f"hive_{huella}"
+
+def _leer_snapshot(huella: str) -> Optional[Tuple[pd.DataFrame, TablaParticiones]]:
+    return leer_dataset(_snapshot_path(huella))
+
+def _escribir_snapshot(df_all: pd.DataFrame, huella: str) -> None:
+    """Escritura atómica del dataset y limpieza de snapshots de huellas anteriores."""
+    destino = _snapshot_path(huella)
+    if not escribir_dataset(df_all, destino, meta=dict(huella=huella)):
+        return
+    for old in CACHE_DIR.glob("hive_*"):
+        if old != destino and old.is_dir():
+            shutil.rmtree(old, ignore_errors=True)
+    # snapshots de un solo archivo (layout anterior)
+    for old in CACHE_DIR.glob("enriquecido_*.parquet"):
+        old.unlink(missing_ok=True)
+
+def _ipc_path(huella: str) -> Path:
+    """df_all listo para mmap (ver imdc_core.ipc), compartido por los procesos del host."""
+    return CACHE_DIR / f"df_all_{huella}.arrow"
+
+def _escribir_ipc(df_all: pd.DataFrame, huella: str) -> None:
+    destino = _ipc_path(huella)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    if not escribir_ipc(df_all, destino):
+        return
+    for old in CACHE_DIR.glob("df_all_*.arrow"):
+        if old != destino:
+            try:
+                old.unlink(missing_ok=True)
+            except OSError:
+                pass  # aún mapeado por otro proceso (Windows)
+
+def _opciones_filtros(df_all: pd.DataFrame) -> Tuple[List[int], List[str], List[str]]:
+    years = sorted(df_all["Año"].dropna().astype(int).unique().tolist()) if "Año" in df_all.columns else []
+    familias = sorted(df_all["Familia_Nombre"].dropna().astype(str).unique().tolist()) if "Familia_Nombre" in df_all.columns else []
+    # Limpieza: evita "basura" numérica en el selector (IDs sin catálogo)
+    familias = [x for x in familias if not re.fullmatch(r"\d+(?:\.0+)?", x.strip())]
+    marcas = sorted(df_all["Marca_Nombre"].dropna().astype(str).unique().tolist()) if "Marca_Nombre" in df_all.columns else []
+    return years, familias, marcas
+
+def _construir_df_all(files: List[Path]) -> pd.DataFrame:
+    """Ingesta incremental + limpieza final; df_all ordenado por partición (Año, Mes, Almacen_CANON)."""
+    tablas = _cargar_incremental(files)
+    if not tablas:
+        return pd.DataFrame()
+
+    df_all = _concatenar(tablas)
+
+    # Limpieza: algunas filas traen "Familia_Nombre" como número (ej. 95, 106.0) por catálogos incompletos.
+    # Para evitar "basura" en filtros/visuales, las marcamos como NA (siguen contando en TODAS, pero no aparecen como opción).
+    fam_num_mask = (
+        df_all["Familia_Nombre"].astype(str).str.strip()
+        .str.fullmatch(r"\d+(?:\.0+)?")
+        .fillna(False)
+    )
+    if fam_num_mask.any():
+        df_all.loc[fam_num_mask, "Familia_Nombre"] = pd.NA
+
+    # Dimensiones como category con categorías de los catálogos (ver imdc_core.esquema)
+    aplicar_esquema(df_all, load_cat_familia())
+    return ordenar_para_particion(df_all)
+
+def huella_actual() -> Optional[str]:
+    """Huella de los parquets de entrada actuales; None si no hay ninguno."""
+    files = sorted(OUTPUT_DIR.glob(PARQUET_GLOB))
+    return _huella_entradas(files) if files else None
+
+def cargar_huella(huella: str) -> Tuple[pd.DataFrame, List[int], List[str], List[str], Optional[TablaParticiones]]:
+    """
+    Dataset para una huella, en orden de preferencia:
+      1. archivo IPC mapeado en memoria (arranque = mmap, compartido entre procesos)
+      2. snapshot hive
+      3. ingesta incremental (solo se re-enriquecen los archivos que cambiaron)
+    Lo que falte (snapshot / IPC) se persiste para la próxima vez.
+    El resultado lo retiene el handle versionado de imdc_core.dataset.
+    """
+    df_all = abrir_ipc(_ipc_path(huella))
+    if df_all is not None and not df_all.empty:
+        # el IPC conserva dtypes y categorías tal como se escribieron
+        particiones = _tabla_desde_df(df_all)
+    else:
+        snap = _leer_snapshot(huella)
+        if snap is not None:
+            df_all, particiones = snap
+            # Almacen_CANON vuelve como texto desde la ruta hive: se re-aplica el esquema
+            aplicar_esquema(df_all, load_cat_familia())
+        else:
+            df_all = _construir_df_all(sorted(OUTPUT_DIR.glob(PARQUET_GLOB)))
+            if df_all.empty:
+                return pd.DataFrame(), [], [], [], None
+            particiones = _tabla_desde_df(df_all)
+            _escribir_snapshot(df_all, huella)
+        _escribir_ipc(df_all, huella)
+
+    years, familias, marcas = _opciones_filtros(df_all)
+    return df_all, years, familias, marcas, particiones
+
+def construir_dataset(destino: Optional[Path] = None) -> Tuple[Path, int]:
+    """
+    Compactación (python -m imdc_core.particionado): reescribe los parquets de
+    entrada en layout hive. Sin destino, escribe el snapshot que usará la app.
+    """
+    files = sorted(OUTPUT_DIR.glob(PARQUET_GLOB))
+    huella = _huella_entradas(files)
+    df_all = _construir_df_all(files)
+    if df_all.empty:
+        raise SystemExit(f"No hay parquets en {OUTPUT_DIR} ({PARQUET_GLOB}).")
+    if destino is None:
+        _escribir_snapshot(df_all, huella)
+        destino = _snapshot_path(huella)
+    else:
+        escribir_dataset(df_all, destino, meta=dict(huella=huella))
+    return destino, int(len(df_all))
@@ -0,0 +1,319 @@
+"""
+Catálogo de familias (Datos.xlsx hoja CAT_FAMILIA o CSV) y mapeo a Familia_Nombre.
+
+El Excel se parsea una sola vez por versión del archivo: el resultado se
+compila a CACHE_DIR/catalogo_<firma>.parquet (firma = nombre, tamaño y mtime
+del origen) y las siguientes cargas leen ese parquet. Para el mapeo ID ->
+nombre se usa CatalogoFamilias (arreglo de códigos sobre categorías), que se
+arma una vez y viaja a los workers de ingesta en lugar del dict por archivo.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .config import CACHE_DIR, DATOS_DIR
+from .texto import _clean_text_scalar, _clean_text_series, _normalize_id_series
+
+# ------------------------------------------------------------
+# Catálogo Familias (Opción B)
+# ------------------------------------------------------------
+def _cat_familia_path() -> Optional[Path]:
+    """Primer catálogo de familias existente en ./Datos (o None)."""
+    candidates = [
+        DATOS_DIR / "Datos.xlsx",          # (build_anual.py) catálogo maestro
+        DATOS_DIR / "datos.xlsx",
+        DATOS_DIR / "CAT_FAMILIA.xlsx",
+        DATOS_DIR / "cat_familia.xlsx",
+        DATOS_DIR / "CAT_FAMILIA.csv",
+        DATOS_DIR / "cat_familia.csv",
+    ]
+    return next((p for p in candidates if p.exists()), None)
+
+def _leer_catalogo_fuente(fp: Path) -> Optional[pd.DataFrame]:
+    """
+    Parsea el catálogo de origen (lento: openpyxl). Soporta:
+    - CAT_FAMILIA.xlsx (hoja CAT_FAMILIA)
+    - CAT_FAMILIA.csv
+    Devuelve DF con columnas: Familia_ID (string), Familia_Nombre (string)
+    """
+    try:
+        if fp.suffix.lower() == ".xlsx":
+            df = pd.read_excel(fp, sheet_name="CAT_FAMILIA")
+        else:
+            df = pd.read_csv(fp, encoding="utf-8", low_memory=False)
+    except Exception:
+        # fallback: primer sheet o lectura simple
+        try:
+            if fp.suffix.lower() == ".xlsx":
+                df = pd.read_excel(fp)
+            else:
+                df = pd.read_csv(fp, low_memory=False)
+        except Exception:
+            return None
+
+    cols = {c: _clean_text_scalar(c) for c in df.columns}
+    df = df.rename(columns={c: cols[c] for c in df.columns})
+
+    # heurística: ID y nombre
+    id_col = None
+    name_col = None
+    for c in df.columns:
+        cc = _clean_text_scalar(c)
+        if cc in ("ID", "IDFAMILIA", "ID FAMILIA", "FAMILIAID", "ID_FAMILIA"):
+            id_col = c
+        if cc in ("FAMILIA", "NOMBRE", "NOMBRE FAMILIA", "DESCRIPCION", "DESC", "DESCFAMILIA", "DESC FAMILIA"):
+            name_col = c
+    # si no detectó, usa 1a y 2a columna si hay al menos 2
+    if id_col is None and len(df.columns) >= 1:
+        id_col = df.columns[0]
+    if name_col is None and len(df.columns) >= 2:
+        name_col = df.columns[1]
+
+    out = pd.DataFrame()
+    out["Familia_ID"] = _normalize_id_series(df[id_col])
+    out["Familia_Nombre"] = df[name_col].astype("string").str.strip()
+    out = out.dropna(subset=["Familia_ID", "Familia_Nombre"])
+    out = out[out["Familia_ID"] != ""]
+    return out
+
+def _firma_fuente(fp: Path) -> str:
+    stt = fp.stat()
+    return hashlib.sha1(f"{fp.name}|{stt.st_size}|{stt.st_mtime_ns}".encode()).hexdigest()[:16]
+
+def _catalogo_binario_path(fp: Path) -> Path:
+    return CACHE_DIR / f"catalogo_{_firma_fuente(fp)}.parquet"
+
+def cargar_catalogo(fp: Optional[Path]) -> Optional[pd.DataFrame]:
+    """
+    Catálogo normalizado de fp, desde el parquet compilado si existe para esta
+    versión del archivo; si no, parsea el origen y deja el parquet (los de
+    versiones anteriores se borran).
+    """
+    if fp is None or not fp.exists():
+        return None
+    binario = _catalogo_binario_path(fp)
+    try:
+        return pq.read_table(binario).to_pandas()
+    except Exception:
+        pass
+
+    out = _leer_catalogo_fuente(fp)
+    if out is None:
+        return None
+    tmp = binario.with_suffix(".tmp")
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(out, preserve_index=False), tmp, compression="zstd")
+        os.replace(tmp, binario)
+        for viejo in CACHE_DIR.glob("catalogo_*.parquet"):
+            if viejo != binario:
+                viejo.unlink(missing_ok=True)
+    except OSError as e:
+        # Sin binario solo se pierde velocidad en la próxima carga
+        print(f"⚠️  No se pudo guardar el catálogo compilado: {e}")
+        tmp.unlink(missing_ok=True)
+    return out
+
+@lru_cache(maxsize=1)
+def _load_cat_familia(firma: str) -> Optional[pd.DataFrame]:
+    return cargar_catalogo(_cat_familia_path())
+
+def load_cat_familia() -> Optional[pd.DataFrame]:
+    """
+    Busca en ./Datos un catálogo de familias (ver _cat_familia_path).
+    Devuelve DF con columnas: Familia_ID (string), Familia_Nombre (string)
+    """
+    fp = _cat_familia_path()
+    if fp is None:
+        return None
+    # la firma (nombre, tamaño, mtime) en la llave invalida la caché si el archivo cambia;
+    # copia para que quien lo use pueda modificarlo sin tocar la entrada
+    cat = _load_cat_familia(_firma_fuente(fp))
+    return None if cat is None else cat.copy()
+
+@dataclass(frozen=True)
+class CatalogoFamilias:
+    """
+    Lookup compilado del catálogo: ids[i] -> categorias[codigos[i]].
+    Resolver una columna de IDs es factorize + get_indexer sobre los únicos +
+    take, sin armar dicts de Python por archivo.
+    """
+    ids: pd.Index
+    codigos: np.ndarray
+    categorias: np.ndarray
+    normas: pd.Index        # nombre normalizado (_clean_text) -> id, para el mapeo inverso
+    ids_por_norma: np.ndarray
+
+    @property
+    def vacio(self) -> bool:
+        return len(self.ids) == 0
+
+    def nombres(self, ids: pd.Series) -> pd.Series:
+        """Familia_Nombre por ID (NA si el ID no está en el catálogo)."""
+        if self.vacio:
+            return pd.Series(pd.NA, index=ids.index, dtype="string")
+        cod, uniq = pd.factorize(ids.astype("string"))
+        pos = self.ids.get_indexer(uniq)
+        nombre_uniq = np.where(pos >= 0, self.categorias[self.codigos[pos]], None)
+        out = np.where(cod >= 0, np.append(nombre_uniq, None)[cod], None)
+        return pd.Series(pd.array(out, dtype="string"), index=ids.index)
+
+    def ids_de_nombres(self, normas: pd.Series) -> pd.Series:
+        """Familia_ID por nombre ya normalizado (NA si no está)."""
+        if self.vacio:
+            return pd.Series(pd.NA, index=normas.index, dtype="string")
+        cod, uniq = pd.factorize(normas.astype("string"))
+        pos = self.normas.get_indexer(uniq)
+        id_uniq = np.where(pos >= 0, self.ids_por_norma[pos], None)
+        out = np.where(cod >= 0, np.append(id_uniq, None)[cod], None)
+        return pd.Series(pd.array(out, dtype="string"), index=normas.index)
+
+def compilar_catalogo(cat: Optional[pd.DataFrame]) -> CatalogoFamilias:
+    """Compila el DataFrame del catálogo (IDs repetidos: gana el último, como un dict)."""
+    if cat is None or cat.empty:
+        vacio = pd.Index([], dtype=object)
+        return CatalogoFamilias(vacio, np.empty(0, dtype=np.int32), np.empty(0, dtype=object),
+                                vacio, np.empty(0, dtype=object))
+    ids = cat["Familia_ID"].astype("string")
+    nombres = cat["Familia_Nombre"].astype("string")
+    ultimo = ~ids.duplicated(keep="last").to_numpy()
+    cats = pd.Categorical(nombres[ultimo])
+    normas = _clean_text_series(cat["Familia_Nombre"]).astype("string")
+    ultima_norma = ~normas.duplicated(keep="last").to_numpy()
+    return CatalogoFamilias(
+        ids=pd.Index(ids[ultimo].to_numpy(dtype=object)),
+        codigos=cats.codes.astype(np.int32),
+        categorias=np.append(cats.categories.to_numpy(dtype=object), None),  # código -1 -> NA
+        normas=pd.Index(normas[ultima_norma].to_numpy(dtype=object)),
+        ids_por_norma=ids[ultima_norma].to_numpy(dtype=object),
+    )
+
+_COMPILADO: dict = {}
+
+def catalogo_familias() -> CatalogoFamilias:
+    """CatalogoFamilias del catálogo actual (compilado una vez por versión del archivo)."""
+    fp = _cat_familia_path()
+    firma = _firma_fuente(fp) if fp is not None else ""
+    if firma not in _COMPILADO:
+        _COMPILADO.clear()
+        _COMPILADO[firma] = compilar_catalogo(cargar_catalogo(fp))
+    return _COMPILADO[firma]
+
+# Columnas de los parquets que pueden traer el ID / nombre de familia (en orden de prioridad)
+FAMILIA_ID_CANDIDATOS = [
+    "ID Familia", "ID_FAMILIA", "ID FAMILIA", "IDFAMILIA",
+    "Familia_ID", "FamiliaID", "Cse_prod",
+]
+FAMILIA_NOMBRE_CANDIDATOS = ["Familia", "Familia_Nombre", "FAMILIA"]
+
+def attach_familia_nombre(df: pd.DataFrame,
+                          cat: Union[CatalogoFamilias, pd.DataFrame, None] = None) -> pd.DataFrame:
+    """
+    Normaliza el tema de Familias para que la web sea robusta ante 2 escenarios:
+
+    ESCENARIO A (antes):
+      - "Familia" trae el ID (ej. 11) o viene vacío y existe algún ID alterno.
+      - Se usa el catálogo (Datos.xlsx hoja CAT_FAMILIA) para obtener el nombre.
+
+    ESCENARIO B (nuevo, tu ajuste en Parquet):
+      - "ID Familia" trae el ID (ej. 11)
+      - "Familia" YA trae el nombre (ej. PINTURA)
+      - En este caso NO debemos tratar "Familia" como ID porque rompe el mapeo y todo cae en OTROS.
+
+    Salida:
+      - Familia_ID (string)
+      - Familia_Nombre (string)
+
+    cat: catálogo ya compilado (los workers de ingesta lo reciben del proceso
+    padre) o su DataFrame; si es None se usa catalogo_familias().
+    """
+    if df is None or df.empty:
+        df["Familia_ID"] = ""
+        df["Familia_Nombre"] = "SIN FAMILIA"
+        return df
+
+    # ------------------------------------------------------------
+    # Detectar columna ID (prioridad alta a "ID Familia")
+    # ------------------------------------------------------------
+    id_col = next((c for c in FAMILIA_ID_CANDIDATOS if c in df.columns), None)
+    name_col = next((c for c in FAMILIA_NOMBRE_CANDIDATOS if c in df.columns), None)
+
+    if cat is None:
+        cat = catalogo_familias()
+    elif isinstance(cat, pd.DataFrame):
+        cat = compilar_catalogo(cat)
+
+    # ------------------------------------------------------------
+    # Helper: decide si una serie "parece ID" (numérica) o "parece nombre"
+    # ------------------------------------------------------------
+    def _is_mostly_numeric_like(s: pd.Series, thr: float = 0.80) -> bool:
+        ss = s.astype("string").fillna("").str.strip()
+        nn = ss.replace("", pd.NA).dropna()
+        if len(nn) == 0:
+            return False
+        numlike = nn.str.fullmatch(r"\d+(?:\.0+)?").fillna(False)
+        return float(numlike.mean()) >= float(thr)
+
+    # ------------------------------------------------------------
+    # Caso 1: tenemos ID explícito ("ID Familia", etc.)
+    # ------------------------------------------------------------
+    if id_col is not None:
+        df["Familia_ID"] = _normalize_id_series(df[id_col])
+
+        # Si además existe una columna de nombre ("Familia") y NO parece ID, úsala tal cual.
+        if name_col is not None and name_col != id_col and not _is_mostly_numeric_like(df[name_col]):
+            df["Familia_Nombre"] = df[name_col].astype("string").fillna("").str.strip()
+            df["Familia_Nombre"] = df["Familia_Nombre"].replace("", pd.NA).fillna("SIN FAMILIA")
+            return df
+
+        # Si no, intenta mapear por catálogo
+        if cat.vacio:
+            df["Familia_Nombre"] = df["Familia_ID"].replace("", pd.NA).fillna("SIN FAMILIA")
+            return df
+
+        df["Familia_Nombre"] = cat.nombres(df["Familia_ID"]).fillna("OTROS")
+        df.loc[df["Familia_ID"].eq(""), "Familia_Nombre"] = "SIN FAMILIA"
+        return df
+
+    # ------------------------------------------------------------
+    # Caso 2: NO hay ID explícito. Usa "Familia" como:
+    #   - ID si parece numérica
+    #   - nombre si parece texto
+    # ------------------------------------------------------------
+    if name_col is None:
+        df["Familia_ID"] = ""
+        df["Familia_Nombre"] = "SIN FAMILIA"
+        return df
+
+    if _is_mostly_numeric_like(df[name_col]):
+        # Trata "Familia" como ID
+        df["Familia_ID"] = _normalize_id_series(df[name_col])
+        if cat.vacio:
+            df["Familia_Nombre"] = df["Familia_ID"].replace("", pd.NA).fillna("SIN FAMILIA")
+            return df
+        df["Familia_Nombre"] = cat.nombres(df["Familia_ID"]).fillna("OTROS")
+        df.loc[df["Familia_ID"].eq(""), "Familia_Nombre"] = "SIN FAMILIA"
+        return df
+
+    # Trata "Familia" como NOMBRE
+    df["Familia_Nombre"] = df[name_col].astype("string").fillna("").str.strip()
+    df["Familia_Nombre"] = df["Familia_Nombre"].replace("", pd.NA).fillna("SIN FAMILIA")
+
+    # Opcional: si existe catálogo, intenta derivar Familia_ID por nombre (reverse map)
+    if not cat.vacio:
+        # normaliza nombre para matching robusto
+        df["Familia_ID"] = cat.ids_de_nombres(_clean_text_series(df["Familia_Nombre"])).fillna("")
+    else:
+        df["Familia_ID"] = ""
+
+    return df
@@ -0,0 +1,61 @@
+"""
+Rutas y constantes de datos del dashboard (sin dependencias de UI).
+"""
+from __future__ import annotations
+
+import os
+from datetime import date
+from pathlib import Path
+from typing import Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+_cloud_data_dir = os.environ.get("IMDC_DATA_DIR", "")
+OUTPUT_DIR = Path(_cloud_data_dir) if _cloud_data_dir and Path(_cloud_data_dir).exists() else BASE_DIR / "output"
+DATOS_DIR = BASE_DIR / "Datos"
+PARQUET_GLOB = "*.parquet"
+
+CATALOGO_SUCURSALES = [
+    "CONSOLIDADO",
+    "GENERAL",
+    "EXPRESS",
+    "SAN AGUST",
+    "ADELITAS",
+    "H ILUSTRES",
+]
+# Snapshot enriquecido (junto a OUTPUT_DIR): evita re-normalizar en cada cold start
+_cache_dir_env = os.environ.get("IMDC_CACHE_DIR", "")
+CACHE_DIR = Path(_cache_dir_env) if _cache_dir_env else OUTPUT_DIR.parent / f"{OUTPUT_DIR.name}_enriquecido"
+MANIFEST_PATH = CACHE_DIR / "manifest.json"
+PARTICIONES_DIR = CACHE_DIR / "particiones"
+# Subir cuando cambie la lógica de enriquecimiento (invalida snapshots y particiones viejas)
+ENRIQUECIMIENTO_VERSION = 3
+# Procesos para enriquecer parquets en paralelo (0 = uno por núcleo, 1 = serial)
+INGESTA_WORKERS = int(os.environ.get("IMDC_INGEST_WORKERS", "0") or 0)
+
+def _periodo_env(nombre: str, mes_default: int) -> Optional[Tuple[int, int]]:
+    """Lee "AAAA" o "AAAA-MM" de la variable de entorno -> (año, mes); vacío o inválido -> None."""
+    v = os.environ.get(nombre, "").strip()
+    if not v:
+        return None
+    try:
+        partes = v.replace("/", "-").split("-")
+        anio = int(partes[0])
+        mes = int(partes[1]) if len(partes) > 1 and partes[1] else mes_default
+    except ValueError:
+        print(f"⚠️  {nombre}={v!r} no es AAAA ni AAAA-MM; se ignora.")
+        return None
+    return anio, min(max(mes, 1), 12)
+
+# Ventana de periodos a cargar (se empuja al scanner de pyarrow, no se leen row groups fuera).
+# IMDC_PERIODO_DESDE / IMDC_PERIODO_HASTA = "AAAA" o "AAAA-MM"; IMDC_ULTIMOS_ANIOS=N equivale a
+# DESDE = año actual - N + 1. Sin variables se carga todo.
+PERIODO_DESDE = _periodo_env("IMDC_PERIODO_DESDE", 1)
+PERIODO_HASTA = _periodo_env("IMDC_PERIODO_HASTA", 12)
+_ultimos_anios = int(os.environ.get("IMDC_ULTIMOS_ANIOS", "0") or 0)
+if PERIODO_DESDE is None and _ultimos_anios > 0:
+    PERIODO_DESDE = (date.today().year - _ultimos_anios + 1, 1)
+# Transacciones / SKUs distintos del cubo: 0 = conteo exacto; > 0 = HyperLogLog con ese
+# error relativo aproximado (ej. 0.01), para datasets donde los conjuntos exactos no caben
+DISTINTOS_ERROR = float(os.environ.get("IMDC_DISTINTOS_ERROR", "0") or 0)
+# Cada cuántos segundos el hilo de refresco revisa Drive / parquets (0 = sin hilo)
+REFRESCO_SEG = float(os.environ.get("IMDC_REFRESCO_SEG", "900") or 0)
@@ -0,0 +1,58 @@
+"""
+Caché de consultas por firma: (versión del dataset, nombre, filtros).
+
+st.cache_data con DataFrames como argumento tiene que hashear el contenido
+completo en cada llamada solo para armar la clave, casi lo mismo que calcular
+el KPI. Aquí la clave es la firma de la consulta: la versión identifica los
+datos (imdc_core.dataset publica una versión nueva en cada recarga) y los
+filtros + opciones son un dataclass congelado. Un acierto es una búsqueda en
+un dict, sin importar el tamaño de df_all.
+
+Compartida por todas las sesiones del proceso; se guardan resultados chicos
+(KPIs, resúmenes mensuales) y se devuelve una copia para que quien la use
+pueda modificarla sin tocar la entrada.
+"""
+from __future__ import annotations
+
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Tuple
+
+MAX_CONSULTAS = int(os.environ.get("IMDC_MAX_CONSULTAS", "512") or 512)
+
+
+class CacheConsultas:
+    """LRU firma -> resultado, segura entre hilos (sesiones de Streamlit)."""
+
+    def __init__(self, max_entradas: int = MAX_CONSULTAS):
+        self.max_entradas = max_entradas
+        self._datos: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, firma: Hashable, calcular: Callable[[], object]):
+        with self._lock:
+            if firma in self._datos:
+                self._datos.move_to_end(firma)
+                self.aciertos += 1
+                return copy.copy(self._datos[firma])
+            self.fallos += 1
+        # se calcula fuera del lock: dos sesiones con la misma firma pueden calcularla a la vez
+        valor = calcular()
+        with self._lock:
+            self._datos[firma] = valor
+            self._datos.move_to_end(firma)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+        return copy.copy(valor)
+
+    def estadisticas(self) -> Tuple[int, int, int]:
+        """(entradas, aciertos, fallos)."""
+        with self._lock:
+            return len(self._datos), self.aciertos, self.fallos
+
+
+CONSULTAS = CacheConsultas()
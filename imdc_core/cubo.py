@@ -0,0 +1,204 @@
+"""
+Cubo pre-agregado de df_all para KPIs, resúmenes mensuales y desgloses.
+
+Una celda por combinación presente de DIMENSIONES con la suma de MEDIDAS y el
+número de líneas. Se arma una vez por versión del dataset (imdc_core.dataset),
+así que cada vista suma unos cientos de miles de celdas en vez de millones de
+líneas.
+
+- Las celdas quedan ordenadas por periodo (Año*12 + Mes), igual que df_all:
+  una ventana de meses es un tramo contiguo de celdas (searchsorted).
+- Los conteos distintos no se pueden sumar entre celdas (un documento tiene
+  líneas de varias familias). Para transacciones (DOC_ID) y SKUs cada celda
+  guarda su conjunto de valores (imdc_core.distintos): exacto o HyperLogLog
+  según config.DISTINTOS_ERROR, y una consulta une los de sus celdas.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .asociados import asociado, asociar
+from .config import DISTINTOS_ERROR
+from .distintos import Conjuntos, _contar_pares, conjuntos_por_celda
+
+DIMENSIONES = ["Año", "Mes", "Almacen_CANON", "Familia_Nombre", "Marca_Nombre", "Vendedor_Nombre", "Tipo2", "es_rem"]
+MEDIDAS = ["Total_alloc", "Sub Total", "Utilidad", "Descuento $"]
+LINEAS_DISTINTAS = ["DOC_ID", "SKU_KEY"]
+
+_SIN_PERIODO = np.iinfo(np.int64).max
+
+
+@dataclass(frozen=True)
+class Cubo:
+    valores: Dict[str, pd.Index]         # valores de cada dimensión (código = posición)
+    tipos: Dict[str, object]             # dtype de la columna en df_all
+    codigos: Dict[str, np.ndarray]       # código por celda; len(valores[d]) = nulo
+    periodo: np.ndarray                  # Año*12 + Mes por celda
+    medidas: Dict[str, np.ndarray]       # suma por celda, más "Lineas"
+    distintos: Dict[str, Conjuntos]      # DOC_ID / SKU_KEY distintos de cada celda
+    filas: int
+    ordenado: bool = True                # periodo no decreciente (ver TablaParticiones.ordenada)
+
+    @property
+    def n_celdas(self) -> int:
+        return len(self.periodo)
+
+    # --------------------------------------------------------
+    # Selección de celdas
+    # --------------------------------------------------------
+    def celdas(self, p_ini: int, p_fin: int,
+               igual: Optional[Dict[str, object]] = None,
+               excluir: Optional[Dict[str, Callable[[pd.Series], np.ndarray]]] = None) -> np.ndarray:
+        """
+        Celdas con periodo entre p_ini y p_fin, dimensión == valor para cada
+        entrada de igual, y sin los valores para los que excluir[dim](valores)
+        es True (los nulos nunca se excluyen).
+        """
+        if self.ordenado:
+            i = int(np.searchsorted(self.periodo, p_ini, side="left"))
+            j = int(np.searchsorted(self.periodo, p_fin, side="right"))
+            sel = np.arange(i, max(i, j), dtype=np.int64)
+        else:
+            sel = np.flatnonzero((self.periodo >= p_ini) & (self.periodo <= p_fin))
+        for dim, valor in (igual or {}).items():
+            sel = self.donde(sel, dim, valor)
+        for dim, predicado in (excluir or {}).items():
+            quitar = np.append(np.asarray(predicado(self.serie_valores(dim)), dtype=bool), False)
+            sel = sel[~quitar[self.codigos[dim][sel]]]
+        return sel
+
+    def donde(self, celdas: np.ndarray, dim: str, valor) -> np.ndarray:
+        """Las celdas con dim == valor."""
+        k = int(self.valores[dim].get_indexer([valor])[0])
+        if k < 0:
+            return celdas[:0]
+        return celdas[self.codigos[dim][celdas] == k]
+
+    def serie_valores(self, dim: str) -> pd.Series:
+        """Los valores de dim como Series con el dtype de df_all (posición = código)."""
+        v = self.valores[dim]
+        if isinstance(self.tipos[dim], pd.CategoricalDtype):
+            return pd.Series(pd.Categorical.from_codes(np.arange(len(v)), dtype=self.tipos[dim]))
+        return pd.Series(v)
+
+    # --------------------------------------------------------
+    # Agregación
+    # --------------------------------------------------------
+    def _grupos(self, celdas: np.ndarray, por: List[str]) -> Tuple[np.ndarray, np.ndarray, int, List[np.ndarray]]:
+        """(celdas sin nulos en por, grupo de cada una, n grupos, códigos de cada grupo por dimensión)."""
+        if not por:
+            return celdas, np.zeros(len(celdas), dtype=np.int64), int(len(celdas) > 0), []
+        cods = [self.codigos[d][celdas] for d in por]
+        # como groupby(dropna=True): fuera las celdas con nulo en alguna dimensión del grupo
+        ok = np.ones(len(celdas), dtype=bool)
+        for d, c in zip(por, cods):
+            ok &= c < len(self.valores[d])
+        celdas, cods = celdas[ok], [c[ok] for c in cods]
+        clave = np.zeros(len(celdas), dtype=np.int64)
+        for d, c in zip(por, cods):
+            clave = clave * len(self.valores[d]) + c
+        unicas, grupo = np.unique(clave, return_inverse=True)
+        cods_grupo = []
+        for d in reversed(por):
+            cods_grupo.insert(0, unicas % len(self.valores[d]))
+            unicas = unicas // len(self.valores[d])
+        return celdas, grupo.astype(np.int64), len(cods_grupo[0]), cods_grupo
+
+    def _columna(self, dim: str, cods: np.ndarray):
+        if isinstance(self.tipos[dim], pd.CategoricalDtype):
+            return pd.Categorical.from_codes(cods, dtype=self.tipos[dim])
+        return self.valores[dim].take(cods)
+
+    def agregar(self, celdas: np.ndarray, por: List[str],
+                lineas_distintas: Optional[Dict[str, str]] = None,
+                dims_distintas: Optional[Dict[str, Tuple[str, np.ndarray]]] = None) -> pd.DataFrame:
+        """
+        Como df.groupby(por, observed=True) sobre las líneas de las celdas: una
+        fila por grupo (ordenado) con las MEDIDAS sumadas y "Lineas".
+        lineas_distintas = {salida: "DOC_ID" | "SKU_KEY"} agrega conteos distintos;
+        dims_distintas = {salida: (dim, canon)} cuenta valores distintos de canon[código de dim]
+        (canon < 0 = no cuenta), p. ej. vendedores con nombre limpio.
+        """
+        celdas, grupo, n, cods_grupo = self._grupos(np.asarray(celdas, dtype=np.int64), por)
+        out = pd.DataFrame({d: self._columna(d, c) for d, c in zip(por, cods_grupo)})
+        for m in MEDIDAS:
+            # astype: sin celdas bincount devuelve int64
+            out[m] = np.bincount(grupo, weights=self.medidas[m][celdas], minlength=n).astype("float64")
+        out["Lineas"] = np.bincount(grupo, weights=self.medidas["Lineas"][celdas], minlength=n).astype(np.int64)
+        for salida, columna in (lineas_distintas or {}).items():
+            out[salida] = self.distintos[columna].contar(celdas, grupo, n)
+        for salida, (dim, canon) in (dims_distintas or {}).items():
+            v = np.append(canon, -1)[self.codigos[dim][celdas]]
+            ok = v >= 0
+            out[salida] = _contar_pares(grupo[ok], v[ok], n)
+        return out
+
+
+def construir_cubo(df: pd.DataFrame, error_distintos: float = DISTINTOS_ERROR) -> Optional[Cubo]:
+    """
+    Cubo de df (ya ordenado por periodo); None si está vacío o le faltan columnas.
+    error_distintos > 0 = transacciones / SKUs con HyperLogLog de ese error relativo.
+    """
+    if df.empty or any(c not in df.columns for c in DIMENSIONES + MEDIDAS + ["DOC_ID"]):
+        return None
+    valores, tipos, cods = {}, {}, {}
+    clave = np.zeros(len(df), dtype=np.int64)
+    radix = 1
+    for d in DIMENSIONES:
+        # es_rem se filtra como entero (mismo criterio que astype(int) == 0)
+        s = df[d].astype(int) if d == "es_rem" else df[d]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            c, v = s.cat.codes.to_numpy().astype(np.int64), s.cat.categories
+        else:
+            c, v = pd.factorize(s, sort=True)
+            v = pd.Index(v)
+        c = np.where(c < 0, len(v), c)  # nulo = último código: queda al final del orden
+        valores[d], tipos[d], cods[d] = v, s.dtype, c
+        clave = clave * (len(v) + 1) + c
+        radix *= len(v) + 1
+    if radix >= 2**62:
+        # demasiadas combinaciones para una clave entera: se numeran con groupby
+        clave = pd.DataFrame(cods).groupby(DIMENSIONES, sort=True).ngroup().to_numpy()
+    celda = pd.factorize(clave, sort=True)[0]
+    n_celdas = int(celda.max()) + 1
+    lineas = np.bincount(celda, minlength=n_celdas)
+    # una línea cualquiera de cada celda: todas tienen los mismos códigos de dimensión
+    una = np.empty(n_celdas, dtype=np.int64)
+    una[celda] = np.arange(len(df))
+
+    codigos = {d: cods[d][una] for d in DIMENSIONES}
+    anio = np.append(valores["Año"].to_numpy(dtype="float64", na_value=np.nan), np.nan)[codigos["Año"]]
+    mes = np.append(valores["Mes"].to_numpy(dtype="float64", na_value=np.nan), np.nan)[codigos["Mes"]]
+    periodo = np.full(n_celdas, _SIN_PERIODO, dtype=np.int64)
+    con_fecha = ~(np.isnan(anio) | np.isnan(mes))
+    periodo[con_fecha] = (anio[con_fecha] * 12 + mes[con_fecha]).astype(np.int64)
+
+    medidas = {
+        # NaN cuenta como 0, igual que sum() de pandas
+        m: np.bincount(celda, weights=np.nan_to_num(df[m].to_numpy(dtype="float64", na_value=np.nan)), minlength=n_celdas)
+        for m in MEDIDAS
+    }
+    medidas["Lineas"] = lineas.astype("float64")
+    distintos = {}
+    for c in LINEAS_DISTINTAS:
+        cod = pd.factorize(df[c])[0] if c in df.columns else np.full(len(df), -1)
+        distintos[c] = conjuntos_por_celda(celda, cod, n_celdas, error_distintos)
+    return Cubo(valores, tipos, codigos, periodo, medidas, distintos, len(df),
+                ordenado=bool((np.diff(periodo) >= 0).all()))
+
+
+# ------------------------------------------------------------
+# Registro df -> Cubo (imdc_core.asociados)
+# ------------------------------------------------------------
+def registrar_cubo(df: pd.DataFrame, cubo: Cubo) -> None:
+    """Asocia el cubo a este DataFrame (por identidad; copias no lo heredan)."""
+    asociar(df, "cubo", cubo)
+
+
+def cubo_de(df: pd.DataFrame) -> Optional[Cubo]:
+    """Cubo de df si fue registrado y no cambió de largo; si no, None."""
+    return asociado(df, "cubo")
@@ -0,0 +1,231 @@
+"""
+Handle versionado del dataset en memoria y refresco en segundo plano.
+
+Todas las sesiones leen el mismo `Dataset` (df_all + opciones de filtros +
+tabla de particiones, índice y cubo). Un hilo `Refrescador` sincroniza (Drive), detecta si
+cambió la huella de los parquets y, si cambió, arma la versión nueva mientras
+los usuarios siguen consultando la anterior; al terminar la publica con un
+swap atómico del handle. Ninguna sesión ve un rerun en blanco durante el refresco.
+
+El handle vive en el módulo (uno por proceso): las sesiones guardan solo la
+referencia, no una copia. Para que nadie lo modifique sin querer, df_all es un
+DataFrameCompartido: las altas/bajas/reasignaciones de columnas, las asignaciones
+por .loc/.iloc/.at/.iat y los `inplace=True` lanzan MutacionDataset, y los
+buffers numéricos son de solo lectura. Todo lo que se deriva de él (filtros,
+copy, groupby, concat, merge) es un DataFrame normal.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .carga import cargar_huella, huella_actual
+from .config import REFRESCO_SEG
+from .cubo import construir_cubo, registrar_cubo
+from .indice import construir_indice, registrar_indice
+from .particionado import TablaParticiones, registrar_particiones
+
+
+class MutacionDataset(RuntimeError):
+    """Intento de modificar el df_all compartido entre sesiones."""
+
+
+def _rechazar(*_a, **_kw):
+    raise MutacionDataset(
+        "df_all es compartido entre sesiones y de solo lectura; "
+        "trabaja sobre una copia (df.copy()) o un filtro."
+    )
+
+
+# Indexadores de pandas (loc, iloc, at, iat) con la asignación bloqueada; la lectura no cambia
+_INDEXADORES = {
+    nombre: type(f"_{nombre.capitalize()}SoloLectura", (type(getattr(pd.DataFrame(), nombre)),),
+                 {"__setitem__": _rechazar})
+    for nombre in ("loc", "iloc", "at", "iat")
+}
+
+
+class DataFrameCompartido(pd.DataFrame):
+    """DataFrame de solo lectura; sus derivados vuelven a ser pd.DataFrame."""
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    loc = property(lambda self: _INDEXADORES["loc"]("loc", self))
+    iloc = property(lambda self: _INDEXADORES["iloc"]("iloc", self))
+    at = property(lambda self: _INDEXADORES["at"]("at", self))
+    iat = property(lambda self: _INDEXADORES["iat"]("iat", self))
+
+    __setitem__ = _rechazar
+    __delitem__ = _rechazar
+    insert = _rechazar
+    pop = _rechazar
+    _update_inplace = _rechazar  # drop/rename/fillna/... con inplace=True
+
+
+def _congelar_buffer(buf) -> None:
+    # Los buffers de objetos (object, string[python]) quedan escribibles: las rutinas
+    # Cython de pandas (concat, merge, memory_usage) piden memoryviews escribibles
+    # sobre ellos aunque solo lean. Los protege el bloqueo de .loc/.iloc/.at/.iat.
+    if isinstance(buf, np.ndarray) and buf.dtype != object:
+        buf.flags.writeable = False
+
+
+def _congelar_arreglo(arr) -> None:
+    if isinstance(arr, np.ndarray):
+        _congelar_buffer(arr)
+        return
+    # arreglos de extensión: Categorical, StringArray, Int64 (datos + máscara)
+    for attr in ("_codes", "_ndarray", "_data", "_mask"):
+        _congelar_buffer(getattr(arr, attr, None))
+
+
+def congelar(df: pd.DataFrame) -> DataFrameCompartido:
+    """Envuelve df sin copiar y marca sus buffers numéricos como solo lectura."""
+    for arr in df._mgr.arrays:
+        _congelar_arreglo(arr)
+    return DataFrameCompartido(df)
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """Versión inmutable de los datos; se reemplaza completa, nunca se modifica."""
+    version: int
+    huella: Optional[str]
+    df_all: pd.DataFrame
+    years: List[int]
+    familias: List[str]
+    marcas: List[str]
+    particiones: Optional[TablaParticiones] = None
+    cargado: float = field(default_factory=time.time)
+
+
+_LOCK = threading.Lock()          # serializa construcciones (carga inicial / refresco)
+_LOCK_HILO = threading.Lock()
+_ACTUAL: Optional[Dataset] = None
+_REFRESCADOR: Optional["Refrescador"] = None
+
+
+def _construir(huella: Optional[str], version: int) -> Dataset:
+    if huella is None:
+        return Dataset(version, None, congelar(pd.DataFrame()), [], [], [])
+    df_all, years, familias, marcas, particiones = cargar_huella(huella)
+    df_all = congelar(df_all)
+    if particiones is not None:
+        registrar_particiones(df_all, particiones)
+        registrar_indice(df_all, construir_indice(df_all))
+        cubo = construir_cubo(df_all)
+        if cubo is not None:
+            registrar_cubo(df_all, cubo)
+    return Dataset(version, huella, df_all, years, familias, marcas, particiones)
+
+
+def _publicar(nuevo: Dataset) -> None:
+    global _ACTUAL
+    _ACTUAL = nuevo  # swap atómico: cada lector ve la versión vieja o la nueva, completa
+
+
+def recargar(forzar: bool = False) -> Dataset:
+    """
+    Construye y publica una versión nueva si cambió la huella de los parquets
+    (o si forzar). Si otra recarga está en curso, espera y reutiliza su resultado.
+    """
+    with _LOCK:
+        actual = _ACTUAL
+        huella = huella_actual()
+        if actual is not None and not forzar and actual.huella == huella:
+            return actual
+        nuevo = _construir(huella, (actual.version + 1) if actual is not None else 1)
+        _publicar(nuevo)
+        return nuevo
+
+
+def dataset_actual() -> Dataset:
+    """
+    Versión vigente. Sin refrescador activo se revisa la huella en cada llamada
+    (stat de los parquets) para no servir datos viejos; con refrescador, el hilo
+    se encarga y aquí solo se lee el handle.
+    """
+    actual = _ACTUAL
+    if actual is None or _REFRESCADOR is None or not _REFRESCADOR.is_alive():
+        return recargar()
+    return actual
+
+
+def load_all() -> Tuple[pd.DataFrame, List[int], List[str], List[str]]:
+    """
+    Lee todos los parquets en ./output/cedro_*.parquet
+    Devuelve: df_all, years, familias (display), marcas
+
+    El enriquecido se persiste como snapshot en CACHE_DIR; mientras la huella
+    de los insumos no cambie, el cold start solo lee ese snapshot. df_all es
+    compartido entre sesiones (solo lectura).
+    """
+    ds = dataset_actual()
+    return ds.df_all, ds.years, ds.familias, ds.marcas
+
+
+# ------------------------------------------------------------
+# Refresco en segundo plano
+# ------------------------------------------------------------
+class Refrescador(threading.Thread):
+    """Cada `intervalo` s (o al pedirlo): sincroniza y, si hay cambios, publica una versión nueva."""
+
+    def __init__(self, sincronizar: Optional[Callable[[], None]] = None, intervalo: float = REFRESCO_SEG):
+        super().__init__(name="imdc-refresco", daemon=True)
+        self.sincronizar = sincronizar
+        self.intervalo = intervalo
+        self.ultimo_error: Optional[str] = None
+        self.ultima_revision: Optional[float] = None
+        self._despertar = threading.Event()
+
+    def pedir_refresco(self) -> None:
+        self._despertar.set()
+
+    def run(self) -> None:
+        while True:
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+            try:
+                if self.sincronizar is not None:
+                    self.sincronizar()
+                recargar()
+                self.ultimo_error = None
+            except Exception as e:
+                # Se sigue sirviendo la versión anterior
+                self.ultimo_error = str(e)
+                print(f"⚠️  Refresco de datos falló: {e}")
+            self.ultima_revision = time.time()
+
+
+def iniciar_refresco(sincronizar: Optional[Callable[[], None]] = None,
+                     intervalo: float = REFRESCO_SEG) -> Optional[Refrescador]:
+    """Arranca (una vez por proceso) el hilo de refresco. intervalo <= 0 lo desactiva."""
+    global _REFRESCADOR
+    if intervalo <= 0:
+        return None
+    with _LOCK_HILO:
+        if _REFRESCADOR is None or not _REFRESCADOR.is_alive():
+            _REFRESCADOR = Refrescador(sincronizar, intervalo)
+            _REFRESCADOR.start()
+    return _REFRESCADOR
+
+
+def refrescador() -> Optional[Refrescador]:
+    return _REFRESCADOR
+
+
+def pedir_refresco() -> bool:
+    """Despierta al refrescador (True) o, si no hay, recarga en línea (False)."""
+    r = _REFRESCADOR
+    if r is not None and r.is_alive():
+        r.pedir_refresco()
+        return True
+    recargar()
+    return False
@@ -0,0 +1,129 @@
+"""
+Conjuntos de valores distintos por celda del cubo, que se pueden unir entre celdas.
+
+Transacciones (DOC_ID) y SKUs no son sumables: un documento tiene líneas en
+varios meses de captura, familias o vendedores. Cada celda del cubo guarda su
+conjunto, y una consulta une los conjuntos de las celdas elegidas por grupo
+(mes, familia, vendedor...) sin volver a las líneas.
+
+- ConjuntosExactos: los códigos distintos de cada celda, ordenados (CSR). La
+  unión concatena y quita repetidos por grupo. El conteo es exacto.
+- ConjuntosHLL: HyperLogLog disperso. Cada celda guarda el rango máximo de los
+  registros que toca, y la unión es el máximo por registro. El error relativo
+  es ~1.04/sqrt(2^p). Sirve para datasets donde guardar los códigos no cabe.
+
+config.DISTINTOS_ERROR elige el modo (0 = exacto).
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Union
+
+import numpy as np
+
+from .particionado import _concatenar_rangos
+
+
+def _contar_pares(grupo: np.ndarray, valor: np.ndarray, n: int) -> np.ndarray:
+    """Valores distintos por grupo (pares (grupo, valor) únicos contados por grupo)."""
+    if len(valor) == 0:
+        return np.zeros(n, dtype=np.int64)
+    base = int(valor.max()) + 1
+    pares = np.unique(grupo.astype(np.int64) * base + valor)
+    return np.bincount(pares // base, minlength=n).astype(np.int64)
+
+
+def _inicios(celda: np.ndarray, n_celdas: int) -> np.ndarray:
+    """Offsets CSR a partir de la celda (ordenada) de cada entrada."""
+    return np.concatenate(([0], np.cumsum(np.bincount(celda, minlength=n_celdas)))).astype(np.int64)
+
+
+@dataclass(frozen=True)
+class ConjuntosExactos:
+    inicio: np.ndarray   # conjunto de la celda i: valores[inicio[i]:inicio[i + 1]]
+    valores: np.ndarray  # códigos distintos, ascendentes dentro de cada celda
+
+    def contar(self, celdas: np.ndarray, grupo: np.ndarray, n: int) -> np.ndarray:
+        """Tamaño de la unión de los conjuntos de las celdas de cada grupo (0..n-1)."""
+        ini, fin = self.inicio[celdas], self.inicio[celdas + 1]
+        vals = self.valores[_concatenar_rangos(ini, fin)]
+        return _contar_pares(np.repeat(grupo, fin - ini), vals, n)
+
+
+@dataclass(frozen=True)
+class ConjuntosHLL:
+    p: int               # 2^p registros
+    inicio: np.ndarray   # registros de la celda i: [inicio[i], inicio[i + 1])
+    registro: np.ndarray
+    rango: np.ndarray    # posición del primer 1 (máximo de la celda en ese registro)
+
+    def contar(self, celdas: np.ndarray, grupo: np.ndarray, n: int) -> np.ndarray:
+        """Estimación HyperLogLog de la unión por grupo (redondeada a entero)."""
+        m = 1 << self.p
+        ini, fin = self.inicio[celdas], self.inicio[celdas + 1]
+        pos = _concatenar_rangos(ini, fin)
+        clave = np.repeat(grupo, fin - ini) * m + self.registro[pos]
+        clave, rango = _maximo_por_clave(clave, self.rango[pos])
+        g = clave // m
+        ocupados = np.bincount(g, minlength=n)
+        suma = np.bincount(g, weights=np.ldexp(1.0, -rango.astype(np.int64)), minlength=n) + (m - ocupados)
+        alfa = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        est = alfa * m * m / suma
+        # rango chico: conteo lineal con los registros vacíos
+        vacios = m - ocupados
+        chico = (est <= 2.5 * m) & (vacios > 0)
+        est[chico] = m * np.log(m / vacios[chico])
+        return np.rint(est).astype(np.int64)
+
+
+Conjuntos = Union[ConjuntosExactos, ConjuntosHLL]
+
+
+def _maximo_por_clave(clave: np.ndarray, rango: np.ndarray):
+    """(claves únicas ordenadas, rango máximo de cada una)."""
+    if len(clave) == 0:
+        return clave.astype(np.int64), rango.astype(np.uint8)
+    s = np.sort(clave.astype(np.int64) * 64 + rango)
+    k = s >> 6
+    ultimo = np.append(k[1:] != k[:-1], True)
+    return k[ultimo], (s[ultimo] & 63).astype(np.uint8)
+
+
+def _mezclar(x: np.ndarray) -> np.ndarray:
+    """splitmix64: bits bien repartidos a partir de códigos enteros."""
+    with np.errstate(over="ignore"):
+        z = x.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def bits_hll(error: float) -> int:
+    """p tal que 1.04/sqrt(2^p) <= error (entre 4 y 18)."""
+    return int(min(max(math.ceil(math.log2((1.04 / error) ** 2)), 4), 18))
+
+
+def conjuntos_por_celda(celda: np.ndarray, codigos: np.ndarray, n_celdas: int, error: float = 0.0) -> Conjuntos:
+    """
+    Conjunto de códigos (>= 0; -1 = nulo, no cuenta) de cada celda 0..n_celdas-1.
+    error > 0 = HyperLogLog con ese error relativo aproximado.
+    """
+    ok = codigos >= 0
+    celda, codigos = celda[ok].astype(np.int64), codigos[ok].astype(np.int64)
+    if error <= 0:
+        base = int(codigos.max()) + 1 if len(codigos) else 1
+        pares = np.unique(celda * base + codigos)
+        tipo = np.int32 if base < 2**31 else np.int64
+        return ConjuntosExactos(_inicios(pares // base, n_celdas), (pares % base).astype(tipo))
+
+    p = bits_hll(error)
+    h = _mezclar(codigos)
+    registro = (h >> np.uint64(64 - p)).astype(np.int64)
+    # 32 bits siguientes al índice: exactos en float64 para ubicar el primer 1
+    resto = ((h << np.uint64(p)) >> np.uint64(32)).astype(np.float64)
+    rango = np.full(len(h), 33, dtype=np.int64)
+    con_uno = resto > 0
+    rango[con_uno] = 32 - np.floor(np.log2(resto[con_uno])).astype(np.int64)
+    clave, rango = _maximo_por_clave(celda * (1 << p) + registro, rango)
+    return ConjuntosHLL(p, _inicios(clave >> p, n_celdas), (clave & ((1 << p) - 1)).astype(np.int32), rango)
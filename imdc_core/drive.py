@@ -0,0 +1,246 @@
+"""
+Sincronización de parquets desde una carpeta de Google Drive.
+
+- El listado pagina con nextPageToken (sin tope de pageSize).
+- Cada archivo se descarga por chunks directo a un temporal en el mismo
+  directorio y se renombra al terminar (nunca queda un parquet a medias).
+- Varios archivos en paralelo, cada hilo con su propio servicio (el cliente
+  httplib2 de googleapiclient no es thread-safe).
+- Estado de sync (<destino>/.drive_sync.json): md5Checksum / modifiedTime por
+  id de Drive. Solo se bajan archivos nuevos o con contenido distinto; los que
+  desaparecen de Drive se borran localmente. El conjunto de cambios se devuelve
+  para invalidar solo las particiones afectadas (ver carga.invalidar_archivos).
+
+Sin dependencias de Streamlit: el servicio se inyecta con `crear_servicio`, así
+que se puede probar con ServicioDriveLocal (una carpeta local con la misma
+interfaz files().list / files().get_media).
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+CHUNK_BYTES = 8 * 1024 * 1024
+DRIVE_WORKERS = int(os.environ.get("IMDC_DRIVE_WORKERS", "4") or 4)
+CAMPOS_ARCHIVO = "id, name, size, md5Checksum, modifiedTime"
+ESTADO_SYNC = ".drive_sync.json"
+
+
+def leer_estado(destino: Path) -> Dict[str, dict]:
+    """{file_id: {name, md5Checksum, modifiedTime, size, mtime_ns}} de la última sincronización."""
+    try:
+        estado = json.loads((destino / ESTADO_SYNC).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return estado if isinstance(estado, dict) else {}
+
+
+def _escribir_estado(destino: Path, estado: Dict[str, dict]) -> None:
+    fp = destino / ESTADO_SYNC
+    tmp = fp.with_suffix(".tmp")
+    try:
+        tmp.write_text(json.dumps(estado, indent=1, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, fp)
+    except OSError as e:
+        print(f"⚠️  No se pudo escribir el estado de sync: {e}")
+
+
+def md5_por_nombre(destino: Path) -> Dict[str, str]:
+    """
+    md5 de Drive para los archivos locales que siguen tal cual se descargaron
+    (mismo tamaño y mtime): evita volver a hashearlos al validar particiones.
+    """
+    out: Dict[str, str] = {}
+    for e in leer_estado(destino).values():
+        fp = destino / e.get("name", "")
+        try:
+            stt = fp.stat()
+        except OSError:
+            continue
+        if e.get("md5Checksum") and stt.st_size == int(e.get("size") or -1) and stt.st_mtime_ns == e.get("mtime_ns"):
+            out[fp.name] = e["md5Checksum"]
+    return out
+
+
+def cambio(archivo: dict, previo: Optional[dict], fp: Path) -> bool:
+    """True si el archivo de Drive difiere de lo que hay localmente."""
+    if previo is None or not fp.exists() or previo.get("name") != archivo.get("name"):
+        return True
+    if archivo.get("md5Checksum"):
+        return archivo["md5Checksum"] != previo.get("md5Checksum")
+    # Sin md5 (no debería pasar con parquets): modifiedTime + tamaño
+    return archivo.get("modifiedTime") != previo.get("modifiedTime") or archivo.get("size") != previo.get("size")
+
+
+def listar_parquets(service, folder_id: str, page_size: int = 200) -> List[dict]:
+    """Todos los .parquet de la carpeta (recorre todas las páginas)."""
+    query = f"'{folder_id}' in parents and name contains '.parquet' and trashed=false"
+    archivos: List[dict] = []
+    token = None
+    while True:
+        resp = service.files().list(
+            q=query, fields=f"nextPageToken, files({CAMPOS_ARCHIVO})",
+            pageSize=page_size, pageToken=token,
+        ).execute()
+        archivos.extend(resp.get("files", []))
+        token = resp.get("nextPageToken")
+        if not token:
+            return archivos
+
+
+def _media_download():
+    from googleapiclient.http import MediaIoBaseDownload
+    return MediaIoBaseDownload
+
+
+def descargar_archivo(service, archivo: dict, destino: Path,
+                      downloader_cls=None, chunksize: int = CHUNK_BYTES) -> Path:
+    """
+    Descarga un archivo por chunks a destino/.<name>.part y lo renombra a
+    destino/<name>. La memoria usada es un chunk, no el archivo completo.
+    """
+    downloader_cls = downloader_cls or _media_download()
+    final = destino / archivo["name"]
+    tmp = destino / f".{archivo['name']}.part"
+    request = service.files().get_media(fileId=archivo["id"])
+    try:
+        with open(tmp, "wb") as fh:
+            downloader = downloader_cls(fh, request, chunksize=chunksize)
+            done = False
+            while not done:
+                _status, done = downloader.next_chunk()
+        os.replace(tmp, final)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return final
+
+
+def sincronizar(crear_servicio: Callable[[], object], folder_id: str, destino: Path,
+                debe_descargar: Optional[Callable[[dict, Path], bool]] = None,
+                workers: int = DRIVE_WORKERS, downloader_cls=None) -> Dict[str, List]:
+    """
+    Lista la carpeta y descarga (en paralelo) los archivos cambiados según el
+    estado de sync (o según debe_descargar(archivo, ruta_local) si se pasa).
+    Devuelve {"archivos": listado, "descargados": archivos bajados,
+    "eliminados": nombres locales borrados porque ya no están en Drive}.
+    """
+    destino.mkdir(parents=True, exist_ok=True)
+    archivos = listar_parquets(crear_servicio(), folder_id)
+    estado = leer_estado(destino)
+    if debe_descargar is None:
+        debe_descargar = lambda a, fp: cambio(a, estado.get(a["id"]), fp)
+    pendientes = [a for a in archivos if debe_descargar(a, destino / a["name"])]
+
+    # Archivos que ya no existen en Drive, o que cambiaron de nombre
+    vigentes = {a["id"]: a["name"] for a in archivos}
+    eliminados: List[str] = []
+    for fid, e in list(estado.items()):
+        nombre = e.get("name", "")
+        if vigentes.get(fid) != nombre:
+            estado.pop(fid)
+            if nombre and nombre not in vigentes.values():
+                (destino / nombre).unlink(missing_ok=True)
+                eliminados.append(nombre)
+
+    local = threading.local()
+
+    def _bajar(archivo: dict) -> dict:
+        if not hasattr(local, "service"):
+            local.service = crear_servicio()
+        fp = descargar_archivo(local.service, archivo, destino, downloader_cls=downloader_cls)
+        estado[archivo["id"]] = dict(
+            name=archivo["name"], md5Checksum=archivo.get("md5Checksum"),
+            modifiedTime=archivo.get("modifiedTime"), size=archivo.get("size"),
+            mtime_ns=fp.stat().st_mtime_ns,
+        )
+        return archivo
+
+    try:
+        if len(pendientes) <= 1 or workers <= 1:
+            descargados = [_bajar(a) for a in pendientes]
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(pendientes))) as ex:
+                descargados = list(ex.map(_bajar, pendientes))
+    finally:
+        # Lo ya descargado queda registrado aunque otro archivo falle
+        _escribir_estado(destino, estado)
+    return dict(archivos=archivos, descargados=descargados, eliminados=eliminados)
+
+
+# ------------------------------------------------------------
+# Servicio local con la interfaz de Drive (pruebas / desarrollo sin red)
+# ------------------------------------------------------------
+class _Ejecutable:
+    def __init__(self, valor):
+        self._valor = valor
+
+    def execute(self):
+        return self._valor
+
+
+class _RequestLocal:
+    def __init__(self, path: Path):
+        self.path = path
+
+
+class DescargaLocal:
+    """Equivalente a MediaIoBaseDownload para _RequestLocal (copia por chunks)."""
+
+    def __init__(self, fh, request: _RequestLocal, chunksize: int = CHUNK_BYTES):
+        self._fh = fh
+        self._src = open(request.path, "rb")
+        self._chunksize = chunksize
+
+    def next_chunk(self):
+        data = self._src.read(self._chunksize)
+        if data:
+            self._fh.write(data)
+        if len(data) < self._chunksize:
+            self._src.close()
+            return None, True
+        return None, False
+
+
+class ServicioDriveLocal:
+    """
+    Sirve los .parquet de una carpeta local como si fuera una carpeta de Drive
+    (id = nombre del archivo). Usar con downloader_cls=DescargaLocal.
+    """
+
+    def __init__(self, carpeta: Path, page_size: Optional[int] = None):
+        self.carpeta = Path(carpeta)
+        self.page_size = page_size
+
+    def files(self):
+        return self
+
+    def _meta(self, fp: Path) -> dict:
+        import hashlib
+
+        h = hashlib.md5()
+        with open(fp, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+                h.update(chunk)
+        stt = fp.stat()
+        return dict(
+            id=fp.name, name=fp.name, size=str(stt.st_size), md5Checksum=h.hexdigest(),
+            modifiedTime=datetime.fromtimestamp(stt.st_mtime, tz=timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z"),
+        )
+
+    def list(self, q: str = "", fields: str = "", pageSize: int = 100, pageToken: Optional[str] = None, **_kw):
+        todos = sorted(self.carpeta.glob("*.parquet"))
+        n = self.page_size or pageSize
+        ini = int(pageToken or 0)
+        resp = dict(files=[self._meta(fp) for fp in todos[ini:ini + n]])
+        if ini + n < len(todos):
+            resp["nextPageToken"] = str(ini + n)
+        return _Ejecutable(resp)
+
+    def get_media(self, fileId: str):
+        return _RequestLocal(self.carpeta / fileId)
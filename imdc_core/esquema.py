@@ -0,0 +1,53 @@
+"""
+Esquema categórico fijo para las columnas de dimensión de df_all.
+
+Las categorías salen de los catálogos (sucursales, CAT_FAMILIA, tipos de
+venta) más los valores que aparezcan en los datos y no estén catalogados,
+siempre en orden alfabético: así groupby / sort_values dan el mismo orden que
+con texto, pero operan sobre códigos enteros (menos memoria y comparaciones
+de igualdad más rápidas en los filtros).
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from .config import CATALOGO_SUCURSALES
+
+COLUMNAS_DIMENSION = ["Almacen_CANON", "Tipo2", "Familia_Nombre", "Marca_Nombre", "Vendedor_Nombre", "Documento"]
+
+
+def categorias_catalogo(cat_familia: Optional[pd.DataFrame] = None) -> Dict[str, List[str]]:
+    """Valores conocidos de antemano por columna (sin Documento/Marca/Vendedor: no tienen catálogo)."""
+    familias = ["SIN FAMILIA", "OTROS"]
+    if cat_familia is not None and not cat_familia.empty:
+        familias += cat_familia["Familia_Nombre"].dropna().astype(str).str.strip().tolist()
+    return {
+        "Almacen_CANON": [s for s in CATALOGO_SUCURSALES if s != "CONSOLIDADO"],
+        "Tipo2": ["CONTADO", "CREDITO"],
+        "Familia_Nombre": familias,
+        "Marca_Nombre": ["SIN MARCA"],
+        "Vendedor_Nombre": ["SIN VENDEDOR"],
+    }
+
+
+def _categorias(base: Iterable[str], s: pd.Series) -> List[str]:
+    presentes = s.cat.categories if isinstance(s.dtype, pd.CategoricalDtype) else s.dropna().unique()
+    return sorted(set(base) | {str(v) for v in presentes})
+
+
+def aplicar_esquema(df: pd.DataFrame, cat_familia: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Convierte (en su lugar) las columnas de dimensión a category con el esquema fijo."""
+    base = categorias_catalogo(cat_familia)
+    for c in COLUMNAS_DIMENSION:
+        if c not in df.columns:
+            continue
+        dtype = pd.CategoricalDtype(_categorias(base.get(c, []), df[c]))
+        if df[c].dtype == dtype:
+            continue
+        if isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].cat.set_categories(dtype.categories)
+        else:
+            df[c] = df[c].astype("string").astype(dtype)
+    return df
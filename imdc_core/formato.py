@@ -0,0 +1,65 @@
+"""
+Formato de cifras para tarjetas y tablas ($, %, números con K/M).
+"""
+from __future__ import annotations
+
+import math
+
+
+def money_fmt(x: float) -> str:
+    """Formato de moneda - siempre con 1 decimal en millones"""
+    if x is None or (isinstance(x, float) and (math.isnan(x) or math.isinf(x))):
+        return "$0.0"
+    
+    abs_x = abs(x)
+    sign = "-" if x < 0 else ""
+    
+    # Millones: SIEMPRE 1 decimal
+    if abs_x >= 1_000_000:
+        return f"{sign}${abs_x/1_000_000:.1f}M"
+    # Miles
+    elif abs_x >= 100_000:
+        return f"{sign}${abs_x/1_000:,.0f}K"
+    elif abs_x >= 10_000:
+        return f"{sign}${abs_x/1_000:,.1f}K"
+    elif abs_x >= 1_000:
+        return f"{sign}${abs_x:,.0f}"
+    else:
+        if abs(x - round(x)) < 1e-9:
+            return f"{sign}${abs_x:,.0f}"
+        return f"{sign}${abs_x:,.1f}"
+
+def pct_fmt(x: float) -> str:
+    """Formato de porcentaje mejorado"""
+    if x is None or (isinstance(x, float) and (math.isnan(x) or math.isinf(x))):
+        return "—"
+    
+    pct = x * 100
+    
+    if abs(pct) < 1:
+        return f"{pct:.2f}%"
+    elif abs(pct - round(pct)) < 0.01:
+        return f"{pct:.0f}%"
+    else:
+        return f"{pct:.1f}%"
+
+def num_fmt(x: float) -> str:
+    """Formato de números - con 1 decimal en millones"""
+    if x is None or (isinstance(x, float) and (math.isnan(x) or math.isinf(x))):
+        return "0"
+    
+    abs_x = abs(x)
+    sign = "-" if x < 0 else ""
+    
+    if abs_x >= 1_000_000:
+        return f"{sign}{abs_x/1_000_000:.1f}M"
+    elif abs_x >= 100_000:
+        return f"{sign}{abs_x/1_000:,.0f}K"
+    elif abs_x >= 10_000:
+        return f"{sign}{abs_x/1_000:,.1f}K"
+    elif abs_x >= 1_000:
+        return f"{sign}{abs_x:,.0f}"
+    else:
+        if abs(x - round(x)) < 1e-9:
+            return f"{sign}{abs_x:.0f}"
+        return f"{sign}{abs_x:.1f}"
@@ -0,0 +1,101 @@
+"""
+Índice invertido de df_all para los filtros del dashboard.
+
+Por cada columna filtrable (Familia_Nombre, Marca_Nombre, es_rem, Tipo2) se
+guardan las posiciones de fila de cada valor, ordenadas (CSR: una permutación
+estable + el inicio de cada valor). Año / Mes / Almacen_CANON no necesitan
+listas propias: df_all está agrupado por esas columnas y TablaParticiones ya
+da sus filas como rangos contiguos.
+
+Un filtro es entonces la intersección de listas ordenadas de posiciones y un
+solo take al final, sin comparar columnas completas ni copiar df_all.
+Se construye una vez por versión del dataset (ver imdc_core.dataset).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .asociados import asociado, asociar
+
+COLUMNAS_INDICE = ["Familia_Nombre", "Marca_Nombre", "es_rem", "Tipo2"]
+
+
+@dataclass(frozen=True)
+class ListasInvertidas:
+    """Filas de cada valor de una columna: orden[inicio[i]:inicio[i + 1]] para valores[i]."""
+    valores: pd.Index
+    orden: np.ndarray
+    inicio: np.ndarray
+
+    def filas_de(self, valor) -> np.ndarray:
+        i = int(self.valores.get_indexer([valor])[0])
+        if i < 0:
+            return self.orden[:0]
+        return self.orden[self.inicio[i]:self.inicio[i + 1]]
+
+
+def _listas_de(s: pd.Series) -> ListasInvertidas:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codigos, valores = s.cat.codes.to_numpy(), s.cat.categories
+    else:
+        codigos, valores = pd.factorize(s)
+        valores = pd.Index(valores)
+    tipo = np.int32 if len(s) < 2**31 else np.int64
+    # argsort estable: dentro de cada valor las posiciones quedan ascendentes; los NA (-1) primero
+    orden = np.argsort(codigos, kind="stable").astype(tipo, copy=False)
+    nulos = int((codigos < 0).sum())
+    cuentas = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+    inicio = np.concatenate(([nulos], nulos + np.cumsum(cuentas))).astype(np.int64)
+    return ListasInvertidas(valores, orden, inicio)
+
+
+@dataclass(frozen=True)
+class IndiceFiltros:
+    columnas: Dict[str, ListasInvertidas]
+    filas: int
+
+    def filas_de(self, columna: str, valor) -> np.ndarray:
+        """Posiciones ordenadas de las filas con columna == valor."""
+        return self.columnas[columna].filas_de(valor)
+
+
+def construir_indice(df: pd.DataFrame) -> IndiceFiltros:
+    columnas = {}
+    for c in COLUMNAS_INDICE:
+        if c in df.columns:
+            # es_rem se filtra como entero (mismo criterio que astype(int) == 0)
+            columnas[c] = _listas_de(df[c].astype(int) if c == "es_rem" else df[c])
+    return IndiceFiltros(columnas, len(df))
+
+
+def interseccion(*listas: np.ndarray) -> np.ndarray:
+    """Posiciones presentes en todas las listas (ordenadas, sin repetidos)."""
+    listas = sorted(listas, key=len)
+    out = listas[0]
+    for otra in listas[1:]:
+        if len(out) == 0:
+            break
+        if len(otra) == 0:
+            return otra
+        # se recorre la lista más corta y se busca cada posición en la otra
+        pos = np.searchsorted(otra, out)
+        np.minimum(pos, len(otra) - 1, out=pos)
+        out = out[otra[pos] == out]
+    return out
+
+
+# ------------------------------------------------------------
+# Registro df -> IndiceFiltros (imdc_core.asociados)
+# ------------------------------------------------------------
+def registrar_indice(df: pd.DataFrame, indice: IndiceFiltros) -> None:
+    """Asocia el índice a este DataFrame (por identidad; copias no lo heredan)."""
+    asociar(df, "indice", indice)
+
+
+def indice_de(df: pd.DataFrame) -> Optional[IndiceFiltros]:
+    """IndiceFiltros de df si fue registrado y no cambió de largo; si no, None."""
+    return asociado(df, "indice")
@@ -0,0 +1,63 @@
+"""
+df_all como archivo Arrow IPC (Feather v2, sin compresión) abierto con mmap.
+
+Con varios procesos de Streamlit en el mismo host, cada uno mapea el mismo
+archivo: las columnas numéricas sin nulos (float64 / int64) quedan respaldadas
+directamente por el mmap, así que comparten el page cache del sistema en vez
+de tener cada proceso su copia, y el arranque es un mmap en lugar de
+descomprimir y decodificar parquet. Las columnas de texto, Int64 y category sí
+se materializan por proceso (pandas no puede apuntarlas al buffer de Arrow).
+
+Los buffers mapeados son de solo lectura, igual que el df_all compartido
+(ver imdc_core.dataset.congelar).
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+
+def escribir_ipc(df: pd.DataFrame, destino: Path) -> bool:
+    """
+    Escribe df en destino (IPC sin compresión para que el mmap sea directo).
+    Temporal por proceso + os.replace: varios procesos pueden escribirlo a la
+    vez y un lector nunca ve un archivo a medias.
+    """
+    tmp = destino.with_name(f".{destino.name}.{os.getpid()}.tmp")
+    try:
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(str(tmp), "wb") as sink:
+            with ipc.new_file(sink, tabla.schema) as writer:
+                # Sin max_chunksize: from_pandas deja cada columna en un chunk y se escribe
+                # un solo record batch. Con varios, to_pandas concatena cada columna en una
+                # copia privada por proceso y se pierde el mmap compartido
+                writer.write_table(tabla)
+        os.replace(tmp, destino)
+        return True
+    except Exception as e:
+        # Sin archivo IPC se arranca desde el snapshot parquet (más lento, mismo resultado)
+        print(f"⚠️  No se pudo escribir el dataset IPC {destino.name}: {e}")
+        try:
+            tmp.unlink(missing_ok=True)
+        except OSError:
+            pass
+        return False
+
+
+def abrir_ipc(destino: Path) -> Optional[pd.DataFrame]:
+    """DataFrame sobre el mmap de destino; None si no existe o está ilegible."""
+    if not destino.exists():
+        return None
+    try:
+        fuente = pa.memory_map(str(destino), "r")
+        tabla = ipc.open_file(fuente).read_all()
+        # split_blocks: sin consolidar bloques, así float64/int64 no se copian
+        return tabla.to_pandas(split_blocks=True)
+    except Exception as e:
+        print(f"⚠️  Dataset IPC ilegible ({destino.name}): {e}")
+        return None
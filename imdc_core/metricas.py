@@ -0,0 +1,945 @@
+"""
+Cálculos del dashboard sobre df_all: filtros, KPIs, resúmenes mensuales y
+desgloses con YoY. Sin Streamlit: se puede importar y usar desde scripts o
+pruebas, y no hace nada al importarse.
+
+`Periodo` agrupa lo que una página puede necesitar para una selección de
+filtros (df del rango, del año anterior, KPIs, resumen mensual...). Cada
+atributo se calcula la primera vez que se pide, así que una página paga solo
+por lo que muestra.
+
+Si df_all tiene cubo (imdc_core.cubo), Periodo saca KPIs, resúmenes y
+desgloses de las celdas pre-agregadas en vez de filtrar y agrupar líneas; las
+funciones sobre DataFrames siguen para cualquier otro df y dan la misma salida.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import CATALOGO_SUCURSALES
+from .consultas import CONSULTAS
+from .cubo import Cubo, cubo_de
+from .indice import indice_de, interseccion
+from .particionado import clave_periodo, particiones_de
+from .texto import _clean_text_series
+
+CANON_VALIDOS = set(CATALOGO_SUCURSALES)
+
+M2_MAP = {
+    "GENERAL": 1538,
+    "EXPRESS": 369,
+    "SAN AGUST": 870,
+    "ADELITAS": 348,
+    "H ILUSTRES": 100,
+    "CONSOLIDADO": 3225,
+}
+
+MONTHS_FULL = {
+    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 6: "Junio",
+    7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
+}
+MONTHS_ABBR = {k: v[:3] for k, v in MONTHS_FULL.items()}
+
+# ------------------------------------------------------------
+# Math
+# ------------------------------------------------------------
+def safe_div(a: float, b: float) -> float:
+    try:
+        a = float(a); b = float(b)
+        if b == 0 or math.isnan(b) or math.isinf(b):
+            return float("nan")
+        return a / b
+    except Exception:
+        return float("nan")
+
+def _div(a, b) -> np.ndarray:
+    """safe_div elemento a elemento: NaN donde b es 0, NaN o inf."""
+    a = np.asarray(a, dtype="float64"); b = np.asarray(b, dtype="float64")
+    out = np.full(np.broadcast(a, b).shape, np.nan)
+    return np.divide(a, b, out=out, where=np.isfinite(b) & (b != 0))
+
+def yoy(cur: float, prev: float) -> float:
+    r = safe_div(cur, prev)
+    if isinstance(r, float) and (math.isnan(r) or math.isinf(r)):
+        return float("nan")
+    return r - 1.0
+
+def _yoy(cur, prev) -> np.ndarray:
+    """yoy elemento a elemento."""
+    r = _div(cur, prev)
+    r[~np.isfinite(r)] = np.nan
+    return r - 1.0
+
+def comparar_yoy(cur: pd.DataFrame, prev: pd.DataFrame, clave,
+                 pct: Sequence[str] = (), pp: Sequence[str] = (), dif: Sequence[str] = (),
+                 sufijos: Tuple[str, str] = ("", "_LY"), como: str = "left",
+                 con_prev: bool = True) -> pd.DataFrame:
+    """
+    Une cur con prev por clave (columna o lista) y agrega, en una pasada
+    vectorizada, por cada métrica m:
+      pct -> YoY_m    = cur / prev - 1 (NaN si prev es 0 o falta; como yoy)
+      pp  -> YoY_m_pp = (cur - prev) * 100 (márgenes y porcentajes)
+      dif -> Delta_m  = cur - prev
+    Las columnas de cur y prev llevan sufijos[0] y sufijos[1] (menos la clave).
+    como="left" conserva filas, orden e índice de cur (prev con clave única);
+    como="outer" agrega también las claves que solo están en prev.
+    con_prev=False deja fuera las columnas de prev.
+    """
+    claves = [clave] if isinstance(clave, str) else list(clave)
+    suf_cur, suf_prev = sufijos
+    metricas = list(dict.fromkeys([*pct, *pp, *dif]))
+    if como == "left":
+        out = cur.rename(columns={c: c + suf_cur for c in cur.columns if c not in claves}) if suf_cur else cur.copy()
+        pos = np.full(len(cur), -1, dtype=np.intp)
+        if len(cur) and len(prev):
+            if len(claves) == 1:
+                pos = pd.Index(prev[claves[0]]).get_indexer(cur[claves[0]])
+            else:
+                pos = pd.MultiIndex.from_frame(prev[claves]).get_indexer(pd.MultiIndex.from_frame(cur[claves]))
+        falta = pos < 0
+        traer = [c for c in prev.columns if c not in claves] if con_prev else metricas
+        alineadas = {}
+        for c in traer:
+            # fila de prev alineada con cada fila de cur; sin pareja -> NaN (como el merge left)
+            col = prev[c].iloc[np.where(falta, 0, pos)] if len(prev) else prev[c].reindex(range(len(cur)))
+            col = col.reset_index(drop=True)
+            alineadas[c + suf_prev] = (col.where(~falta) if falta.any() else col).to_numpy()
+        ant = alineadas.get
+        nuevas = dict(alineadas) if con_prev else {}
+    else:
+        out = cur.rename(columns={c: c + suf_cur for c in cur.columns if c not in claves}).merge(
+            prev.rename(columns={c: c + suf_prev for c in prev.columns if c not in claves}), on=claves, how=como)
+        ant = out.__getitem__
+        nuevas = {}
+
+    a = {m: out[m + suf_cur].to_numpy(dtype="float64") for m in metricas}
+    b = {m: np.asarray(ant(m + suf_prev), dtype="float64") for m in metricas}
+    for m in pct:
+        nuevas[f"YoY_{m}"] = _yoy(a[m], b[m])
+    for m in pp:
+        nuevas[f"YoY_{m}_pp"] = (a[m] - b[m]) * 100
+    for m in dif:
+        nuevas[f"Delta_{m}"] = a[m] - b[m]
+    if como != "left" and not con_prev:
+        out = out.drop(columns=[c + suf_prev for c in prev.columns if c not in claves])
+    # todas las columnas nuevas de una vez (insertarlas una por una copia el bloque cada vez)
+    return pd.concat([out, pd.DataFrame(nuevas, index=out.index)], axis=1)
+
+# ------------------------------------------------------------
+# Filters
+# ------------------------------------------------------------
+def _filtrar_periodos(df: pd.DataFrame,
+                      p_ini: int,
+                      p_fin: int,
+                      sucursal: str,
+                      familia: str,
+                      marca: str,
+                      include_rem: bool,
+                      excluir_credito: bool = False) -> pd.DataFrame:
+    """Filas con periodo (Año*12 + Mes) entre p_ini y p_fin más el resto de filtros."""
+    if df.empty:
+        return df
+
+    part = particiones_de(df)
+    indice = indice_de(df)
+    if part is not None and indice is not None:
+        # df_all compartido: el tramo de periodos (searchsorted) por sucursal y las listas del
+        # índice invertido se intersectan y se toma una sola vez, sin máscaras sobre todo el frame
+        listas = [part.filas_ventana(p_ini, p_fin, None if sucursal == "CONSOLIDADO" else sucursal)]
+        if familia != "TODAS":
+            listas.append(indice.filas_de("Familia_Nombre", familia))
+        if marca != "TODAS":
+            listas.append(indice.filas_de("Marca_Nombre", marca))
+        if not include_rem and "es_rem" in df.columns:
+            listas.append(indice.filas_de("es_rem", 0))
+        if excluir_credito and "Tipo2" in df.columns:
+            listas.append(indice.filas_de("Tipo2", "CONTADO"))
+        return df.take(interseccion(*listas))
+
+    periodo = df["Año"].astype(int) * 12 + df["Mes"].astype(int)
+    out = df[periodo.between(int(p_ini), int(p_fin))]
+
+    if sucursal != "CONSOLIDADO":
+        out = out[out["Almacen_CANON"] == sucursal]
+
+    if familia != "TODAS":
+        out = out[out["Familia_Nombre"] == familia]
+
+    if marca != "TODAS":
+        out = out[out["Marca_Nombre"] == marca]
+
+    # REM filter
+    if not include_rem and "es_rem" in out.columns:
+        out = out[out["es_rem"].astype(int) == 0]
+    
+    # Excluir crédito filter
+    if excluir_credito and "Tipo2" in out.columns:
+        out = out[out["Tipo2"] == "CONTADO"]
+
+    return out
+
+def apply_filters(df: pd.DataFrame,
+                  year: int,
+                  m_start: int,
+                  m_end: int,
+                  sucursal: str,
+                  familia: str,
+                  marca: str,
+                  include_rem: bool,
+                  excluir_credito: bool = False) -> pd.DataFrame:
+    """Meses m_start..m_end de year (sin cruzar de año: m_start < 1 cuenta desde Enero)."""
+    return _filtrar_periodos(df, clave_periodo(year, max(int(m_start), 1)), clave_periodo(year, min(int(m_end), 12)),
+                             sucursal, familia, marca, include_rem, excluir_credito)
+
+def apply_filters_ventana(df: pd.DataFrame,
+                          year: int,
+                          m_start: int,
+                          m_end: int,
+                          sucursal: str,
+                          familia: str,
+                          marca: str,
+                          include_rem: bool,
+                          excluir_credito: bool = False) -> pd.DataFrame:
+    """
+    Ventana m_start..m_end de year donde m_start < 1 cruza al año anterior
+    (m_start=-11, m_end=1: Feb del año anterior a Ene). En df_all es un solo
+    tramo de periodos, igual que una ventana dentro del año.
+    """
+    return _filtrar_periodos(df, clave_periodo(year, m_start), clave_periodo(year, m_end),
+                             sucursal, familia, marca, include_rem, excluir_credito)
+
+def apply_filters_year(df: pd.DataFrame,
+                       year: int,
+                       sucursal: str,
+                       familia: str,
+                       marca: str,
+                       include_rem: bool,
+                       excluir_credito: bool = False) -> pd.DataFrame:
+    """Mismos filtros pero sin recortar meses (para histórico anual)."""
+    return apply_filters(df, year, 1, 12, sucursal, familia, marca, include_rem, excluir_credito)
+
+def _ventas_col(ventas_con_iva: bool) -> str:
+    return "Total_alloc" if ventas_con_iva else "Sub Total"
+
+def count_vendedores_activos(df: pd.DataFrame) -> int:
+    if df.empty:
+        return 0
+    s = df.get("Vendedor_Nombre", pd.Series([], dtype="string")).astype("string").fillna("").str.strip()
+    s = s.replace("TODOS", "", regex=False).replace("", pd.NA)
+    return int(s.dropna().nunique())
+
+# ------------------------------------------------------------
+# KPIs core
+# ------------------------------------------------------------
+def _kpis_vacios() -> Dict[str, float]:
+    return dict(
+        ventas=0.0, ventas_cont=0.0, ventas_cred=0.0,
+        utilidad=0.0, subtotal=0.0, margen=np.nan,
+        txns=0.0, ticket=np.nan,
+        descdol=0.0, descpct=np.nan,
+        vendedores=0.0,
+        ventas_m2=np.nan, utilidad_m2=np.nan,
+    )
+
+def _kpis_desde(ventas: float, ventas_cont: float, ventas_cred: float, subtotal: float, utilidad: float,
+                txns: float, descdol: float, vend: float, ventas_con_iva: bool, m2: float) -> Dict[str, float]:
+    """KPIs a partir de las sumas y conteos (los mismos para un df o para celdas del cubo)."""
+    margen = safe_div(utilidad, subtotal)
+    ticket = safe_div(ventas, txns) if ventas_con_iva else safe_div(subtotal, txns)
+    descpct = safe_div(descdol, subtotal) if subtotal > 0 else float("nan")
+    ventas_m2 = safe_div(ventas, m2) if m2 else float("nan")
+    utilidad_m2 = safe_div(utilidad, m2) if m2 else float("nan")
+
+    return dict(
+        ventas=ventas, ventas_cont=ventas_cont, ventas_cred=ventas_cred,
+        utilidad=utilidad, subtotal=subtotal, margen=margen,
+        txns=txns, ticket=ticket,
+        descdol=descdol, descpct=descpct,
+        vendedores=vend,
+        ventas_m2=ventas_m2, utilidad_m2=utilidad_m2,
+    )
+
+def kpis_from_df(df: pd.DataFrame, ventas_con_iva: bool, m2: float) -> Dict[str, float]:
+    if df.empty:
+        return _kpis_vacios()
+    ventas_col = _ventas_col(ventas_con_iva)
+    ventas = float(df[ventas_col].sum())
+    ventas_cont = float(df.loc[df["Tipo2"]=="CONTADO", ventas_col].sum()) if "Tipo2" in df.columns else ventas
+    ventas_cred = float(df.loc[df["Tipo2"]=="CREDITO", ventas_col].sum()) if "Tipo2" in df.columns else 0.0
+
+    subtotal = float(df["Sub Total"].sum()) if "Sub Total" in df.columns else 0.0
+    utilidad = float(df["Utilidad"].sum()) if "Utilidad" in df.columns else 0.0
+    txns = float(df["DOC_ID"].nunique()) if "DOC_ID" in df.columns else 0.0
+    descdol = float(df["Descuento $"].sum()) if "Descuento $" in df.columns else 0.0
+    vend = float(count_vendedores_activos(df))
+    return _kpis_desde(ventas, ventas_cont, ventas_cred, subtotal, utilidad, txns, descdol, vend, ventas_con_iva, m2)
+
+# ------------------------------------------------------------
+# Agregados mensuales (12 meses) + YoY
+# ------------------------------------------------------------
+_COLUMNAS_MENSUALES = ["Ventas_Cont", "Ventas_Cred", "Utilidad", "SubTotal", "DescDol", "TXNS", "Vendedores"]
+
+def _canon_nombres(s: pd.Series) -> np.ndarray:
+    """Código del nombre limpio de cada vendedor (criterio de count_vendedores_activos); -1 = no cuenta."""
+    s = s.astype("string").fillna("").str.strip()
+    s = s.replace("TODOS", "", regex=False).replace("", pd.NA)
+    return pd.factorize(s)[0]
+
+def _codigos_vendedor(s: pd.Series) -> np.ndarray:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # se limpian las categorías, no las filas
+        return np.append(_canon_nombres(pd.Series(s.cat.categories)), -1)[s.cat.codes.to_numpy()]
+    return _canon_nombres(s)
+
+def _agregar_mensual(df: pd.DataFrame, por: List[str], ventas_con_iva: bool) -> pd.DataFrame:
+    """Un solo groupby por (["Mes"] o ["Año", "Mes"]) con las columnas de _COLUMNAS_MENSUALES."""
+    ventas = df[_ventas_col(ventas_con_iva)]
+    vend = _codigos_vendedor(df["Vendedor_Nombre"])
+    base = pd.DataFrame({
+        **{c: df[c] for c in por},
+        "Ventas_Cont": ventas.where(df["Tipo2"] == "CONTADO", 0.0),
+        "Ventas_Cred": ventas.where(df["Tipo2"] == "CREDITO", 0.0),
+        "Utilidad": df["Utilidad"],
+        "SubTotal": df["Sub Total"],
+        "DescDol": df["Descuento $"],
+        "DOC_ID": df["DOC_ID"],
+        "Vend": np.where(vend >= 0, vend, np.nan),
+    })
+    return (
+        base.groupby(por, observed=True)
+            .agg(
+                Ventas_Cont=("Ventas_Cont","sum"),
+                Ventas_Cred=("Ventas_Cred","sum"),
+                Utilidad=("Utilidad","sum"),
+                SubTotal=("SubTotal","sum"),
+                DescDol=("DescDol","sum"),
+                TXNS=("DOC_ID","nunique"),
+                Vendedores=("Vend","nunique"),
+            )
+    )
+
+def monthly_summary(df_year: pd.DataFrame, ventas_con_iva: bool) -> pd.DataFrame:
+    """
+    Devuelve DF con meses 1..12 aunque no existan filas:
+      MesNum, Mes, Ventas_Cont, Ventas_Cred, Ventas_Total, Utilidad, SubTotal, Margen, TXNS, Ticket, DescPct, Vendedores
+    """
+    if df_year.empty:
+        return _resumen_mensual_vacio()
+    return _resumen_mensual_desde(_agregar_mensual(df_year, ["Mes"], ventas_con_iva), ventas_con_iva)
+
+def _resumen_mensual_vacio() -> pd.DataFrame:
+    out = pd.DataFrame({"MesNum": list(range(1, 13))})
+    out["Mes"] = out["MesNum"].map(MONTHS_FULL)
+    for c in ["Ventas_Cont","Ventas_Cred","Ventas_Total","Utilidad","SubTotal","Margen","TXNS","Ticket","DescPct","Vendedores"]:
+        out[c] = 0.0
+    out["Margen"] = np.nan
+    out["Ticket"] = np.nan
+    out["DescPct"] = np.nan
+    return out
+
+def _resumen_mensual_desde(g: pd.DataFrame, ventas_con_iva: bool) -> pd.DataFrame:
+    """Resumen de 12 meses (ascendente: más reciente a la derecha) a partir de g indexado por Mes."""
+    g = g.reindex(pd.RangeIndex(1, 13))
+    out = pd.DataFrame({"MesNum": list(range(1, 13))})
+    for c in ["Ventas_Cont", "Ventas_Cred"]:
+        out[c] = g[c].fillna(0.0).to_numpy()
+    out["Ventas_Total"] = out["Ventas_Cont"] + out["Ventas_Cred"]
+    out["Utilidad"] = g["Utilidad"].fillna(0.0).to_numpy()
+    out["SubTotal"] = g["SubTotal"].fillna(0.0).to_numpy()
+    out["Margen"] = _div(out["Utilidad"], out["SubTotal"])
+    out["TXNS"] = g["TXNS"].fillna(0.0).to_numpy()
+    out["Ticket"] = _div(out["Ventas_Total"] if ventas_con_iva else out["SubTotal"], out["TXNS"])
+    out["DescPct"] = np.where(out["SubTotal"] > 0, _div(g["DescDol"].fillna(0.0), out["SubTotal"]), np.nan)
+    out["Vendedores"] = g["Vendedores"].fillna(0.0).to_numpy()
+    out["Mes"] = out["MesNum"].map(MONTHS_FULL)
+    return out
+
+def _resumen_de_anio(tabla: pd.DataFrame, year: int, ventas_con_iva: bool) -> pd.DataFrame:
+    """Resumen de 12 meses de year a partir de la tabla por (Año, Mes)."""
+    del_anio = tabla[tabla.index.get_level_values("Año") == int(year)]
+    if del_anio.empty:
+        return _resumen_mensual_vacio()
+    return _resumen_mensual_desde(del_anio.droplevel("Año"), ventas_con_iva)
+
+def _ventana_y_anterior(tabla: pd.DataFrame, year: int, m_start: int, m_end: int,
+                        ventas_con_iva: bool) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    # la ventana se resume solo con sus meses (como resumen_ventana sobre las filas de la ventana)
+    periodo = (tabla.index.get_level_values("Año").astype(int) * 12
+               + tabla.index.get_level_values("Mes").astype(int))
+    ventana = tabla[(periodo >= clave_periodo(year, m_start)) & (periodo <= clave_periodo(year, m_end))]
+    ms_cur = _unir_ventana(lambda a: _resumen_de_anio(ventana, a, ventas_con_iva), year, m_start, m_end)
+    return ms_cur, _resumen_de_anio(tabla, int(year) - 1, ventas_con_iva)
+
+def resumen_periodos(df: pd.DataFrame, year: int, m_start: int, m_end: int,
+                     ventas_con_iva: bool) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    (resumen de la ventana m_start..m_end, resumen del año anterior completo)
+    con una sola agregación por (Año, Mes). df = filas desde Enero del año
+    anterior hasta m_end (la ventana que cruza de año cabe en ese tramo).
+    """
+    if df.empty:
+        tabla = pd.DataFrame(columns=_COLUMNAS_MENSUALES,
+                             index=pd.MultiIndex.from_arrays([[], []], names=["Año", "Mes"]))
+    else:
+        tabla = _agregar_mensual(df, ["Año", "Mes"], ventas_con_iva)
+    return _ventana_y_anterior(tabla, year, m_start, m_end, ventas_con_iva)
+
+def add_yoy_monthly(df_cur: pd.DataFrame, df_prev: pd.DataFrame) -> pd.DataFrame:
+    # % y margen como pp (delta directo)
+    return comparar_yoy(df_cur, df_prev, "MesNum",
+                        pct=["Ventas_Total", "Ventas_Cont", "Ventas_Cred", "Utilidad", "TXNS", "Ticket"],
+                        pp=["DescPct", "Margen"], con_prev=False)
+
+# ------------------------------------------------------------
+# Breakdown helpers (Top N con YoY)
+# ------------------------------------------------------------
+def _desglose_vacio(dim_col: str) -> pd.DataFrame:
+    return pd.DataFrame(columns=[dim_col,"Ventas","Utilidad","SubTotal","Margen","TXNS",
+                                 "YoY_Ventas","YoY_Utilidad","YoY_TXNS","YoY_Margen_pp"])
+
+def _desglose_desde(cur: pd.DataFrame, prev: pd.DataFrame, dim_col: str, top_n: int) -> pd.DataFrame:
+    """Top N con YoY a partir de los agregados por dim_col de cada periodo (Ventas, Utilidad, SubTotal, TXNS)."""
+    for t in (cur, prev):
+        t["Margen"] = _div(t["Utilidad"], t["SubTotal"])
+    out = comparar_yoy(cur, prev, dim_col, pct=["Ventas", "Utilidad", "TXNS"], pp=["Margen"])
+    # estable: los empates quedan en el orden de dim_col (el de groupby), igual desde df o cubo
+    out = out.sort_values("Ventas", ascending=False, kind="stable").head(int(top_n)).reset_index(drop=True)
+    return out
+
+def _agregar_actual_y_anterior(df_cur: pd.DataFrame, df_prev: pd.DataFrame, dim_col: str,
+                               columnas: Callable[[pd.DataFrame], Dict[str, object]],
+                               **agg) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Una sola agregación sobre las líneas de ambos periodos, con clave
+    (dim_col, periodo), que se separa en los agregados del actual y del
+    anterior, cada uno con dim_col y ordenado como groupby(dim_col).
+    columnas(df) arma las columnas de cada periodo; agg = {salida: (columna,
+    "sum" | "size" | "nunique")}, como en groupby().agg.
+    """
+    dim_prev = df_prev[dim_col]
+    if dim_prev.dtype != df_cur[dim_col].dtype:
+        # mismo dtype para que la unión no pase a object (lo que no está en cur no se usa)
+        dim_prev = dim_prev.astype(df_cur[dim_col].dtype)
+    dims = pd.concat([df_cur[dim_col], dim_prev], ignore_index=True)
+    es_cat = isinstance(dims.dtype, pd.CategoricalDtype)
+    if es_cat:
+        codigos, valores = dims.cat.codes.to_numpy(), dims.cat.categories
+    else:
+        codigos, valores = pd.factorize(dims, sort=True)
+    # grupo = código de dim_col * 2 + periodo (0 = actual, 1 = anterior);
+    # las líneas sin valor de dim_col no cuentan (como dropna=True)
+    grupo = codigos.astype(np.int64) * 2
+    grupo[len(df_cur):] += 1
+    ok = None if (codigos >= 0).all() else codigos >= 0
+    if ok is not None:
+        grupo = grupo[ok]
+    n = 2 * len(valores)
+
+    cols_cur, cols_prev = columnas(df_cur), columnas(df_prev)
+    def unir(c: str) -> np.ndarray:
+        v = np.concatenate([np.broadcast_to(np.asarray(cols_cur[c]), len(df_cur)),
+                            np.broadcast_to(np.asarray(cols_prev[c]), len(df_prev))])
+        return v if ok is None else v[ok]
+
+    lineas = np.bincount(grupo, minlength=n)
+    out = {}
+    for salida, (col, func) in agg.items():
+        if func == "sum":
+            # NaN cuenta como 0, igual que sum() de pandas (astype: sin líneas bincount da int64)
+            v = unir(col).astype("float64")
+            v[np.isnan(v)] = 0.0
+            out[salida] = np.bincount(grupo, weights=v, minlength=n).astype("float64")
+        elif func == "size":
+            out[salida] = lineas.astype(np.int64)
+        else:  # "nunique"
+            # categórico: groupby usa los códigos sin volver a factorizar la clave
+            por = pd.Categorical.from_codes(grupo, categories=pd.RangeIndex(n))
+            out[salida] = pd.Series(unir(col)).groupby(por, observed=False).nunique().to_numpy(dtype=np.int64)
+    g = pd.DataFrame(out)
+    partes = []
+    for anterior in (0, 1):
+        cods = np.flatnonzero(lineas[anterior::2] > 0)
+        t = g.iloc[cods * 2 + anterior].reset_index(drop=True)
+        t.insert(0, dim_col, pd.Categorical.from_codes(cods, dtype=dims.dtype) if es_cat else valores.take(cods))
+        partes.append(t)
+    return partes[0], partes[1]
+
+def breakdown_dim(df_cur: pd.DataFrame, df_prev: pd.DataFrame, dim_col: str, ventas_con_iva: bool, top_n: int = 20) -> pd.DataFrame:
+    ventas_col = _ventas_col(ventas_con_iva)
+    if df_cur.empty:
+        return _desglose_vacio(dim_col)
+
+    cur, prev = _agregar_actual_y_anterior(
+        df_cur, df_prev, dim_col,
+        lambda d: {"Ventas": d[ventas_col], "Utilidad": d["Utilidad"], "SubTotal": d["Sub Total"], "DOC_ID": d["DOC_ID"]},
+        Ventas=("Ventas","sum"), Utilidad=("Utilidad","sum"), SubTotal=("SubTotal","sum"), TXNS=("DOC_ID","nunique"),
+    )
+    return _desglose_desde(cur, prev, dim_col, top_n)
+
+def _vendedores_vacio() -> pd.DataFrame:
+    return pd.DataFrame(columns=["Vendedor","Ventas","Ventas_Cont","Ventas_Cred","Utilidad","SubTotal","Margen","TXNS","Ticket",
+                                 "YoY_Ventas","YoY_Utilidad","YoY_TXNS","YoY_Ticket","YoY_Margen_pp"])
+
+def _vendedores_desde(cur: pd.DataFrame, prev: pd.DataFrame, ventas_con_iva: bool, top_n: int) -> pd.DataFrame:
+    """Top N vendedores con YoY a partir de los agregados por Vendedor de cada periodo."""
+    for t in (cur, prev):
+        t["Margen"] = _div(t["Utilidad"], t["SubTotal"])
+        t["Ticket"] = _div(t["Ventas"] if ventas_con_iva else t["SubTotal"], t["TXNS"])
+    # SKUs por ticket: si no hay SKU, usa líneas por ticket
+    cur["SKUs_x_Ticket"] = _div(cur["SKU_UNQ"].where(cur["SKU_UNQ"] > 0, cur["Lineas"]), cur["TXNS"])
+
+    out = comparar_yoy(cur, prev, "Vendedor", pct=["Ventas", "Utilidad", "TXNS", "Ticket"], pp=["Margen"])
+    out = out.sort_values("Ventas", ascending=False, kind="stable").head(int(top_n)).reset_index(drop=True)
+    return out
+
+def vendor_metrics(df_cur: pd.DataFrame, df_prev: pd.DataFrame, ventas_con_iva: bool, top_n: int = 30) -> pd.DataFrame:
+    ventas_col = _ventas_col(ventas_con_iva)
+    if df_cur.empty:
+        return _vendedores_vacio()
+
+    def columnas(d: pd.DataFrame) -> Dict[str, object]:
+        ventas = d[ventas_col]
+        con_tipo = "Tipo2" in d.columns
+        return {
+            "Ventas": ventas,
+            "Ventas_Cont": ventas.where(d["Tipo2"] == "CONTADO", 0.0) if con_tipo else ventas,
+            "Ventas_Cred": ventas.where(d["Tipo2"] == "CREDITO", 0.0) if con_tipo else 0.0,
+            "Utilidad": d["Utilidad"],
+            "SubTotal": d["Sub Total"],
+            "DOC_ID": d["DOC_ID"],
+            "SKU_KEY": d["SKU_KEY"],
+        }
+
+    cur, prev = _agregar_actual_y_anterior(
+        df_cur, df_prev, "Vendedor_Nombre", columnas,
+        Ventas=("Ventas","sum"),
+        Ventas_Cont=("Ventas_Cont","sum"),
+        Ventas_Cred=("Ventas_Cred","sum"),
+        Utilidad=("Utilidad","sum"),
+        SubTotal=("SubTotal","sum"),
+        TXNS=("DOC_ID","nunique"),
+        Lineas=("DOC_ID","size"),
+        SKU_UNQ=("SKU_KEY","nunique"),
+    )
+    cur = cur.rename(columns={"Vendedor_Nombre":"Vendedor"})
+    prev = prev.rename(columns={"Vendedor_Nombre":"Vendedor"})[["Vendedor","Ventas","Utilidad","SubTotal","TXNS"]]
+    return _vendedores_desde(cur, prev, ventas_con_iva, top_n)
+
+def sumas_por(df: pd.DataFrame, por: Sequence[str], ventas_con_iva: bool) -> pd.DataFrame:
+    """Ventas, Utilidad y SubTotal por las columnas de por (groupby observado)."""
+    return (df.groupby(list(por), observed=True)
+              .agg(Ventas=(_ventas_col(ventas_con_iva),"sum"), Utilidad=("Utilidad","sum"), SubTotal=("Sub Total","sum"))
+              .reset_index())
+
+# ------------------------------------------------------------
+# Desde el cubo (misma salida que las funciones sobre DataFrames)
+# ------------------------------------------------------------
+def _canon_vendedores(cubo: Cubo) -> np.ndarray:
+    return _canon_nombres(cubo.serie_valores("Vendedor_Nombre"))
+
+def kpis_cubo(cubo: Cubo, celdas: np.ndarray, ventas_con_iva: bool, m2: float) -> Dict[str, float]:
+    if len(celdas) == 0:
+        return _kpis_vacios()
+    ventas_col = _ventas_col(ventas_con_iva)
+    tot = cubo.agregar(celdas, [], {"TXNS": "DOC_ID"}, {"Vendedores": ("Vendedor_Nombre", _canon_vendedores(cubo))}).iloc[0]
+    por_tipo = cubo.agregar(celdas, ["Tipo2"]).set_index("Tipo2")[ventas_col]
+    return _kpis_desde(float(tot[ventas_col]), float(por_tipo.get("CONTADO", 0.0)), float(por_tipo.get("CREDITO", 0.0)),
+                       float(tot["Sub Total"]), float(tot["Utilidad"]), float(tot["TXNS"]), float(tot["Descuento $"]),
+                       float(tot["Vendedores"]), ventas_con_iva, m2)
+
+def _agregar_mensual_cubo(cubo: Cubo, celdas: np.ndarray, por: List[str], ventas_con_iva: bool) -> pd.DataFrame:
+    """_agregar_mensual desde las celdas del cubo."""
+    ventas_col = _ventas_col(ventas_con_iva)
+    t = cubo.agregar(celdas, por, {"TXNS": "DOC_ID"}, {"Vendedores": ("Vendedor_Nombre", _canon_vendedores(cubo))}).set_index(por)
+    for col, tipo in (("Ventas_Cont", "CONTADO"), ("Ventas_Cred", "CREDITO")):
+        t_tipo = cubo.agregar(cubo.donde(celdas, "Tipo2", tipo), por).set_index(por)
+        t[col] = t_tipo[ventas_col].reindex(t.index).fillna(0.0)
+    return t.rename(columns={"Sub Total": "SubTotal", "Descuento $": "DescDol"})[_COLUMNAS_MENSUALES]
+
+def resumen_mensual_cubo(cubo: Cubo, celdas: np.ndarray, ventas_con_iva: bool) -> pd.DataFrame:
+    if len(celdas) == 0:
+        return _resumen_mensual_vacio()
+    return _resumen_mensual_desde(_agregar_mensual_cubo(cubo, celdas, ["Mes"], ventas_con_iva), ventas_con_iva)
+
+def resumen_periodos_cubo(cubo: Cubo, celdas: np.ndarray, year: int, m_start: int, m_end: int,
+                          ventas_con_iva: bool) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """resumen_periodos desde las celdas del cubo."""
+    tabla = _agregar_mensual_cubo(cubo, celdas, ["Año", "Mes"], ventas_con_iva)
+    return _ventana_y_anterior(tabla, year, m_start, m_end, ventas_con_iva)
+
+def desglose_cubo(cubo: Cubo, celdas: np.ndarray, celdas_prev: np.ndarray, dim_col: str,
+                  ventas_con_iva: bool, top_n: int = 20) -> pd.DataFrame:
+    if len(celdas) == 0:
+        return _desglose_vacio(dim_col)
+    ventas_col = _ventas_col(ventas_con_iva)
+    t = cubo.agregar(celdas, [dim_col], {"TXNS": "DOC_ID"})
+    cur = pd.DataFrame({dim_col: t[dim_col], "Ventas": t[ventas_col], "Utilidad": t["Utilidad"],
+                        "SubTotal": t["Sub Total"], "TXNS": t["TXNS"]})
+    t = cubo.agregar(celdas_prev, [dim_col], {"TXNS": "DOC_ID"})
+    prev = pd.DataFrame({dim_col: t[dim_col], "Ventas": t[ventas_col], "Utilidad": t["Utilidad"],
+                         "SubTotal": t["Sub Total"], "TXNS": t["TXNS"]})
+    return _desglose_desde(cur, prev, dim_col, top_n)
+
+def vendedores_cubo(cubo: Cubo, celdas: np.ndarray, celdas_prev: np.ndarray,
+                    ventas_con_iva: bool, top_n: int = 30) -> pd.DataFrame:
+    if len(celdas) == 0:
+        return _vendedores_vacio()
+    ventas_col = _ventas_col(ventas_con_iva)
+    dim = "Vendedor_Nombre"
+    t = cubo.agregar(celdas, [dim], {"TXNS": "DOC_ID", "SKU_UNQ": "SKU_KEY"})
+    cur = pd.DataFrame({"Vendedor": t[dim], "Ventas": t[ventas_col]})
+    for col, tipo in (("Ventas_Cont", "CONTADO"), ("Ventas_Cred", "CREDITO")):
+        t_tipo = cubo.agregar(cubo.donde(celdas, "Tipo2", tipo), [dim])
+        cur[col] = t[[dim]].merge(t_tipo[[dim, ventas_col]], on=dim, how="left")[ventas_col].fillna(0.0).to_numpy()
+    for col, origen in (("Utilidad", "Utilidad"), ("SubTotal", "Sub Total"), ("TXNS", "TXNS"), ("Lineas", "Lineas"), ("SKU_UNQ", "SKU_UNQ")):
+        cur[col] = t[origen]
+    t = cubo.agregar(celdas_prev, [dim], {"TXNS": "DOC_ID"})
+    prev = pd.DataFrame({"Vendedor": t[dim], "Ventas": t[ventas_col], "Utilidad": t["Utilidad"],
+                         "SubTotal": t["Sub Total"], "TXNS": t["TXNS"]})
+    return _vendedores_desde(cur, prev, ventas_con_iva, top_n)
+
+def sumas_cubo(cubo: Cubo, celdas: np.ndarray, por: Sequence[str], ventas_con_iva: bool) -> pd.DataFrame:
+    t = cubo.agregar(celdas, list(por))
+    return pd.DataFrame({**{d: t[d] for d in por}, "Ventas": t[_ventas_col(ventas_con_iva)],
+                         "Utilidad": t["Utilidad"], "SubTotal": t["Sub Total"]})
+
+# ------------------------------------------------------------
+# Análisis YoY (causas / alertas / recomendaciones)
+# ------------------------------------------------------------
+def analizar_cambios_yoy(k_cur: dict, k_prev: dict, ms_cur: pd.DataFrame, ms_prev: pd.DataFrame) -> dict:
+    """
+    Analiza cambios YoY y determina posibles causas
+    """
+    analisis = {
+        'cambio_ventas': 0,
+        'cambio_utilidad': 0,
+        'cambio_margen': 0,
+        'causas_identificadas': [],
+        'alertas': [],
+        'recomendaciones': []
+    }
+    
+    # Calcular cambios
+    if k_prev["ventas"] > 0:
+        analisis['cambio_ventas'] = ((k_cur["ventas"] - k_prev["ventas"]) / k_prev["ventas"]) * 100
+    
+    if k_prev["utilidad"] > 0:
+        analisis['cambio_utilidad'] = ((k_cur["utilidad"] - k_prev["utilidad"]) / k_prev["utilidad"]) * 100
+    
+    if pd.notna(k_prev["margen"]) and pd.notna(k_cur["margen"]):
+        analisis['cambio_margen'] = (k_cur["margen"] - k_prev["margen"]) * 100
+    
+    # ANÁLISIS DE CAUSAS
+    
+    # 1. Ventas bajaron pero utilidad subió = Mejora de margen
+    if analisis['cambio_ventas'] < 0 and analisis['cambio_utilidad'] > 0:
+        analisis['causas_identificadas'].append({
+            'tipo': 'positivo',
+            'titulo': '💰 Mejora de Rentabilidad',
+            'descripcion': f"Aunque las ventas bajaron {abs(analisis['cambio_ventas']):.1f}%, la utilidad subió {analisis['cambio_utilidad']:.1f}%. Esto indica mejor margen de ganancia."
+        })
+        analisis['recomendaciones'].append("✅ Mantener la estrategia actual de productos más rentables")
+    
+    # 2. Ventas subieron pero utilidad bajó = Problema de margen
+    elif analisis['cambio_ventas'] > 0 and analisis['cambio_utilidad'] < 0:
+        analisis['causas_identificadas'].append({
+            'tipo': 'alerta',
+            'titulo': '⚠️ Crecimiento No Rentable',
+            'descripcion': f"Las ventas subieron {analisis['cambio_ventas']:.1f}% pero la utilidad bajó {abs(analisis['cambio_utilidad']):.1f}%. Posible exceso de descuentos o cambio a productos menos rentables."
+        })
+        analisis['alertas'].append("⚠️ Revisar política de descuentos")
+        analisis['recomendaciones'].append("🔍 Analizar mix de productos vendidos vs año anterior")
+    
+    # 3. Ambos bajaron = Problema general
+    elif analisis['cambio_ventas'] < 0 and analisis['cambio_utilidad'] < 0:
+        if abs(analisis['cambio_utilidad']) > abs(analisis['cambio_ventas']) * 1.5:
+            analisis['causas_identificadas'].append({
+                'tipo': 'critico',
+                'titulo': '🚨 Caída Acelerada de Utilidad',
+                'descripcion': f"Ventas bajaron {abs(analisis['cambio_ventas']):.1f}% pero utilidad cayó {abs(analisis['cambio_utilidad']):.1f}%. El margen está empeorando."
+            })
+            analisis['alertas'].append("🚨 Urgente: Revisar estructura de costos")
+        else:
+            analisis['causas_identificadas'].append({
+                'tipo': 'neutral',
+                'titulo': '📉 Disminución Proporcional',
+                'descripcion': f"Ventas y utilidad bajaron proporcionalmente ({abs(analisis['cambio_ventas']):.1f}% y {abs(analisis['cambio_utilidad']):.1f}%). El margen se mantiene."
+            })
+    
+    # 4. Ambos subieron = Éxito
+    elif analisis['cambio_ventas'] > 0 and analisis['cambio_utilidad'] > 0:
+        if analisis['cambio_utilidad'] > analisis['cambio_ventas'] * 1.2:
+            analisis['causas_identificadas'].append({
+                'tipo': 'excelente',
+                'titulo': '🎉 Crecimiento Acelerado',
+                'descripcion': f"Ventas subieron {analisis['cambio_ventas']:.1f}% y utilidad {analisis['cambio_utilidad']:.1f}%. El margen está mejorando."
+            })
+            analisis['recomendaciones'].append("✅ Identificar qué productos están impulsando este crecimiento")
+        else:
+            analisis['causas_identificadas'].append({
+                'tipo': 'positivo',
+                'titulo': '📈 Crecimiento Saludable',
+                'descripcion': f"Ventas y utilidad crecieron en línea ({analisis['cambio_ventas']:.1f}% y {analisis['cambio_utilidad']:.1f}%)."
+            })
+    
+    # Análisis de transacciones vs ticket
+    if k_prev["txns"] > 0:
+        cambio_txns = ((k_cur["txns"] - k_prev["txns"]) / k_prev["txns"]) * 100
+        cambio_ticket = ((k_cur["ticket"] - k_prev["ticket"]) / k_prev["ticket"]) * 100 if k_prev["ticket"] > 0 else 0
+        
+        if cambio_txns < -10:
+            analisis['alertas'].append(f"⚠️ Transacciones cayeron {abs(cambio_txns):.1f}% - Menos clientes")
+            analisis['recomendaciones'].append("📢 Considerar campaña de atracción de clientes")
+        
+        if cambio_ticket > 15:
+            analisis['causas_identificadas'].append({
+                'tipo': 'positivo',
+                'titulo': '💳 Ticket Promedio Alto',
+                'descripcion': f"El ticket promedio subió {cambio_ticket:.1f}%. Los clientes están comprando más por visita."
+            })
+    
+    return analisis
+
+# ------------------------------------------------------------
+# Selección de filtros -> datos y agregados (perezosos)
+# ------------------------------------------------------------
+def m2_de(sucursal: str) -> float:
+    """m² de piso de venta de la sucursal (los de CONSOLIDADO si no está en M2_MAP)."""
+    return float(M2_MAP.get(sucursal, M2_MAP["CONSOLIDADO"]))
+
+def _unir_ventana(resumir: Callable[[int], pd.DataFrame], year: int, m_start: int, m_end: int) -> pd.DataFrame:
+    """Recorta a la ventana los resúmenes por año que da resumir(año)."""
+    if m_start < 1:
+        m_start_prev = m_start + 12
+        ms_prev_part = resumir(int(year) - 1)
+        ms_curr_part = resumir(int(year))
+        ms_prev_part = ms_prev_part[ms_prev_part["MesNum"] >= m_start_prev]
+        ms_curr_part = ms_curr_part[ms_curr_part["MesNum"] <= m_end]
+        # orden cronológico: primero año anterior, luego año actual
+        ms_cur = pd.concat([ms_prev_part, ms_curr_part], ignore_index=True)
+        return ms_cur.sort_values("MesNum", ascending=True).reset_index(drop=True)
+
+    ms_cur = resumir(int(year))
+    return ms_cur[ms_cur["MesNum"].between(m_start, m_end)]
+
+def resumen_ventana(df_ventana: pd.DataFrame, year: int, m_start: int, m_end: int,
+                    ventas_con_iva: bool) -> pd.DataFrame:
+    """
+    Resumen mensual de la ventana m_start..m_end del año elegido (filas de
+    apply_filters_ventana). Con m_start < 1 la ventana cruza al año anterior
+    (ej. Ene 2026 con m_start=-11: Feb 2025 a Ene 2026); cada año se resume por
+    separado para no sumar Ene 2025 con Ene 2026.
+    """
+    if m_start < 1:
+        anio = df_ventana["Año"].astype(int)
+        return _unir_ventana(lambda a: monthly_summary(df_ventana[anio == a], ventas_con_iva), year, m_start, m_end)
+    return _unir_ventana(lambda a: monthly_summary(df_ventana, ventas_con_iva), year, m_start, m_end)
+
+def meses_con_datos(df: pd.DataFrame, year: int) -> List[int]:
+    """Meses de year con al menos una fila (en df_all, desde la tabla de particiones)."""
+    part = particiones_de(df)
+    if part is not None:
+        return part.meses_de(year)
+    df_y = df[df["Año"].astype(int) == int(year)]
+    return sorted([int(m) for m in df_y["Mes"].dropna().unique()])
+
+@dataclass(frozen=True)
+class Filtros:
+    """Selección del sidebar. m_start < 1 = la ventana de meses cruza al año anterior."""
+    year: int
+    m_start: int
+    m_end: int
+    sucursal: str = "CONSOLIDADO"
+    familia: str = "TODAS"
+    marca: str = "TODAS"
+    ventas_con_iva: bool = True
+    include_rem: bool = False
+    excluir_credito: bool = False
+
+    @property
+    def m2(self) -> float:
+        return m2_de(self.sucursal)
+
+def _es_familia_otros(valores: pd.Series) -> np.ndarray:
+    return valores.astype("string").fillna("").str.strip().str.upper().eq("OTROS").to_numpy(dtype=bool)
+
+def _es_supervisor(valores: pd.Series) -> np.ndarray:
+    return _clean_text_series(valores).str.contains("SUPERVISOR", na=False).to_numpy(dtype=bool)
+
+# Exclusiones con nombre para los toggles de las páginas ("Incluir OTROS", "Omitir Supervisor"):
+# columna + predicado sobre sus valores. Sirve igual para filas de un df que para los valores del cubo.
+EXCLUSIONES: Dict[str, Tuple[str, Callable[[pd.Series], np.ndarray]]] = {
+    "OTROS": ("Familia_Nombre", _es_familia_otros),
+    "SUPERVISOR": ("Vendedor_Nombre", _es_supervisor),
+}
+
+def sin_excluidos(df: pd.DataFrame, excluir: Sequence[str]) -> pd.DataFrame:
+    """df sin las filas de las exclusiones nombradas (llaves de EXCLUSIONES)."""
+    for nombre in excluir:
+        col, es = EXCLUSIONES[nombre]
+        df = df[~es(df[col])]
+    return df
+
+class Periodo:
+    """
+    Datos de una selección de filtros sobre df_all. Nada se calcula al crearlo:
+    df_kpi, k_cur, ms... se arman la primera vez que se leen y quedan guardados.
+    Con version (la del Dataset), KPIs y resúmenes pasan por la caché de
+    consultas: en un acierto ni siquiera se filtra df_all. Si df_all tiene cubo
+    registrado, los agregados salen de sus celdas y df_kpi / df_prev solo se
+    arman si una página los pide.
+
+    excluir = nombres de EXCLUSIONES (ej. ("OTROS",)) en kpis / desglose /
+    vendedores / sumas.
+    """
+
+    def __init__(self, df_all: pd.DataFrame, filtros: Filtros, version: Optional[int] = None):
+        self.df_all = df_all
+        self.filtros = filtros
+        self.version = version
+
+    def _consulta(self, nombre: str, calcular):
+        if self.version is None:
+            return calcular()
+        return CONSULTAS.obtener((self.version, nombre, self.filtros), calcular)
+
+    def _filtrar(self, year: int, m_start: int, m_end: int) -> pd.DataFrame:
+        f = self.filtros
+        return apply_filters(self.df_all, int(year), int(m_start), int(m_end),
+                             f.sucursal, f.familia, f.marca, f.include_rem, f.excluir_credito)
+
+    def _filtrar_anio(self, year: int) -> pd.DataFrame:
+        f = self.filtros
+        return apply_filters_year(self.df_all, int(year), f.sucursal, f.familia, f.marca,
+                                  f.include_rem, f.excluir_credito)
+
+    # Datos del rango (y mismo rango del año anterior)
+    @cached_property
+    def df_kpi(self) -> pd.DataFrame:
+        return self._filtrar(self.filtros.year, self.filtros.m_start, self.filtros.m_end)
+
+    @cached_property
+    def df_prev(self) -> pd.DataFrame:
+        return self._filtrar(int(self.filtros.year) - 1, self.filtros.m_start, self.filtros.m_end)
+
+    # Datos del año completo (para gráfico histórico)
+    @cached_property
+    def df_year(self) -> pd.DataFrame:
+        return self._filtrar_anio(self.filtros.year)
+
+    @cached_property
+    def df_year_prev(self) -> pd.DataFrame:
+        return self._filtrar_anio(int(self.filtros.year) - 1)
+
+    # Ventana de meses (puede cruzar al año anterior): un solo tramo de df_all
+    @cached_property
+    def df_ventana(self) -> pd.DataFrame:
+        f = self.filtros
+        if f.m_start >= 1:
+            return self.df_kpi
+        return apply_filters_ventana(self.df_all, int(f.year), int(f.m_start), int(f.m_end),
+                                     f.sucursal, f.familia, f.marca, f.include_rem, f.excluir_credito)
+
+    # Celdas del cubo (None si df_all no tiene): mismo criterio que apply_filters
+    @cached_property
+    def cubo(self) -> Optional[Cubo]:
+        return cubo_de(self.df_all)
+
+    def _celdas(self, p_ini: int, p_fin: int, excluir: Sequence[str] = ()) -> np.ndarray:
+        f = self.filtros
+        igual = {}
+        if f.sucursal != "CONSOLIDADO":
+            igual["Almacen_CANON"] = f.sucursal
+        if f.familia != "TODAS":
+            igual["Familia_Nombre"] = f.familia
+        if f.marca != "TODAS":
+            igual["Marca_Nombre"] = f.marca
+        if not f.include_rem:
+            igual["es_rem"] = 0
+        if f.excluir_credito:
+            igual["Tipo2"] = "CONTADO"
+        return self.cubo.celdas(p_ini, p_fin, igual, dict(EXCLUSIONES[e] for e in excluir))
+
+    def _celdas_rango(self, anterior: bool, excluir: Sequence[str] = ()) -> np.ndarray:
+        """Celdas de df_kpi (o df_prev con anterior=True)."""
+        f = self.filtros
+        year = int(f.year) - 1 if anterior else int(f.year)
+        return self._celdas(clave_periodo(year, max(int(f.m_start), 1)), clave_periodo(year, min(int(f.m_end), 12)), excluir)
+
+    def _df_rango(self, anterior: bool, excluir: Sequence[str] = ()) -> pd.DataFrame:
+        return sin_excluidos(self.df_prev if anterior else self.df_kpi, excluir)
+
+    # Agregados con exclusiones (toggles de las páginas)
+    def kpis(self, excluir: Sequence[str] = (), anterior: bool = False) -> Dict[str, float]:
+        f = self.filtros
+        def calcular():
+            if self.cubo is not None:
+                return kpis_cubo(self.cubo, self._celdas_rango(anterior, excluir), f.ventas_con_iva, f.m2)
+            return kpis_from_df(self._df_rango(anterior, excluir), f.ventas_con_iva, f.m2)
+        return self._consulta(("kpis", tuple(excluir), anterior), calcular)
+
+    def desglose(self, dim_col: str, top_n: int = 20, excluir: Sequence[str] = ()) -> pd.DataFrame:
+        """breakdown_dim del rango contra el año anterior."""
+        f = self.filtros
+        def calcular():
+            if self.cubo is not None:
+                return desglose_cubo(self.cubo, self._celdas_rango(False, excluir), self._celdas_rango(True, excluir),
+                                     dim_col, f.ventas_con_iva, top_n)
+            return breakdown_dim(self._df_rango(False, excluir), self._df_rango(True, excluir), dim_col, f.ventas_con_iva, top_n)
+        return self._consulta(("desglose", dim_col, int(top_n), tuple(excluir)), calcular)
+
+    def vendedores(self, top_n: int = 30, excluir: Sequence[str] = ()) -> pd.DataFrame:
+        """vendor_metrics del rango contra el año anterior."""
+        f = self.filtros
+        def calcular():
+            if self.cubo is not None:
+                return vendedores_cubo(self.cubo, self._celdas_rango(False, excluir), self._celdas_rango(True, excluir),
+                                       f.ventas_con_iva, top_n)
+            return vendor_metrics(self._df_rango(False, excluir), self._df_rango(True, excluir), f.ventas_con_iva, top_n)
+        return self._consulta(("vendedores", int(top_n), tuple(excluir)), calcular)
+
+    def sumas(self, por: Sequence[str], excluir: Sequence[str] = (), anterior: bool = False) -> pd.DataFrame:
+        """Ventas / Utilidad / SubTotal del rango agrupados por las columnas de por."""
+        f = self.filtros
+        def calcular():
+            if self.cubo is not None:
+                return sumas_cubo(self.cubo, self._celdas_rango(anterior, excluir), por, f.ventas_con_iva)
+            return sumas_por(self._df_rango(anterior, excluir), por, f.ventas_con_iva)
+        return self._consulta(("sumas", tuple(por), tuple(excluir), anterior), calcular)
+
+    @cached_property
+    def k_cur(self) -> Dict[str, float]:
+        return self.kpis()
+
+    @cached_property
+    def k_prev(self) -> Dict[str, float]:
+        return self.kpis(anterior=True)
+
+    # Mensual de la ventana + año anterior completo (YoY mes a mes): una sola agregación
+    # por (Año, Mes) desde Enero del año anterior da los dos
+    @cached_property
+    def _mensual(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        f = self.filtros
+        ini, fin = clave_periodo(int(f.year) - 1, 1), clave_periodo(f.year, min(int(f.m_end), 12))
+        if self.cubo is not None:
+            return resumen_periodos_cubo(self.cubo, self._celdas(ini, fin), f.year, f.m_start, f.m_end, f.ventas_con_iva)
+        df = _filtrar_periodos(self.df_all, ini, fin, f.sucursal, f.familia, f.marca, f.include_rem, f.excluir_credito)
+        return resumen_periodos(df, f.year, f.m_start, f.m_end, f.ventas_con_iva)
+
+    @cached_property
+    def ms_cur(self) -> pd.DataFrame:
+        return self._consulta("ms_cur", lambda: self._mensual[0])
+
+    @cached_property
+    def ms_prev(self) -> pd.DataFrame:
+        return self._consulta("ms_prev", lambda: self._mensual[1])
+
+    @cached_property
+    def ms(self) -> pd.DataFrame:
+        return self._consulta("ms", lambda: add_yoy_monthly(self.ms_cur, self.ms_prev))
@@ -0,0 +1,224 @@
+"""
+Dataset enriquecido en disco con layout hive: Año=/Mes=/Almacen_CANON=/parte-0.parquet
+
+- Cada hoja es un solo archivo, ordenado por DOC_KEY, con diccionario (zstd).
+- Al leer, las hojas se recorren en orden (Año, Mes, Almacen_CANON), así que
+  df_all queda ordenado por periodo (Año*12 + Mes) y cada partición es un rango
+  contiguo de filas. Esa tabla de rangos (TablaParticiones) permite que
+  apply_filters tome solo las filas del año / meses / sucursal elegidos (por
+  searchsorted sobre el periodo) en vez de comparar todas.
+
+Herramienta de compactación (reescribe los parquets de entrada en este layout):
+    python -m imdc_core.particionado [--destino DIR]
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from .asociados import asociado, asociar
+
+COLUMNAS_PARTICION = ["Año", "Mes", "Almacen_CANON"]
+ESQUEMA_PARTICION = pa.schema([("Año", pa.int64()), ("Mes", pa.int64()), ("Almacen_CANON", pa.string())])
+_META = "_meta.json"
+
+
+_SIN_PERIODO = np.iinfo(np.int64).max  # Año/Mes nulos: al final, como en df_all
+
+
+def clave_periodo(anio: int, mes: int) -> int:
+    """Año*12 + Mes: meses consecutivos tienen claves consecutivas, también al cruzar de año."""
+    return int(anio) * 12 + int(mes)
+
+
+def _concatenar_rangos(ini: np.ndarray, fin: np.ndarray) -> np.ndarray:
+    """Posiciones de los tramos [ini, fin) una tras otra."""
+    if len(ini) == 0:
+        return np.empty(0, dtype=np.int64)
+    largos = fin - ini
+    # arange por tramo sin bucle: desplazamiento por fila + inicio de su tramo
+    base = np.repeat(ini - np.concatenate(([0], np.cumsum(largos)[:-1])), largos)
+    return base + np.arange(int(largos.sum()), dtype=np.int64)
+
+
+@dataclass(frozen=True)
+class TablaParticiones:
+    """
+    Rango de filas [ini, fin) de cada partición (Año, Mes, Almacen_CANON) dentro de df_all.
+    df_all está ordenado por periodo (Año*12 + Mes), así que cualquier ventana de
+    meses, aunque cruce de año, es un tramo contiguo de particiones (searchsorted).
+    """
+    anio: np.ndarray
+    mes: np.ndarray
+    almacen: np.ndarray
+    periodo: np.ndarray
+    ini: np.ndarray
+    fin: np.ndarray
+    filas: int
+    ordenada: bool = True  # periodo no decreciente (lo normal); si no, se filtra sin searchsorted
+
+    def _tramo(self, p_ini: int, p_fin: int):
+        """Particiones con periodo entre p_ini y p_fin: slice contiguo (o máscara si no está ordenada)."""
+        if not self.ordenada:
+            return (self.periodo >= p_ini) & (self.periodo <= p_fin)
+        i = int(np.searchsorted(self.periodo, p_ini, side="left"))
+        j = int(np.searchsorted(self.periodo, p_fin, side="right"))
+        return slice(i, max(i, j))
+
+    def filas_ventana(self, p_ini: int, p_fin: int, sucursal: Optional[str] = None) -> np.ndarray:
+        """Posiciones (iloc) de las filas con periodo entre p_ini y p_fin (clave_periodo), en orden."""
+        tramo = self._tramo(p_ini, p_fin)
+        if sucursal is None and isinstance(tramo, slice):
+            # todas las sucursales: un solo tramo de filas
+            if tramo.start == tramo.stop:
+                return np.empty(0, dtype=np.int64)
+            return np.arange(self.ini[tramo.start], self.fin[tramo.stop - 1], dtype=np.int64)
+        ini, fin = self.ini[tramo], self.fin[tramo]
+        if sucursal is not None:
+            sel = self.almacen[tramo] == sucursal
+            ini, fin = ini[sel], fin[sel]
+        return _concatenar_rangos(ini, fin)
+
+    def filas_de(self, anio: int, m_start: int, m_end: int, sucursal: Optional[str] = None) -> np.ndarray:
+        """Posiciones (iloc) de las filas de anio con Mes entre m_start y m_end, en orden."""
+        return self.filas_ventana(clave_periodo(anio, max(int(m_start), 1)),
+                                  clave_periodo(anio, min(int(m_end), 12)), sucursal)
+
+    def meses_de(self, anio: int) -> List[int]:
+        """Meses de anio con al menos una fila."""
+        return sorted({int(m) for m in self.mes[self._tramo(clave_periodo(anio, 1), clave_periodo(anio, 12))]})
+
+
+def _tabla_desde_df(df: pd.DataFrame) -> TablaParticiones:
+    """Arma la tabla de rangos de un df ya ordenado por COLUMNAS_PARTICION."""
+    if df.empty:
+        vacio = np.empty(0, dtype=np.int64)
+        return TablaParticiones(vacio, vacio, np.empty(0, dtype=object), vacio, vacio, vacio, 0)
+    # códigos por columna (NA -> -1) para detectar dónde cambia la partición
+    codigos = np.stack([pd.factorize(df[c])[0] for c in COLUMNAS_PARTICION], axis=1)
+    cambio = np.ones(len(df), dtype=bool)
+    cambio[1:] = (codigos[1:] != codigos[:-1]).any(axis=1)
+    ini = np.flatnonzero(cambio).astype(np.int64)
+    fin = np.append(ini[1:], len(df)).astype(np.int64)
+    anio = df["Año"].to_numpy(dtype="float64", na_value=np.nan)[ini]
+    mes = df["Mes"].to_numpy(dtype="float64", na_value=np.nan)[ini]
+    periodo = np.full(len(ini), _SIN_PERIODO, dtype=np.int64)
+    con_fecha = ~(np.isnan(anio) | np.isnan(mes))
+    periodo[con_fecha] = (anio[con_fecha] * 12 + mes[con_fecha]).astype(np.int64)
+    return TablaParticiones(
+        anio=anio, mes=mes,
+        almacen=df["Almacen_CANON"].to_numpy(dtype=object)[ini],
+        periodo=periodo, ini=ini, fin=fin, filas=len(df),
+        # Año con Mes nulo queda entre dos años al ordenar: ahí no vale el searchsorted
+        ordenada=bool((np.diff(periodo) >= 0).all()),
+    )
+
+
+# ------------------------------------------------------------
+# Registro df -> TablaParticiones (imdc_core.asociados)
+# ------------------------------------------------------------
+def registrar_particiones(df: pd.DataFrame, tabla: TablaParticiones) -> None:
+    """Asocia la tabla de rangos a este DataFrame (por identidad; copias no la heredan)."""
+    asociar(df, "particiones", tabla)
+
+
+def particiones_de(df: pd.DataFrame) -> Optional[TablaParticiones]:
+    """TablaParticiones de df si fue registrado y no cambió de largo; si no, None."""
+    return asociado(df, "particiones")
+
+
+# ------------------------------------------------------------
+# Escritura / lectura
+# ------------------------------------------------------------
+def ordenar_para_particion(df: pd.DataFrame) -> pd.DataFrame:
+    orden = [c for c in COLUMNAS_PARTICION + ["DOC_KEY"] if c in df.columns]
+    return df.sort_values(orden, kind="mergesort").reset_index(drop=True)
+
+
+def escribir_dataset(df: pd.DataFrame, destino: Path, meta: Optional[dict] = None) -> bool:
+    """
+    Escribe df (enriquecido) en layout hive bajo destino. Se escribe en un
+    directorio temporal y se renombra al final; _meta.json marca el dataset completo.
+    """
+    tmp = destino.with_name(destino.name + ".tmp")
+    try:
+        shutil.rmtree(tmp, ignore_errors=True)
+        df = ordenar_para_particion(df)
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+        fmt = ds.ParquetFileFormat()
+        ds.write_dataset(
+            tabla, tmp, format="parquet",
+            partitioning=ds.partitioning(ESQUEMA_PARTICION, flavor="hive"),
+            file_options=fmt.make_write_options(use_dictionary=True, compression="zstd"),
+            basename_template="parte-{i}.parquet",
+            max_rows_per_group=128 * 1024,
+            use_threads=False,  # conserva el orden por DOC_KEY dentro de cada hoja
+        )
+        info = dict(meta or {}, filas=int(len(df)), columnas=list(df.columns))
+        (tmp / _META).write_text(json.dumps(info, ensure_ascii=False), encoding="utf-8")
+        shutil.rmtree(destino, ignore_errors=True)
+        os.replace(tmp, destino)
+        return True
+    except Exception as e:
+        # Sin dataset en disco solo se pierde velocidad en la próxima carga
+        print(f"⚠️  No se pudo escribir el dataset particionado {destino.name}: {e}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        return False
+
+
+def leer_dataset(destino: Path) -> Optional[Tuple[pd.DataFrame, TablaParticiones]]:
+    """Lee el dataset hive completo en orden de partición; None si no existe o está incompleto."""
+    try:
+        info = json.loads((destino / _META).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    try:
+        dataset = ds.dataset(destino, format="parquet",
+                             partitioning=ds.partitioning(ESQUEMA_PARTICION, flavor="hive"))
+        frags = []
+        for frag in dataset.get_fragments():
+            k = ds.get_partition_keys(frag.partition_expression)
+            anio, mes = k.get("Año"), k.get("Mes")
+            frags.append(((anio is None, anio or 0, mes is None, mes or 0, k.get("Almacen_CANON") or ""), frag))
+        frags.sort(key=lambda x: x[0])
+        tablas = [f.to_table(schema=dataset.schema) for _, f in frags]
+        if not tablas:
+            return None
+        tabla = pa.concat_tables(tablas)
+        cols = [c for c in info.get("columnas", tabla.column_names) if c in tabla.column_names]
+        df = tabla.select(cols).to_pandas()
+    except Exception as e:
+        print(f"⚠️  Dataset particionado ilegible ({destino.name}): {e}")
+        return None
+    if len(df) != info.get("filas"):
+        return None
+    for c in ("Año", "Mes"):
+        df[c] = df[c].astype("Int64")
+    df["Almacen_CANON"] = df["Almacen_CANON"].fillna("")
+    return df, _tabla_desde_df(df)
+
+
+def _main() -> None:
+    import argparse
+
+    from .carga import construir_dataset
+
+    ap = argparse.ArgumentParser(description="Compacta los parquets de entrada en layout Año=/Mes=/Almacen_CANON=.")
+    ap.add_argument("--destino", type=Path, default=None,
+                    help="Directorio de salida (por defecto, el snapshot de CACHE_DIR que usa el dashboard).")
+    args = ap.parse_args()
+    destino, filas = construir_dataset(args.destino)
+    print(f"✅ {filas:,} filas escritas en {destino}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,100 @@
+"""
+Limpieza de texto / IDs usada por la ingesta y por las vistas.
+"""
+from __future__ import annotations
+
+import math
+import re
+import unicodedata
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+_ZW_CHARS_RE = re.compile(r"[\u200B-\u200D\u2060\uFEFF]")
+_NON_ALNUM_SPACE_RE = re.compile(r"[^A-Z0-9 ]+")
+_MULTI_SPACE_RE = re.compile(r"\s+")
+
+def _strip_accents(text: str) -> str:
+    nkfd = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in nkfd if not unicodedata.combining(ch))
+
+def _clean_text_scalar(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float) and (math.isnan(v) or math.isinf(v)):
+        return ""
+    s = str(v)
+    s = (
+        s.replace("\u00A0", " ")
+         .replace("\u2007", " ")
+         .replace("\u202F", " ")
+    )
+    s = _ZW_CHARS_RE.sub("", s)
+    s = _strip_accents(s).upper()
+    s = s.replace(".", " ").replace("-", " ").replace("_", " ").replace("/", " ")
+    s = _NON_ALNUM_SPACE_RE.sub(" ", s)
+    s = _MULTI_SPACE_RE.sub(" ", s).strip()
+    return s
+
+# Memos entre archivos (por proceso): texto crudo -> limpio / -> sucursal canónica.
+# Las columnas de texto tienen pocos valores distintos, así que tras el primer
+# archivo casi todo sale de aquí.
+_MEMO_LIMPIO: Dict[str, str] = {}
+_MEMO_ALMACEN: Dict[str, str] = {}
+_MEMO_MAX = 500_000
+
+def _por_unicos(s: pd.Series, fn: Callable[[str], str], memo: Dict[str, str]) -> pd.Series:
+    """
+    Aplica fn solo a los valores únicos de s (vía factorize + memo) y los
+    reparte por código. Mismo resultado que s.astype("string").fillna("").map(fn).
+    """
+    ss = s.astype("string").fillna("")
+    if ss.empty:
+        return ss.map(fn)
+    codes, uniques = pd.factorize(ss)
+    limpios = np.empty(len(uniques), dtype=object)
+    for i, u in enumerate(uniques):
+        r = memo.get(u)
+        if r is None:
+            r = fn(u)
+            if len(memo) < _MEMO_MAX:
+                memo[u] = r
+        limpios[i] = r
+    return pd.Series(limpios.take(codes), index=s.index, name=s.name, dtype=object)
+
+def _clean_text_series(s: pd.Series) -> pd.Series:
+    return _por_unicos(s, _clean_text_scalar, _MEMO_LIMPIO)
+
+
+def _normalize_id_series(s: pd.Series) -> pd.Series:
+    """Normaliza IDs que a veces vienen como float (1.0) o string ('1.0').
+    Regla:
+      - si es numérico entero -> '1'
+      - si no, deja string limpio
+    """
+    ss = s.astype("string").fillna("").str.strip()
+    # intento numérico
+    num = pd.to_numeric(ss.str.replace(",", ".", regex=False), errors="coerce")
+    is_int = num.notna() & np.isfinite(num) & (np.abs(num - np.round(num)) < 1e-9)
+    out = ss.copy()
+    out.loc[is_int] = np.round(num.loc[is_int]).astype("int64").astype("string")
+    # limpia cosas tipo '001' -> '1' solo si era numérico
+    return out
+
+def _canon_almacen(t: str) -> str:
+    if "SAN AGUST" in t:
+        return "SAN AGUST"
+    if "ILUST" in t:
+        return "H ILUSTRES"
+    if "EXPRES" in t:
+        return "EXPRESS"
+    if t.startswith("H "):
+        return "H ILUSTRES"
+    if t in ("GRAL", "GENERAL"):
+        return "GENERAL"
+    return t
+
+def normalize_almacen(s: pd.Series) -> pd.Series:
+    # limpieza + canon en una sola pasada por valor único
+    return _por_unicos(s, lambda v: _canon_almacen(_clean_text_scalar(v)), _MEMO_ALMACEN)
@@ -1,10 +1,18 @@
 import streamlit as st
 from utils import *
+from utils import _pill_pct, _pill_pp
 
 if "authenticated" not in st.session_state or not st.session_state.authenticated:
     st.warning("⚠️ Debes iniciar sesión primero")
     st.stop()
 
+p = iniciar_pagina()
+f = p.filtros
+year, m_start, m_end, sucursal, ventas_con_iva = f.year, f.m_start, f.m_end, f.sucursal, f.ventas_con_iva
+k_cur, k_prev, ms_cur, ms_prev, df_kpi = p.k_cur, p.k_prev, p.ms_cur, p.ms_prev, p.df_kpi
+
+render_hero(p)
+
 st.title("🎯 Comando Central")
 
 
@@ -61,8 +69,8 @@ if not df_kpi.empty and "Vendedor_Nombre" in df_kpi.columns:
     ventas_col_v = "Total_alloc" if ventas_con_iva else "Sub Total"
     _vdf = df_kpi.groupby("Vendedor_Nombre", observed=True).agg(
         Ventas=(ventas_col_v,"sum"), Utilidad=("Utilidad","sum"),
-        Txns=("DOC_KEY","nunique")).reset_index()
-    _vdf = _vdf[_vdf["Vendedor_Nombre"].fillna("").str.strip().ne("")]
+        Txns=("DOC_ID","nunique")).reset_index()
+    _vdf = _vdf[_vdf["Vendedor_Nombre"].astype("string").fillna("").str.strip().ne("")]
     _vdf = _vdf[~_vdf["Vendedor_Nombre"].str.upper().isin(["TODOS","SUPERVISOR"])]
     if len(_vdf) > 0:
         colA, colB = st.columns(2)
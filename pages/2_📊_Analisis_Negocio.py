@@ -1,10 +1,16 @@
 import streamlit as st
 from utils import *
+from utils import _pill_pct, _pill_pp
 
 if "authenticated" not in st.session_state or not st.session_state.authenticated:
     st.warning("⚠️ Debes iniciar sesión primero")
     st.stop()
 
+p = iniciar_pagina()
+f = p.filtros
+ventas_con_iva = f.ventas_con_iva
+k_cur, k_prev, ms = p.k_cur, p.k_prev, p.ms
+
 st.title("📊 Análisis de Negocio")
 
 sub_ventas, sub_mix, sub_equipo = st.tabs([
@@ -73,26 +79,20 @@ with sub_mix:
     with cols[4]: cls,txt=_pill_pp(d_cred_pp);    kpi_card("% Crédito",    pct_fmt(cred_share) if pd.notna(cred_share) else "—",txt,cls)
 
     include_otros_mix = st.toggle("Incluir familia OTROS", value=False, key="mix_otros_neg")
-    df_mix     = df_kpi.copy()
-    df_mix_prev = df_prev.copy()
-    if not include_otros_mix:
-        _m = df_mix["Familia_Nombre"].fillna("").str.strip().str.upper().eq("OTROS")
-        df_mix = df_mix.loc[~_m].copy()
-        _m2 = df_mix_prev["Familia_Nombre"].fillna("").str.strip().str.upper().eq("OTROS")
-        df_mix_prev = df_mix_prev.loc[~_m2].copy()
+    excluir_mix = () if include_otros_mix else ("OTROS",)
 
     st.markdown("### Top 20 — Familias vs Marcas")
     colA, colB = st.columns(2, gap="large")
 
     with colA:
-        fam_rank = breakdown_dim(df_mix, df_mix_prev, "Familia_Nombre", ventas_con_iva, top_n=20)
+        fam_rank = p.desglose("Familia_Nombre", 20, excluir_mix)
         if fam_rank.empty: st.warning("Sin datos de familias.")
         else:
             st.plotly_chart(fig_bars_line_rank(fam_rank.rename(columns={"Familia_Nombre":"Familia"}),
                 "Familia", ventas_con_iva, "Top 20 Familias"), use_container_width=True)
 
     with colB:
-        marca_rank = breakdown_dim(df_mix, df_mix_prev, "Marca_Nombre", ventas_con_iva, top_n=20)
+        marca_rank = p.desglose("Marca_Nombre", 20, excluir_mix)
         if marca_rank.empty: st.warning("Sin datos de marcas.")
         else:
             st.plotly_chart(fig_bars_line_rank(marca_rank.rename(columns={"Marca_Nombre":"Marca"}),
@@ -125,19 +125,14 @@ with sub_mix:
         key="treemap_modo"
     )
 
-    if not df_mix.empty:
-        ventas_col_tm = _ventas_col(ventas_con_iva)
-
-        # Calcular ventas actuales
-        tm = (df_mix.groupby(["Familia_Nombre","Marca_Nombre"], observed=True)
-                    .agg(Ventas=(ventas_col_tm,"sum"),
-                         Utilidad=("Utilidad","sum"))
-                    .reset_index())
+    # Calcular ventas actuales
+    niveles_tm = ["Familia_Nombre","Marca_Nombre"]
+    tm = p.sumas(niveles_tm, excluir_mix)[niveles_tm + ["Ventas","Utilidad"]]
 
+    if not tm.empty:
         # Calcular ventas año anterior para variación
-        tm_prev = (df_mix_prev.groupby(["Familia_Nombre","Marca_Nombre"], observed=True)
-                              .agg(Ventas_LY=(ventas_col_tm,"sum"))
-                              .reset_index())
+        sumas_prev = p.sumas(niveles_tm, excluir_mix, anterior=True)
+        tm_prev = sumas_prev[niveles_tm + ["Ventas"]].rename(columns={"Ventas":"Ventas_LY"})
 
         tm = tm.merge(tm_prev, on=["Familia_Nombre","Marca_Nombre"], how="left")
         tm["Ventas_LY"] = tm["Ventas_LY"].fillna(0)
@@ -150,14 +145,12 @@ with sub_mix:
             # YoY por concepto
             tm["YoY_Ventas"] = ((tm["Ventas"] - tm["Ventas_LY"]) / tm["Ventas_LY"].replace(0, float("nan"))) * 100
 
-            tm_util_prev = (df_mix_prev.groupby(["Familia_Nombre","Marca_Nombre"], observed=True)
-                                       .agg(Utilidad_LY=("Utilidad","sum")).reset_index())
+            tm_util_prev = sumas_prev[niveles_tm + ["Utilidad"]].rename(columns={"Utilidad":"Utilidad_LY"})
             tm = tm.merge(tm_util_prev, on=["Familia_Nombre","Marca_Nombre"], how="left")
             tm["Utilidad_LY"] = tm["Utilidad_LY"].fillna(0)
             tm["YoY_Utilidad"] = ((tm["Utilidad"] - tm["Utilidad_LY"]) / tm["Utilidad_LY"].replace(0, float("nan"))) * 100
 
-            tm_marc_prev = (df_mix_prev.groupby(["Familia_Nombre","Marca_Nombre"], observed=True)
-                                       .agg(Sub_LY=("Sub Total","sum")).reset_index())
+            tm_marc_prev = sumas_prev[niveles_tm + ["SubTotal"]].rename(columns={"SubTotal":"Sub_LY"})
             tm = tm.merge(tm_marc_prev, on=["Familia_Nombre","Marca_Nombre"], how="left")
             tm["Margen_LY"] = (tm["Utilidad_LY"] / tm["Sub_LY"].replace(0, float("nan")) * 100)
             tm["YoY_Margen_pp"] = tm["Margen"] - tm["Margen_LY"]
@@ -273,18 +266,12 @@ with sub_mix:
 # ── SUB-TAB: EQUIPO DE VENTAS ─────────────────────────────
 with sub_equipo:
     omit_supervisor = st.toggle("Omitir Supervisor", value=True, key="omit_sup_neg")
-    df_p = df_kpi.copy()
-    df_p_prev = df_prev.copy()
-    if omit_supervisor:
-        _m = _clean_text_series(df_p["Vendedor_Nombre"]).str.contains("SUPERVISOR", na=False)
-        df_p = df_p[~_m]
-        _m2 = _clean_text_series(df_p_prev["Vendedor_Nombre"]).str.contains("SUPERVISOR", na=False)
-        df_p_prev = df_p_prev[~_m2]
-
-    vend_count      = count_vendedores_activos(df_p)
-    vend_count_prev = count_vendedores_activos(df_p_prev)
-    k_p      = kpis_from_df(df_p,      ventas_con_iva, m2)
-    k_p_prev = kpis_from_df(df_p_prev, ventas_con_iva, m2)
+    excluir_eq = ("SUPERVISOR",) if omit_supervisor else ()
+
+    k_p      = p.kpis(excluir_eq)
+    k_p_prev = p.kpis(excluir_eq, anterior=True)
+    vend_count      = int(k_p["vendedores"])
+    vend_count_prev = int(k_p_prev["vendedores"])
 
     ventas_x_emp      = safe_div(k_p["ventas"],      vend_count)      if vend_count      else np.nan
     ventas_x_emp_prev = safe_div(k_p_prev["ventas"], vend_count_prev) if vend_count_prev else np.nan
@@ -305,7 +292,7 @@ with sub_equipo:
     with cols[3]: cls,txt=_pill_pct(yoy(util_x_emp,util_x_emp_prev));     kpi_card("Utilidad/Empleado",money_fmt(util_x_emp) if pd.notna(util_x_emp)   else "—",txt,cls)
     with cols[4]: cls,txt=_pill_pp(d_marg_emp_pp);                        kpi_card("Margen/Empleado", pct_fmt(margen_emp)   if pd.notna(margen_emp)    else "—",txt,cls)
 
-    vdf = vendor_metrics(df_p, df_p_prev, ventas_con_iva, top_n=30)
+    vdf = p.vendedores(30, excluir_eq)
     if vdf.empty:
         st.warning("Sin datos de vendedores.")
     else:
@@ -1,10 +1,16 @@
 import streamlit as st
 from utils import *
+from utils import _ventas_col
 
 if "authenticated" not in st.session_state or not st.session_state.authenticated:
     st.warning("⚠️ Debes iniciar sesión primero")
     st.stop()
 
+p = iniciar_pagina()
+f = p.filtros
+df_all, year, ventas_con_iva = p.df_all, f.year, f.ventas_con_iva
+df_kpi, df_year, ms_cur = p.df_kpi, p.df_year, p.ms_cur
+
 st.title("🔬 Análisis Avanzado")
 
 st.markdown("""
@@ -77,55 +77,70 @@ def check_password():
 
 @st.cache_resource(show_spinner=False)
 def download_from_drive():
-    """Descarga datos con timeout de 30 segundos"""
+    """
+    Sincroniza los parquets de Drive a /tmp/imdc_data (ver imdc_core.drive):
+    listado paginado, solo archivos con md5 distinto, descarga por chunks a
+    temporal + rename, varios archivos en paralelo.
+    Después de la primera sync arranca el refresco en segundo plano (imdc_core.dataset),
+    que repite la sync y publica una versión nueva de df_all sin bloquear a nadie.
+    Con IMDC_DRIVE_LOCAL=<carpeta> se usa esa carpeta como Drive (sin red ni secrets).
+    """
     if "data_downloaded" in st.session_state:
         return
     
     with st.spinner("📥 Descargando datos..."):
         try:
-            from google.oauth2 import service_account
-            from googleapiclient.discovery import build
-            from googleapiclient.http import MediaIoBaseDownload
-            import io
+            from imdc_core.drive import DescargaLocal, ServicioDriveLocal, sincronizar
             
-            if "gcp_service_account" not in st.secrets or "gdrive_folder_id" not in st.secrets:
-                st.error("❌ Configura secrets")
-                st.stop()
-            
-            credentials = service_account.Credentials.from_service_account_info(
-                st.secrets["gcp_service_account"],
-                scopes=["https://www.googleapis.com/auth/drive.readonly"]
-            )
+            data_dir = Path("/tmp/imdc_data")
+            # Antes de cualquier import que cargue imdc_core.config: fija OUTPUT_DIR / CACHE_DIR
+            # al importarse y solo toma IMDC_DATA_DIR si la carpeta ya existe
+            data_dir.mkdir(parents=True, exist_ok=True)
+            os.environ["IMDC_DATA_DIR"] = str(data_dir)
+            carpeta_local = os.environ.get("IMDC_DRIVE_LOCAL", "")
             
-            service = build('drive', 'v3', credentials=credentials, cache_discovery=False)
-            folder_id = st.secrets["gdrive_folder_id"]
+            if carpeta_local:
+                crear_servicio = lambda: ServicioDriveLocal(Path(carpeta_local))
+                folder_id = carpeta_local
+                downloader_cls = DescargaLocal
+            else:
+                from imdc_core.arranque import medido
+                
+                with medido("googleapiclient"):
+                    from google.oauth2 import service_account
+                    from googleapiclient.discovery import build
+                
+                if "gcp_service_account" not in st.secrets or "gdrive_folder_id" not in st.secrets:
+                    st.error("❌ Configura secrets")
+                    st.stop()
+                
+                credentials = service_account.Credentials.from_service_account_info(
+                    st.secrets["gcp_service_account"],
+                    scopes=["https://www.googleapis.com/auth/drive.readonly"]
+                )
+                # Un servicio por hilo de descarga (httplib2 no es thread-safe)
+                crear_servicio = lambda: build('drive', 'v3', credentials=credentials, cache_discovery=False)
+                folder_id = st.secrets["gdrive_folder_id"]
+                downloader_cls = None
             
-            data_dir = Path("/tmp/imdc_data")
-            data_dir.mkdir(exist_ok=True)
+            def _sincronizar():
+                # Solo baja lo que cambió en Drive (md5Checksum en data_dir/.drive_sync.json)
+                res = sincronizar(crear_servicio, folder_id, data_dir, downloader_cls=downloader_cls)
+                # Invalidar solo las particiones de lo que cambió; lo demás conserva su caché
+                cambiados = [a["name"] for a in res["descargados"]] + res["eliminados"]
+                if cambiados:
+                    from imdc_core.carga import invalidar_archivos
+                    invalidar_archivos(cambiados)
+                return res
             
-            query = f"'{folder_id}' in parents and name contains '.parquet' and trashed=false"
-            results = service.files().list(q=query, fields="files(id, name)", pageSize=10).execute()
-            files = results.get('files', [])
+            res = _sincronizar()
             
-            if not files:
+            if not res["archivos"]:
                 st.error("❌ No hay .parquet en Drive")
                 st.stop()
             
-            for file in files:
-                file_path = data_dir / file['name']
-                if file_path.exists() and (time.time() - file_path.stat().st_mtime) < 7200:  # 2 horas
-                    continue
-                
-                request = service.files().get_media(fileId=file['id'])
-                fh = io.BytesIO()
-                downloader = MediaIoBaseDownload(fh, request)
-                done = False
-                while not done:
-                    status, done = downloader.next_chunk()
-                with open(file_path, 'wb') as f:
-                    f.write(fh.getvalue())
-            
-            os.environ["IMDC_DATA_DIR"] = str(data_dir)
+            from imdc_core.dataset import iniciar_refresco
+            iniciar_refresco(_sincronizar)
             st.session_state.data_downloaded = True
             
         except Exception as e:
@@ -0,0 +1,61 @@
+"""Datos sintéticos compartidos: un df_all chico con la forma del real."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from imdc_core.cubo import construir_cubo, registrar_cubo
+from imdc_core.dataset import congelar
+from imdc_core.indice import construir_indice, registrar_indice
+from imdc_core.particionado import _tabla_desde_df, ordenar_para_particion, registrar_particiones
+
+SUCURSALES = ["GENERAL", "EXPRESS", "ADELITAS"]
+FAMILIAS = ["FERRETERIA", "PINTURA", " otros ", None]
+MARCAS = ["TRUPER", "COMEX", "URREA"]
+VENDEDORES = ["ANA", "LUIS", " ana ", "SUPERVISOR NORTE", "TODOS", None]
+
+
+def ventas_sinteticas(n: int = 6_000, seed: int = 0) -> pd.DataFrame:
+    """
+    Líneas de venta de 2023-2024 ordenadas como df_all. Marzo de 2023 no tiene
+    ventas (mes faltante en el año anterior) y los valores incluyen OTROS,
+    SUPERVISOR, TODOS y nulos en las dimensiones.
+    """
+    rng = np.random.default_rng(seed)
+    anio = rng.choice([2023, 2024], n)
+    mes = rng.integers(1, 13, n)
+    mes[(anio == 2023) & (mes == 3)] = 4
+    doc = rng.integers(0, n // 4, n)
+    df = pd.DataFrame({
+        "Año": anio,
+        "Mes": mes,
+        "Almacen_CANON": pd.Categorical(rng.choice(SUCURSALES, n)),
+        "Familia_Nombre": pd.Categorical(rng.choice(np.array(FAMILIAS, dtype=object), n)),
+        "Marca_Nombre": pd.Categorical(rng.choice(MARCAS, n)),
+        "Vendedor_Nombre": pd.Categorical(rng.choice(np.array(VENDEDORES, dtype=object), n)),
+        "Tipo2": pd.Categorical(rng.choice(["CONTADO", "CREDITO"], n, p=[0.7, 0.3])),
+        "es_rem": (rng.random(n) < 0.1).astype(np.int64),
+        "Total_alloc": rng.gamma(2.0, 50.0, n),
+        "Descuento $": rng.random(n) * 5,
+        "DOC_KEY": pd.array([f"{a}|{m}|{d}" for a, m, d in zip(anio, mes, doc)], dtype="string[python]"),
+        "SKU_KEY": pd.array(rng.choice([f"A{i}" for i in range(40)], n), dtype="string[python]"),
+    })
+    df["DOC_ID"] = pd.factorize(df["DOC_KEY"])[0].astype(np.int64)
+    df["Sub Total"] = df["Total_alloc"] / 1.16
+    df["Utilidad"] = df["Sub Total"] * rng.uniform(0.1, 0.4, n)
+    return ordenar_para_particion(df)
+
+
+def compartido(df: pd.DataFrame) -> pd.DataFrame:
+    """df congelado con particiones, índice y cubo registrados, como dataset._construir."""
+    df = congelar(df)
+    registrar_particiones(df, _tabla_desde_df(df))
+    registrar_indice(df, construir_indice(df))
+    registrar_cubo(df, construir_cubo(df, error_distintos=0.0))
+    return df
+
+
+@pytest.fixture(scope="module")
+def ventas():
+    """(df_all compartido con cubo, mismo df como DataFrame plano sin nada registrado)."""
+    df = ventas_sinteticas()
+    return compartido(df.copy()), df
@@ -0,0 +1,81 @@
+"""imdc_core.cubo: Periodo da lo mismo desde el cubo que filtrando y agrupando líneas."""
+import gc
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import compartido, ventas_sinteticas
+from imdc_core import asociados
+from imdc_core.cubo import cubo_de
+from imdc_core.metricas import Filtros, Periodo
+
+EXCLUIR = [(), ("OTROS",), ("SUPERVISOR",), ("OTROS", "SUPERVISOR")]
+
+FILTROS = [
+    Filtros(2024, 1, 12),
+    Filtros(2024, 2, 6, sucursal="GENERAL"),
+    Filtros(2024, -11, 1),                      # ventana que cruza al año anterior
+    Filtros(2024, -3, 4, familia="PINTURA", include_rem=True),
+    Filtros(2024, 1, 12, marca="COMEX", excluir_credito=True),
+    Filtros(2023, 1, 12, sucursal="EXPRESS"),  # año anterior sin datos
+]
+
+
+def _igual(a, b):
+    if isinstance(a, dict):
+        assert a.keys() == b.keys()
+        for k in a:
+            assert (pd.isna(a[k]) and pd.isna(b[k])) or np.isclose(a[k], b[k], rtol=1e-9), (k, a[k], b[k])
+        return
+    pd.testing.assert_frame_equal(a.reset_index(drop=True), b.reset_index(drop=True),
+                                  check_exact=False, rtol=1e-9)
+
+
+def test_registro(ventas):
+    compartido, plano = ventas
+    assert cubo_de(compartido) is not None
+    assert cubo_de(plano) is None
+    assert cubo_de(compartido.copy()) is None
+
+
+def test_registro_unico_se_libera_con_el_df():
+    df = compartido(ventas_sinteticas(500))
+    clave = id(df)
+    assert set(asociados._REGISTRO[clave][1]) == {"particiones", "indice", "cubo"}
+    del df
+    gc.collect()
+    assert clave not in asociados._REGISTRO
+
+
+@pytest.mark.parametrize("f", FILTROS, ids=str)
+def test_resumen_mensual(ventas, f):
+    compartido, plano = ventas
+    p, q = Periodo(compartido, f), Periodo(plano, f)
+    _igual(p.ms_cur, q.ms_cur)
+    _igual(p.ms_prev, q.ms_prev)
+    _igual(p.ms, q.ms)
+
+
+@pytest.mark.parametrize("f, excluir", list(itertools.product(FILTROS, EXCLUIR)), ids=str)
+def test_agregados(ventas, f, excluir):
+    compartido, plano = ventas
+    p, q = Periodo(compartido, f), Periodo(plano, f)
+    _igual(p.kpis(excluir), q.kpis(excluir))
+    _igual(p.kpis(excluir, anterior=True), q.kpis(excluir, anterior=True))
+    for dim in ("Familia_Nombre", "Marca_Nombre", "Almacen_CANON"):
+        _igual(p.desglose(dim, 20, excluir), q.desglose(dim, 20, excluir))
+    _igual(p.desglose("Marca_Nombre", 2, excluir), q.desglose("Marca_Nombre", 2, excluir))
+    _igual(p.vendedores(30, excluir), q.vendedores(30, excluir))
+    _igual(p.vendedores(2, excluir), q.vendedores(2, excluir))
+    _igual(p.sumas(["Familia_Nombre", "Marca_Nombre"], excluir), q.sumas(["Familia_Nombre", "Marca_Nombre"], excluir))
+    _igual(p.sumas(["Mes"], excluir, anterior=True), q.sumas(["Mes"], excluir, anterior=True))
+
+
+def test_exclusiones_quitan_filas(ventas):
+    compartido, _ = ventas
+    p = Periodo(compartido, Filtros(2024, 1, 12))
+    assert p.kpis(("OTROS",))["ventas"] < p.kpis()["ventas"]
+    assert p.kpis(("SUPERVISOR",))["ventas"] < p.kpis()["ventas"]
+    assert "SUPERVISOR NORTE" not in set(p.vendedores(30, ("SUPERVISOR",))["Vendedor"].astype(str))
@@ -0,0 +1,74 @@
+"""imdc_core.dataset: df_all congelado admite lecturas y rechaza mutaciones."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from imdc_core.dataset import DataFrameCompartido, MutacionDataset, congelar
+
+
+def _congelado(n=2_000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "Periodo": np.repeat(np.arange(202301, 202301 + n // 100), 100)[:n],
+        "Sucursal": pd.Categorical(rng.choice(["CENTRO", "NORTE", "SUR"], n)),
+        "Vendedor": pd.array(rng.choice(["ANA", "LUIS", "OTROS"], n), dtype="string[python]"),
+        "Cliente": rng.choice(["C1", "C2", "C3", "C4"], n).astype(object),
+        "Cantidad": pd.array(rng.integers(0, 5, n), dtype="Int64"),
+        "Venta": rng.random(n) * 100,
+    })
+    return congelar(df)
+
+
+def test_lecturas_sobre_el_congelado():
+    df = _congelado()
+    assert isinstance(df, DataFrameCompartido)
+
+    # slices y concat
+    partes = pd.concat([df.head(), df.tail()])
+    assert len(partes) == 10 and type(partes) is pd.DataFrame
+    assert len(df.iloc[:1000]) == 1000 and len(df.loc[df["Venta"] > 50]) > 0
+    assert df.at[0, "Vendedor"] == df["Vendedor"].iloc[0]
+
+    # merge por columna string y por categórica
+    metas = pd.DataFrame({"Vendedor": ["ANA", "LUIS"], "Meta": [1.0, 2.0]})
+    m = df.iloc[:1000].merge(metas, on="Vendedor", how="left")
+    assert len(m) == 1000
+    assert m["Meta"].isna().sum() == (df["Vendedor"].iloc[:1000] == "OTROS").sum()
+    assert len(df.iloc[:500].merge(df.iloc[:10][["Sucursal"]].drop_duplicates(), on="Sucursal")) > 0
+
+    # groupby (categórica, string y object) y memoria
+    g = df.groupby(["Sucursal", "Vendedor"], observed=True)["Venta"].sum()
+    assert np.isclose(g.sum(), df["Venta"].sum())
+    assert df.groupby("Cliente")["Cantidad"].sum().sum() == df["Cantidad"].sum()
+    assert df.memory_usage(deep=True).sum() > 0
+
+    # los derivados son DataFrames normales y se pueden modificar
+    copia = df.iloc[:10].copy()
+    copia["Venta"] = 0.0
+    copia.loc[0, "Vendedor"] = "NUEVO"
+    assert copia["Venta"].sum() == 0
+
+
+@pytest.mark.parametrize("mutar", [
+    lambda df: df.__setitem__("Venta", 0.0),
+    lambda df: df.__delitem__("Venta"),
+    lambda df: df.drop(columns="Venta", inplace=True),
+    lambda df: df.loc.__setitem__((0, "Vendedor"), "X"),
+    lambda df: df.loc.__setitem__((0, "Cliente"), "X"),
+    lambda df: df.iloc.__setitem__((0, 0), 1),
+    lambda df: df.at.__setitem__((0, "Venta"), 1.0),
+    lambda df: df.iat.__setitem__((0, 3), "X"),
+])
+def test_mutaciones_rechazadas(mutar):
+    df = _congelado()
+    antes = df.copy()
+    with pytest.raises(MutacionDataset):
+        mutar(df)
+    pd.testing.assert_frame_equal(pd.DataFrame(df), antes)
+
+
+def test_buffers_numericos_de_solo_lectura():
+    df = _congelado()
+    assert not df["Venta"].to_numpy().flags.writeable
+    with pytest.raises(ValueError):
+        df["Venta"].to_numpy()[0] = 1.0
@@ -0,0 +1,131 @@
+"""imdc_core.metricas: breakdown_dim / vendor_metrics en una pasada contra groupby por periodo."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from imdc_core.metricas import (
+    _agregar_actual_y_anterior, _desglose_desde, _vendedores_desde, breakdown_dim, vendor_metrics,
+)
+
+_AGG = dict(Ventas=("Ventas", "sum"), Utilidad=("Utilidad", "sum"), SubTotal=("SubTotal", "sum"),
+            TXNS=("DOC_ID", "nunique"), Lineas=("DOC_ID", "size"), SKU_UNQ=("SKU_KEY", "nunique"))
+
+
+def _columnas(d):
+    return {"Ventas": d["Total_alloc"], "Utilidad": d["Utilidad"], "SubTotal": d["Sub Total"],
+            "DOC_ID": d["DOC_ID"], "SKU_KEY": d["SKU_KEY"]}
+
+
+def _lineas(valores, seed, n=400):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Marca_Nombre": rng.choice(np.array(valores, dtype=object), n),
+        "Vendedor_Nombre": rng.choice(np.array(valores, dtype=object), n),
+        "Tipo2": rng.choice(["CONTADO", "CREDITO"], n),
+        "Total_alloc": rng.gamma(2.0, 50.0, n),
+        "Utilidad": rng.normal(20.0, 10.0, n),
+        "DOC_ID": rng.integers(0, n // 3, n),
+        "SKU_KEY": rng.choice(np.array(["A1", "A2", "A3", None], dtype=object), n),
+    })
+    df.loc[::17, "Total_alloc"] = np.nan
+    df["Sub Total"] = df["Total_alloc"] / 1.16
+    return df
+
+
+# valores solo en el actual (D), solo en el anterior (E) y nulos
+_CUR = ["A", "B", "C", "D", None]
+_PREV = ["A", "B", "C", "E", None]
+
+
+def _periodos(dtype):
+    cur, prev = _lineas(_CUR, 0), _lineas(_PREV, 1)
+    if dtype == "category":
+        tipo = pd.CategoricalDtype(["E", "D", "C", "B", "A", "SIN USO"])
+        for d in (cur, prev):
+            d["Marca_Nombre"] = d["Marca_Nombre"].astype(tipo)
+            d["Vendedor_Nombre"] = d["Vendedor_Nombre"].astype(tipo)
+    elif dtype == "mixto":
+        # categórica en el actual, texto en el anterior
+        cur["Marca_Nombre"] = cur["Marca_Nombre"].astype("category")
+        cur["Vendedor_Nombre"] = cur["Vendedor_Nombre"].astype("category")
+    elif dtype != "object":
+        for d in (cur, prev):
+            d["Marca_Nombre"] = d["Marca_Nombre"].astype(dtype)
+            d["Vendedor_Nombre"] = d["Vendedor_Nombre"].astype(dtype)
+    return cur, prev
+
+
+def _por_groupby(d, dim):
+    g = pd.DataFrame(_columnas(d)).assign(**{dim: d[dim]})
+    return g.groupby(dim, observed=True).agg(**_AGG).reset_index()
+
+
+DTYPES = ["category", "object", "string[python]", "mixto"]
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_agregar_actual_y_anterior(dtype):
+    cur, prev = _periodos(dtype)
+    a_cur, a_prev = _agregar_actual_y_anterior(cur, prev, "Marca_Nombre", _columnas, **_AGG)
+    e_cur = _por_groupby(cur, "Marca_Nombre")
+    pd.testing.assert_frame_equal(a_cur, e_cur)
+
+    e_prev = _por_groupby(prev, "Marca_Nombre")
+    if dtype == "mixto":
+        # el anterior toma el dtype del actual: E no está en sus categorías y no cuenta
+        e_prev = e_prev[e_prev["Marca_Nombre"] != "E"].reset_index(drop=True)
+        e_prev["Marca_Nombre"] = e_prev["Marca_Nombre"].astype(cur["Marca_Nombre"].dtype)
+    pd.testing.assert_frame_equal(a_prev, e_prev)
+    assert "D" not in set(a_prev["Marca_Nombre"].astype(str))
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+@pytest.mark.parametrize("top_n", [2, 20])
+def test_breakdown_dim(dtype, top_n):
+    cur, prev = _periodos(dtype)
+    t_cur, t_prev = (_por_groupby(d, "Marca_Nombre").drop(columns=["Lineas", "SKU_UNQ"]) for d in (cur, prev))
+    if dtype == "mixto":
+        t_prev["Marca_Nombre"] = t_prev["Marca_Nombre"].astype(cur["Marca_Nombre"].dtype)
+        t_prev = t_prev.dropna(subset=["Marca_Nombre"]).reset_index(drop=True)
+    esperado = _desglose_desde(t_cur, t_prev, "Marca_Nombre", top_n)
+    out = breakdown_dim(cur, prev, "Marca_Nombre", True, top_n)
+    pd.testing.assert_frame_equal(out, esperado)
+    # D solo está en el actual: sin año anterior
+    d = out[out["Marca_Nombre"] == "D"]
+    assert d["Ventas_LY"].isna().all() and d["YoY_Ventas"].isna().all()
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_vendor_metrics(dtype):
+    cur, prev = _periodos(dtype)
+    dim = "Vendedor_Nombre"
+    t_cur = _por_groupby(cur, dim)
+    contado = cur["Total_alloc"].where(cur["Tipo2"] == "CONTADO", 0.0)
+    t_cur.insert(2, "Ventas_Cont", contado.groupby(cur[dim], observed=True).sum().to_numpy())
+    t_cur.insert(3, "Ventas_Cred", (cur["Total_alloc"] - contado).fillna(0.0).groupby(cur[dim], observed=True).sum().to_numpy())
+    t_prev = _por_groupby(prev, dim)[[dim, "Ventas", "Utilidad", "SubTotal", "TXNS"]]
+    if dtype == "mixto":
+        t_prev[dim] = t_prev[dim].astype(cur[dim].dtype)
+        t_prev = t_prev.dropna(subset=[dim]).reset_index(drop=True)
+    esperado = _vendedores_desde(t_cur.rename(columns={dim: "Vendedor"}), t_prev.rename(columns={dim: "Vendedor"}), True, 30)
+    pd.testing.assert_frame_equal(vendor_metrics(cur, prev, True, 30), esperado, check_exact=False, rtol=1e-12)
+
+
+@pytest.mark.parametrize("dtype, orden", [
+    ("object", ["A", "B", "C"]),
+    ("category", ["C", "B", "A"]),  # orden de las categorías
+])
+def test_top_n_empates_en_orden_de_la_dimension(dtype, orden):
+    n = 3
+    cur = pd.DataFrame({"Marca_Nombre": ["B", "C", "A", "Z"], "Vendedor_Nombre": ["B", "C", "A", "Z"],
+                        "Tipo2": "CONTADO", "Total_alloc": [10.0, 10.0, 10.0, 50.0],
+                        "Utilidad": 1.0, "DOC_ID": [1, 2, 3, 4], "SKU_KEY": "A1"})
+    cur["Sub Total"] = cur["Total_alloc"]
+    if dtype == "category":
+        for c in ("Marca_Nombre", "Vendedor_Nombre"):
+            cur[c] = pd.Categorical(cur[c], categories=["Z", "C", "B", "A"])
+    prev = cur.iloc[:0]
+    for top_n in range(1, n + 2):
+        esperado = (["Z"] + orden)[:top_n]
+        assert breakdown_dim(cur, prev, "Marca_Nombre", True, top_n)["Marca_Nombre"].astype(str).tolist() == esperado
+        assert vendor_metrics(cur, prev, True, top_n)["Vendedor"].astype(str).tolist() == esperado
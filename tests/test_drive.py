@@ -0,0 +1,108 @@
+"""imdc_core.drive: sincronización contra ServicioDriveLocal (sin red)."""
+import pytest
+
+from imdc_core.drive import (
+    DescargaLocal, ServicioDriveLocal, descargar_archivo, leer_estado, listar_parquets, sincronizar,
+)
+
+
+def _drive(tmp_path, n=5):
+    drive = tmp_path / "drive"
+    drive.mkdir()
+    for i in range(n):
+        (drive / f"cedro_{i}.parquet").write_bytes(f"contenido {i} ".encode() * (i + 1))
+    return drive
+
+
+def _sync(drive, destino, **kw):
+    return sincronizar(lambda: ServicioDriveLocal(drive, page_size=2), str(drive), destino,
+                       downloader_cls=DescargaLocal, **kw)
+
+
+class _ServicioContado(ServicioDriveLocal):
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self.paginas = 0
+
+    def list(self, *a, **kw):
+        self.paginas += 1
+        return super().list(*a, **kw)
+
+
+def test_listado_recorre_todas_las_paginas(tmp_path):
+    drive = _drive(tmp_path, 5)
+    servicio = _ServicioContado(drive, page_size=2)
+    archivos = listar_parquets(servicio, str(drive))
+    assert sorted(a["name"] for a in archivos) == sorted(fp.name for fp in drive.glob("*.parquet"))
+    assert servicio.paginas == 3
+
+
+def test_solo_baja_lo_que_cambio(tmp_path):
+    drive, destino = _drive(tmp_path), tmp_path / "local"
+
+    res = _sync(drive, destino)
+    assert len(res["descargados"]) == 5
+    for fp in drive.glob("*.parquet"):
+        assert (destino / fp.name).read_bytes() == fp.read_bytes()
+
+    # mismo md5: no se baja nada
+    res = _sync(drive, destino)
+    assert res["descargados"] == [] and len(res["archivos"]) == 5
+
+    (drive / "cedro_3.parquet").write_bytes(b"otro contenido")
+    res = _sync(drive, destino)
+    assert [a["name"] for a in res["descargados"]] == ["cedro_3.parquet"]
+    assert (destino / "cedro_3.parquet").read_bytes() == b"otro contenido"
+
+
+def test_eliminados_de_drive(tmp_path):
+    drive, destino = _drive(tmp_path), tmp_path / "local"
+    _sync(drive, destino)
+
+    (drive / "cedro_1.parquet").unlink()
+    res = _sync(drive, destino)
+    assert res["eliminados"] == ["cedro_1.parquet"]
+    assert not (destino / "cedro_1.parquet").exists()
+    assert "cedro_1.parquet" not in {e["name"] for e in leer_estado(destino).values()}
+
+
+def test_descarga_por_chunks_a_temporal(tmp_path):
+    drive, destino = _drive(tmp_path), tmp_path / "local"
+    destino.mkdir()
+    servicio = ServicioDriveLocal(drive)
+    archivo = next(a for a in listar_parquets(servicio, str(drive)) if a["name"] == "cedro_4.parquet")
+
+    fp = descargar_archivo(servicio, archivo, destino, downloader_cls=DescargaLocal, chunksize=7)
+    assert fp == destino / "cedro_4.parquet"
+    assert fp.read_bytes() == (drive / "cedro_4.parquet").read_bytes()
+    assert list(destino.glob(".*.part")) == []
+
+
+class _DescargaQueFalla(DescargaLocal):
+    """Escribe un chunk y falla en el siguiente (conexión cortada)."""
+
+    def next_chunk(self):
+        if self._fh.tell() > 0:
+            self._src.close()
+            raise ConnectionError("corte")
+        return super().next_chunk()
+
+
+def test_descarga_fallida_no_deja_archivo_a_medias(tmp_path):
+    drive, destino = _drive(tmp_path), tmp_path / "local"
+    destino.mkdir()
+    servicio = ServicioDriveLocal(drive)
+    archivo = next(a for a in listar_parquets(servicio, str(drive)) if a["name"] == "cedro_4.parquet")
+
+    with pytest.raises(ConnectionError):
+        descargar_archivo(servicio, archivo, destino, downloader_cls=_DescargaQueFalla, chunksize=7)
+    assert not (destino / "cedro_4.parquet").exists()
+    assert list(destino.glob(".*.part")) == []
+
+    # desde sincronizar: lo fallido no queda ni en disco ni en el estado, y se reintenta
+    with pytest.raises(ConnectionError):
+        sincronizar(lambda: ServicioDriveLocal(drive), str(drive), destino,
+                    workers=1, downloader_cls=lambda fh, req, chunksize: _DescargaQueFalla(fh, req, chunksize=7))
+    assert [fp.name for fp in destino.iterdir()] == [".drive_sync.json"]
+    assert leer_estado(destino) == {}
+    assert len(_sync(drive, destino)["descargados"]) == 5
@@ -0,0 +1,16 @@
+"""imdc_core se importa sin Streamlit (workers de ingesta, scripts)."""
+import pkgutil
+import subprocess
+import sys
+from pathlib import Path
+
+import imdc_core
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def test_core_no_importa_streamlit():
+    modulos = [f"imdc_core.{m.name}" for m in pkgutil.iter_modules(imdc_core.__path__)]
+    codigo = "import sys\n" + "".join(f"import {m}\n" for m in modulos) + "print('streamlit' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
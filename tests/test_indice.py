@@ -0,0 +1,52 @@
+"""imdc_core.indice: los filtros por índice invertido dan las mismas filas que las máscaras por columna."""
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from imdc_core.indice import indice_de, interseccion
+from imdc_core.metricas import _filtrar_periodos, apply_filters, apply_filters_ventana
+from imdc_core.particionado import clave_periodo, particiones_de
+
+VENTANAS = [(2024, 1, 12), (2024, 3, 3), (2023, 1, 12), (2024, -11, 1), (2024, -2, -1), (2025, 1, 12)]
+SUCURSALES = ["CONSOLIDADO", "GENERAL", "ADELITAS", "NO EXISTE"]
+FAMILIAS = ["TODAS", "PINTURA", " otros ", "NO EXISTE"]
+MARCAS = ["TODAS", "COMEX"]
+
+
+def test_rutas(ventas):
+    compartido, plano = ventas
+    assert particiones_de(compartido) is not None and indice_de(compartido) is not None
+    assert particiones_de(plano) is None and indice_de(plano) is None
+
+
+@pytest.mark.parametrize("ventana", VENTANAS, ids=str)
+def test_mismas_filas(ventas, ventana):
+    compartido, plano = ventas
+    year, m_start, m_end = ventana
+    p_ini, p_fin = clave_periodo(year, m_start), clave_periodo(year, m_end)
+    for sucursal, familia, marca, rem, credito in itertools.product(
+            SUCURSALES, FAMILIAS, MARCAS, [True, False], [True, False]):
+        args = (sucursal, familia, marca, rem, credito)
+        por_indice = _filtrar_periodos(compartido, p_ini, p_fin, *args)
+        por_mascara = _filtrar_periodos(plano, p_ini, p_fin, *args)
+        pd.testing.assert_frame_equal(pd.DataFrame(por_indice), por_mascara, obj=str(args))
+
+
+def test_apply_filters(ventas):
+    compartido, plano = ventas
+    for f in (apply_filters, apply_filters_ventana):
+        a = f(compartido, 2024, -11, 1, "EXPRESS", "FERRETERIA", "TODAS", False, True)
+        b = f(plano, 2024, -11, 1, "EXPRESS", "FERRETERIA", "TODAS", False, True)
+        assert len(a) > 0
+        pd.testing.assert_frame_equal(pd.DataFrame(a), b)
+
+
+def test_interseccion():
+    rng = np.random.default_rng(0)
+    listas = [np.unique(rng.integers(0, 1000, k)) for k in (300, 600, 50)]
+    esperado = np.intersect1d(np.intersect1d(listas[0], listas[1]), listas[2])
+    np.testing.assert_array_equal(interseccion(*listas), esperado)
+    np.testing.assert_array_equal(interseccion(listas[0]), listas[0])
+    assert len(interseccion(listas[0], np.empty(0, dtype=np.int64))) == 0
@@ -0,0 +1,41 @@
+"""imdc_core.ipc: df_all abierto sobre el mmap, sin copias por proceso."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from imdc_core.ipc import abrir_ipc, escribir_ipc
+
+
+def _rangos_mapeados(ruta):
+    """(inicio, fin) de las regiones de /proc/self/maps que mapean ruta."""
+    rangos = []
+    with open("/proc/self/maps") as f:
+        for linea in f:
+            if linea.rstrip().endswith(str(ruta)):
+                ini, fin = linea.split()[0].split("-")
+                rangos.append((int(ini, 16), int(fin, 16)))
+    return rangos
+
+
+@pytest.mark.parametrize("filas", [500_000, 1_500_000])
+def test_columnas_numericas_sobre_el_mmap(tmp_path, filas):
+    destino = tmp_path / "df_all.arrow"
+    df = pd.DataFrame({
+        "Total_alloc": np.arange(filas, dtype="float64"),
+        "DOC_ID": np.arange(filas, dtype="int64"),
+    })
+    assert escribir_ipc(df, destino)
+
+    out = abrir_ipc(destino)
+    pd.testing.assert_frame_equal(out, df)
+    try:
+        rangos = _rangos_mapeados(destino)
+    except OSError:
+        pytest.skip("sin /proc/self/maps")
+    assert rangos
+    for col in df.columns:
+        arr = out[col].to_numpy()
+        # más de 1M filas también en un solo chunk: sin copia privada por proceso
+        assert not arr.flags.writeable
+        dir_ = arr.__array_interface__["data"][0]
+        assert any(ini <= dir_ and dir_ + arr.nbytes <= fin for ini, fin in rangos)
@@ -0,0 +1,114 @@
+"""imdc_core.metricas: comparar_yoy / add_yoy_monthly contra el cálculo fila por fila con yoy()."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from imdc_core.metricas import MONTHS_FULL, add_yoy_monthly, comparar_yoy, yoy
+
+_PCT = ["Ventas_Total", "Ventas_Cont", "Ventas_Cred", "Utilidad", "TXNS", "Ticket"]
+_PP = ["DescPct", "Margen"]
+
+
+def _yoy_mensual_por_filas(df_cur, df_prev):
+    """add_yoy_monthly como era antes: iterrows + yoy() por mes."""
+    out = df_cur.copy()
+    prev = df_prev.set_index("MesNum")
+    for c in _PCT:
+        out[f"YoY_{c}"] = np.nan
+    for c in _PP:
+        out[f"YoY_{c}_pp"] = np.nan
+    for i, r in out.iterrows():
+        m = int(r["MesNum"])
+        if m not in prev.index:
+            continue
+        pr = prev.loc[m]
+        for c in _PCT:
+            if c == "Ticket" and not (pd.notna(r[c]) and pd.notna(pr[c])):
+                continue
+            out.at[i, f"YoY_{c}"] = yoy(float(r[c]), float(pr[c]))
+        for c in _PP:
+            if pd.notna(r[c]) and pd.notna(pr[c]):
+                out.at[i, f"YoY_{c}_pp"] = (float(r[c]) - float(pr[c])) * 100
+    return out
+
+
+def _mensual(meses, seed):
+    rng = np.random.default_rng(seed)
+    n = len(meses)
+    df = pd.DataFrame({"MesNum": meses, "Mes": [MONTHS_FULL[m] for m in meses]})
+    df["Ventas_Cont"] = rng.uniform(0, 1000, n).round(2)
+    df["Ventas_Cred"] = rng.uniform(0, 300, n).round(2)
+    df["Ventas_Total"] = df["Ventas_Cont"] + df["Ventas_Cred"]
+    df["Utilidad"] = rng.uniform(-50, 300, n)
+    df["SubTotal"] = df["Ventas_Total"] / 1.16
+    df["Margen"] = df["Utilidad"] / df["SubTotal"]
+    df["TXNS"] = rng.integers(0, 40, n).astype(float)
+    df["Ticket"] = df["Ventas_Total"] / df["TXNS"].replace(0, np.nan)
+    df["DescPct"] = rng.uniform(0, 0.1, n)
+    df["Vendedores"] = rng.integers(0, 5, n).astype(float)
+    return df
+
+
+def _con_ceros_y_nulos(prev):
+    prev = prev.copy()
+    # ceros: yoy da NaN (no inf) y lo mismo el motor
+    prev.loc[0, ["Ventas_Total", "Ventas_Cont", "TXNS"]] = 0.0
+    prev.loc[1, "Ventas_Cred"] = 0.0
+    prev.loc[1, "Utilidad"] = -0.0
+    # nulos en el año anterior (mes sin ventas: Margen / Ticket / DescPct NaN)
+    prev.loc[2, ["Margen", "Ticket", "DescPct"]] = np.nan
+    prev.loc[3, "Ventas_Cont"] = np.nan
+    return prev
+
+
+@pytest.mark.parametrize("meses_prev", [
+    list(range(1, 13)),
+    [1, 2, 4, 5, 6, 9, 10],      # meses faltantes en el año anterior
+    [12, 11, 10, 9, 8, 7],       # otro orden
+])
+def test_add_yoy_monthly_igual_a_por_filas(meses_prev):
+    cur = _mensual(list(range(1, 13)), 0)
+    cur.loc[5, ["Margen", "Ticket"]] = np.nan
+    cur.loc[6, "Ventas_Total"] = 0.0
+    prev = _con_ceros_y_nulos(_mensual(meses_prev, 1))
+    pd.testing.assert_frame_equal(add_yoy_monthly(cur, prev), _yoy_mensual_por_filas(cur, prev))
+
+
+def test_add_yoy_monthly_sin_anio_anterior():
+    cur = _mensual(list(range(1, 13)), 0)
+    prev = _mensual([], 1)
+    out = add_yoy_monthly(cur, prev)
+    pd.testing.assert_frame_equal(out, _yoy_mensual_por_filas(cur, prev))
+    assert out["YoY_Ventas_Total"].isna().all()
+
+
+def _comparar_por_filas(cur, prev, clave, pct, pp, dif):
+    """comparar_yoy(como="left") fila por fila: merge + yoy() / resta escalar."""
+    out = cur.merge(prev.rename(columns={c: c + "_LY" for c in prev.columns if c != clave}), on=clave, how="left")
+    for m in pct:
+        out[f"YoY_{m}"] = [yoy(a, b) for a, b in zip(out[m], out[m + "_LY"])]
+    for m in pp:
+        out[f"YoY_{m}_pp"] = [(a - b) * 100 for a, b in zip(out[m], out[m + "_LY"])]
+    for m in dif:
+        out[f"Delta_{m}"] = [a - b for a, b in zip(out[m], out[m + "_LY"])]
+    return out
+
+
+def test_comparar_yoy_por_clave():
+    cur = pd.DataFrame({"Marca": ["A", "B", "C", "D", "E"],
+                        "Ventas": [100.0, 50.0, 0.0, 10.0, np.nan],
+                        "Margen": [0.3, 0.2, np.nan, 0.1, 0.2]})
+    # D no está en el año anterior; B tiene base 0 y C base NaN
+    prev = pd.DataFrame({"Marca": ["E", "C", "B", "A", "Z"],
+                         "Ventas": [20.0, np.nan, 0.0, 80.0, 5.0],
+                         "Margen": [0.1, 0.25, 0.2, np.nan, 0.4]})
+    out = comparar_yoy(cur, prev, "Marca", pct=["Ventas"], pp=["Margen"], dif=["Ventas"])
+    esperado = _comparar_por_filas(cur, prev, "Marca", ["Ventas"], ["Margen"], ["Ventas"])
+    pd.testing.assert_frame_equal(out, esperado)
+    assert out["YoY_Ventas"].isna().tolist() == [False, True, True, True, True]
+
+    # outer: Z (solo en el año anterior) entra con actual NaN
+    outer = comparar_yoy(cur, prev, "Marca", pct=["Ventas"], como="outer")
+    assert set(outer["Marca"]) == {"A", "B", "C", "D", "E", "Z"}
+    assert outer.loc[outer["Marca"] == "Z", "Ventas_LY"].item() == 5.0
+    assert np.isnan(outer.loc[outer["Marca"] == "Z", "YoY_Ventas"].item())
@@ -18,29 +18,35 @@
 # IMPORTANTÍSIMO:
 # - NO se cambia la lógica anti-duplicado por documento.
 # - Ventas CON IVA = Total_alloc (usa Total directo cuando ya viene por línea; si viene repetido por doc, asigna alloc)
-# - Transacciones = DOC_KEY únicos
+# - Transacciones = DOC_ID únicos
 # ============================================================
 
 from __future__ import annotations
 
+import time
+
+_T0_UTILS = time.perf_counter()
+
 import math
 import re
-import unicodedata
 from pathlib import Path
 from typing import Dict, Tuple, List, Optional
 
 import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
 import streamlit as st
-import streamlit.components.v1 as components
+
+from imdc_core.arranque import diferido, funcion_diferida, medido, registrar_import, reporte_imports
+
+# Pesados y no necesarios para pintar la página: se importan en el primer uso
+go = diferido("plotly.graph_objects")
+px = diferido("plotly.express")
+components = diferido("streamlit.components.v1")
 
 # ============================================================
 # Imports adicionales para mejoras visuales
 # ============================================================
 from datetime import datetime, timedelta
-import calendar
 
 
 
@@ -149,12 +155,13 @@ def generar_pdf_dashboard():
     from io import BytesIO
     
     try:
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.lib.units import inch
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Table, TableStyle
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT
-        from reportlab.lib import colors
+        with medido("reportlab"):
+            from reportlab.lib.pagesizes import letter, A4
+            from reportlab.lib.units import inch
+            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Table, TableStyle
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.lib.enums import TA_CENTER, TA_LEFT
+            from reportlab.lib import colors
     except ImportError:
         st.error("⚠️ Instalar: pip install reportlab kaleido")
         return None
@@ -420,37 +427,15 @@ APP_VERSION = "IMDC_v9_MEJORADO_2026-02-11"
 # SISTEMA DE OPTIMIZACIÓN DE PERFORMANCE
 # ============================================================
 
-@st.cache_data(ttl=3600, show_spinner=False)
-def cargar_datos_cached(parquet_glob: str, datos_dir: Path):
-    """Caché agresivo de carga de datos - 1 hora"""
-    return load_parquet_data(parquet_glob, datos_dir)
-
-
-@st.cache_data(ttl=1800, show_spinner=False)
-def filtrar_datos_cached(df: pd.DataFrame, year: int, m_start: int, m_end: int, 
-                         sucursal: str, familia: str, marca: str, include_rem: bool):
-    """Caché de filtros para evitar recálculos"""
-    return apply_filters(df, year, m_start, m_end, sucursal, familia, marca, include_rem)
-
-
-@st.cache_data(ttl=1800, show_spinner=False)
-def calcular_kpis_cached(df: pd.DataFrame, ventas_con_iva: bool, m2: float):
-    """Caché de cálculo de KPIs"""
-    return kpis_from_df(df, ventas_con_iva, m2)
-
-
-@st.cache_data(ttl=1800, show_spinner=False)
-def resumen_mensual_cached(df: pd.DataFrame, ventas_con_iva: bool):
-    """Caché de resumen mensual"""
-    return monthly_summary(df, ventas_con_iva)
+# Filtros / KPIs / resúmenes: caché por firma (versión, filtros) en
+# imdc_core.consultas vía Periodo, sin hashear DataFrames en cada llamada.
 
 
 @st.cache_data(ttl=3600, show_spinner=False)
 def procesar_catalogo_cached(cat_path: Path):
-    """Caché de catálogos"""
-    if cat_path.exists():
-        return pd.read_excel(cat_path, sheet_name="CAT_FAMILIA", engine="openpyxl")
-    return pd.DataFrame()
+    """Caché de catálogos (desde el parquet compilado; el Excel solo se parsea si cambió)"""
+    cat = cargar_catalogo(cat_path)
+    return cat if cat is not None else pd.DataFrame()
 
 
 def optimizar_dataframe(df: pd.DataFrame) -> pd.DataFrame:
@@ -533,10 +518,13 @@ def mostrar_control_cache():
         col1, col2 = st.columns(2)
         
         with col1:
-            if st.button("🔄 Limpiar caché", use_container_width=True):
-                st.cache_data.clear()
-                st.success("Caché limpiado")
-                st.rerun()
+            if st.button("🔄 Recargar datos", use_container_width=True):
+                # Sin limpiar cachés de nadie: se arma la versión nueva y se publica al terminar
+                if pedir_refresco():
+                    st.toast("🔄 Refresco en segundo plano; los datos nuevos aparecen al terminar.")
+                else:
+                    _bump_ui_epoch()
+                    st.rerun()
         
         with col2:
             if st.button("📊 Ver memoria", use_container_width=True):
@@ -544,30 +532,30 @@ def mostrar_control_cache():
                 cache_info = st.cache_data.get_cache_stats()
                 st.info(f"Cache entries: {cache_info}")
         
-        # Mostrar tamaño de datos en memoria
-        if 'df_all' in st.session_state:
-            memory_mb = st.session_state.df_all.memory_usage(deep=True).sum() / 1024**2
-            st.caption(f"💾 Datos en memoria: {memory_mb:.1f} MB")
+        # Mostrar tamaño de datos en memoria (df_all compartido; una vez por versión)
+        ds = dataset_actual()
+        memory_mb = CONSULTAS.obtener((ds.version, "memoria_df_all"),
+                                      lambda: ds.df_all.memory_usage(deep=True).sum() / 1024**2)
+        st.caption(f"💾 Datos en memoria: {memory_mb:.1f} MB")
 
 
 
 # ============================================================
 # Imports para gráficos mejorados
 # ============================================================
-try:
-    from graficos_mejorados import (
-        fig_grafica_mensual_mejorada,
-        fig_top20_barras_mejoradas,
-        fig_treemap_mejorado,
-        fig_top_vendedores_mejorada,
-        fig_quadrants_mejorada,
-        COLORS
-    )
-    GRAFICOS_MEJORADOS = True
-    print("✅ Gráficos mejorados cargados correctamente")
-except ImportError:
+# Se importa en la primera gráfica mejorada; aquí solo se verifica que exista
+import importlib.util
+
+GRAFICOS_MEJORADOS = importlib.util.find_spec("graficos_mejorados") is not None
+if GRAFICOS_MEJORADOS:
+    _gm = diferido("graficos_mejorados")
+    fig_grafica_mensual_mejorada = funcion_diferida(_gm, "fig_grafica_mensual_mejorada")
+    fig_top20_barras_mejoradas = funcion_diferida(_gm, "fig_top20_barras_mejoradas")
+    fig_treemap_mejorado = funcion_diferida(_gm, "fig_treemap_mejorado")
+    fig_top_vendedores_mejorada = funcion_diferida(_gm, "fig_top_vendedores_mejorada")
+    fig_quadrants_mejorada = funcion_diferida(_gm, "fig_quadrants_mejorada")
+else:
     print("⚠️  graficos_mejorados.py no encontrado - usando gráficos originales")
-    GRAFICOS_MEJORADOS = False
 
 # ------------------------------------------------------------
 # Page
@@ -575,8 +563,7 @@ except ImportError:
 # Config en Home.py
 
 # Anti-Translate (Chrome/Google Translate)
-components.html(
-    """
+_HTML_ANTITRANSLATE = """
     <meta name="google" content="notranslate">
     <meta name="robots" content="notranslate">
     <style>
@@ -818,16 +805,13 @@ components.html(
         } catch(e) {}
       })();
     </script>
-    """,
-    height=0,
-)
+    """
 
 # ------------------------------------------------------------
 # ------------------------------------------------------------
 # Styles - MEJORADOS v2
 # ------------------------------------------------------------
-st.markdown(
-    """
+_CSS_DASHBOARD = """
     <style>
       :root {
         --primary-blue: #2563EB;
@@ -954,184 +938,35 @@ st.markdown(
         .kpi-value { font-size: 1.7rem; }
       }
     </style>
-    """,
-    unsafe_allow_html=True,
-)
+    """
 
-# ------------------------------------------------------------
-# Constantes & paths
-# ------------------------------------------------------------
-BASE_DIR = Path(__file__).resolve().parent
-import os as _os
-_cloud_data_dir = _os.environ.get("IMDC_DATA_DIR", "")
-OUTPUT_DIR = Path(_cloud_data_dir) if _cloud_data_dir and Path(_cloud_data_dir).exists() else BASE_DIR / "output"
-DATOS_DIR = BASE_DIR / "Datos"
-PARQUET_GLOB = "*.parquet"
-
-CATALOGO_SUCURSALES = [
-    "CONSOLIDADO",
-    "GENERAL",
-    "EXPRESS",
-    "SAN AGUST",
-    "ADELITAS",
-    "H ILUSTRES",
-]
-CANON_VALIDOS = set(CATALOGO_SUCURSALES)
-
-M2_MAP = {
-    "GENERAL": 1538,
-    "EXPRESS": 369,
-    "SAN AGUST": 870,
-    "ADELITAS": 348,
-    "H ILUSTRES": 100,
-    "CONSOLIDADO": 3225,
-}
-
-MONTHS_FULL = {
-    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 6: "Junio",
-    7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
-}
-MONTHS_ABBR = {k: v[:3] for k, v in MONTHS_FULL.items()}
+def aplicar_estilos():
+    """Inyecta el anti-translate y el CSS del dashboard (en cada rerun de cada página)."""
+    components.html(_HTML_ANTITRANSLATE, height=0)
+    st.markdown(_CSS_DASHBOARD, unsafe_allow_html=True)
 
 # ------------------------------------------------------------
-# Utils (text cleaning / math)
+# Núcleo de cálculo (imdc_core: sin Streamlit ni efectos al importar)
 # ------------------------------------------------------------
-_ZW_CHARS_RE = re.compile(r"[\u200B-\u200D\u2060\uFEFF]")
-_NON_ALNUM_SPACE_RE = re.compile(r"[^A-Z0-9 ]+")
-_MULTI_SPACE_RE = re.compile(r"\s+")
-
-def _strip_accents(text: str) -> str:
-    nkfd = unicodedata.normalize("NFKD", text)
-    return "".join(ch for ch in nkfd if not unicodedata.combining(ch))
-
-def _clean_text_scalar(v) -> str:
-    if v is None:
-        return ""
-    if isinstance(v, float) and (math.isnan(v) or math.isinf(v)):
-        return ""
-    s = str(v)
-    s = (
-        s.replace("\u00A0", " ")
-         .replace("\u2007", " ")
-         .replace("\u202F", " ")
-    )
-    s = _ZW_CHARS_RE.sub("", s)
-    s = _strip_accents(s).upper()
-    s = s.replace(".", " ").replace("-", " ").replace("_", " ").replace("/", " ")
-    s = _NON_ALNUM_SPACE_RE.sub(" ", s)
-    s = _MULTI_SPACE_RE.sub(" ", s).strip()
-    return s
-
-def _clean_text_series(s: pd.Series) -> pd.Series:
-    return s.astype("string").fillna("").map(_clean_text_scalar)
-
-
-def _normalize_id_series(s: pd.Series) -> pd.Series:
-    """Normaliza IDs que a veces vienen como float (1.0) o string ('1.0').
-    Regla:
-      - si es numérico entero -> '1'
-      - si no, deja string limpio
-    """
-    ss = s.astype("string").fillna("").str.strip()
-    # intento numérico
-    num = pd.to_numeric(ss.str.replace(",", ".", regex=False), errors="coerce")
-    is_int = num.notna() & np.isfinite(num) & (np.abs(num - np.round(num)) < 1e-9)
-    out = ss.copy()
-    out.loc[is_int] = np.round(num.loc[is_int]).astype("int64").astype("string")
-    # limpia cosas tipo '001' -> '1' solo si era numérico
-    return out
-
-def normalize_almacen(s: pd.Series) -> pd.Series:
-    x = _clean_text_series(s)
-    def canon_one(t: str) -> str:
-        if "SAN AGUST" in t:
-            return "SAN AGUST"
-        if "ILUST" in t:
-            return "H ILUSTRES"
-        if "EXPRES" in t:
-            return "EXPRESS"
-        if t.startswith("H "):
-            return "H ILUSTRES"
-        if t in ("GRAL", "GENERAL"):
-            return "GENERAL"
-        return t
-    return x.map(canon_one)
-
-def safe_div(a: float, b: float) -> float:
-    try:
-        a = float(a); b = float(b)
-        if b == 0 or math.isnan(b) or math.isinf(b):
-            return float("nan")
-        return a / b
-    except Exception:
-        return float("nan")
-
-def yoy(cur: float, prev: float) -> float:
-    r = safe_div(cur, prev)
-    if isinstance(r, float) and (math.isnan(r) or math.isinf(r)):
-        return float("nan")
-    return r - 1.0
-
-def money_fmt(x: float) -> str:
-    """Formato de moneda - siempre con 1 decimal en millones"""
-    if x is None or (isinstance(x, float) and (math.isnan(x) or math.isinf(x))):
-        return "$0.0"
-    
-    abs_x = abs(x)
-    sign = "-" if x < 0 else ""
-    
-    # Millones: SIEMPRE 1 decimal
-    if abs_x >= 1_000_000:
-        return f"{sign}${abs_x/1_000_000:.1f}M"
-    # Miles
-    elif abs_x >= 100_000:
-        return f"{sign}${abs_x/1_000:,.0f}K"
-    elif abs_x >= 10_000:
-        return f"{sign}${abs_x/1_000:,.1f}K"
-    elif abs_x >= 1_000:
-        return f"{sign}${abs_x:,.0f}"
-    else:
-        if abs(x - round(x)) < 1e-9:
-            return f"{sign}${abs_x:,.0f}"
-        return f"{sign}${abs_x:,.1f}"
-
-
-def pct_fmt(x: float) -> str:
-    """Formato de porcentaje mejorado"""
-    if x is None or (isinstance(x, float) and (math.isnan(x) or math.isinf(x))):
-        return "—"
-    
-    pct = x * 100
-    
-    if abs(pct) < 1:
-        return f"{pct:.2f}%"
-    elif abs(pct - round(pct)) < 0.01:
-        return f"{pct:.0f}%"
-    else:
-        return f"{pct:.1f}%"
-
-
-def num_fmt(x: float) -> str:
-    """Formato de números - con 1 decimal en millones"""
-    if x is None or (isinstance(x, float) and (math.isnan(x) or math.isinf(x))):
-        return "0"
-    
-    abs_x = abs(x)
-    sign = "-" if x < 0 else ""
-    
-    if abs_x >= 1_000_000:
-        return f"{sign}{abs_x/1_000_000:.1f}M"
-    elif abs_x >= 100_000:
-        return f"{sign}{abs_x/1_000:,.0f}K"
-    elif abs_x >= 10_000:
-        return f"{sign}{abs_x/1_000:,.1f}K"
-    elif abs_x >= 1_000:
-        return f"{sign}{abs_x:,.0f}"
-    else:
-        if abs(x - round(x)) < 1e-9:
-            return f"{sign}{abs_x:.0f}"
-        return f"{sign}{abs_x:.1f}"
-
+from imdc_core.config import (
+    BASE_DIR, OUTPUT_DIR, DATOS_DIR, PARQUET_GLOB, CACHE_DIR, CATALOGO_SUCURSALES,
+)
+from imdc_core.texto import (
+    _strip_accents, _clean_text_scalar, _clean_text_series,
+    _normalize_id_series, normalize_almacen,
+)
+from imdc_core.catalogo import cargar_catalogo, load_cat_familia, attach_familia_nombre
+from imdc_core.carga import CSV_USECOLS, add_total_alloc, _leer_manifest
+from imdc_core.consultas import CONSULTAS
+from imdc_core.dataset import Dataset, dataset_actual, load_all, pedir_refresco, refrescador
+from imdc_core.particionado import particiones_de
+from imdc_core.formato import money_fmt, num_fmt, pct_fmt
+from imdc_core.metricas import (
+    CANON_VALIDOS, M2_MAP, MONTHS_ABBR, MONTHS_FULL, Filtros, Periodo,
+    _ventas_col, add_yoy_monthly, analizar_cambios_yoy, comparar_yoy, apply_filters, apply_filters_ventana,
+    apply_filters_year, breakdown_dim, count_vendedores_activos, kpis_from_df, meses_con_datos, monthly_summary,
+    safe_div, vendor_metrics, yoy,
+)
 
 # ------------------------------------------------------------
 # UI epoch (para reset de widgets si hace falta)
@@ -1147,504 +982,6 @@ def _bump_ui_epoch():
 def make_key(name: str) -> str:
     return f"{name}__e{_ui_epoch()}"
 
-# ------------------------------------------------------------
-# Catálogo Familias (Opción B)
-# ------------------------------------------------------------
-@st.cache_data(show_spinner=False)
-def load_cat_familia() -> Optional[pd.DataFrame]:
-    """
-    Busca en ./Datos un catálogo de familias. Soporta:
-    - CAT_FAMILIA.xlsx (hoja CAT_FAMILIA)
-    - CAT_FAMILIA.csv
-    Devuelve DF con columnas: Familia_ID (string), Familia_Nombre (string)
-    """
-    candidates = [
-        DATOS_DIR / "Datos.xlsx",          # (build_anual.py) catálogo maestro
-        DATOS_DIR / "datos.xlsx",
-        DATOS_DIR / "CAT_FAMILIA.xlsx",
-        DATOS_DIR / "cat_familia.xlsx",
-        DATOS_DIR / "CAT_FAMILIA.csv",
-        DATOS_DIR / "cat_familia.csv",
-    ]
-    fp = next((p for p in candidates if p.exists()), None)
-    if fp is None:
-        return None
-
-    try:
-        if fp.suffix.lower() == ".xlsx":
-            df = pd.read_excel(fp, sheet_name="CAT_FAMILIA")
-        else:
-            df = pd.read_csv(fp, encoding="utf-8", low_memory=False)
-    except Exception:
-        # fallback: primer sheet o lectura simple
-        try:
-            if fp.suffix.lower() == ".xlsx":
-                df = pd.read_excel(fp)
-            else:
-                df = pd.read_csv(fp, low_memory=False)
-        except Exception:
-            return None
-
-    cols = {c: _clean_text_scalar(c) for c in df.columns}
-    df = df.rename(columns={c: cols[c] for c in df.columns})
-
-    # heurística: ID y nombre
-    id_col = None
-    name_col = None
-    for c in df.columns:
-        cc = _clean_text_scalar(c)
-        if cc in ("ID", "IDFAMILIA", "ID FAMILIA", "FAMILIAID", "ID_FAMILIA"):
-            id_col = c
-        if cc in ("FAMILIA", "NOMBRE", "NOMBRE FAMILIA", "DESCRIPCION", "DESC", "DESCFAMILIA", "DESC FAMILIA"):
-            name_col = c
-    # si no detectó, usa 1a y 2a columna si hay al menos 2
-    if id_col is None and len(df.columns) >= 1:
-        id_col = df.columns[0]
-    if name_col is None and len(df.columns) >= 2:
-        name_col = df.columns[1]
-
-    out = pd.DataFrame()
-    out["Familia_ID"] = _normalize_id_series(df[id_col])
-    out["Familia_Nombre"] = df[name_col].astype("string").str.strip()
-    out = out.dropna(subset=["Familia_ID", "Familia_Nombre"])
-    out = out[out["Familia_ID"] != ""]
-    return out
-
-def attach_familia_nombre(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Normaliza el tema de Familias para que la web sea robusta ante 2 escenarios:
-
-    ESCENARIO A (antes):
-      - "Familia" trae el ID (ej. 11) o viene vacío y existe algún ID alterno.
-      - Se usa el catálogo (Datos.xlsx hoja CAT_FAMILIA) para obtener el nombre.
-
-    ESCENARIO B (nuevo, tu ajuste en Parquet):
-      - "ID Familia" trae el ID (ej. 11)
-      - "Familia" YA trae el nombre (ej. PINTURA)
-      - En este caso NO debemos tratar "Familia" como ID porque rompe el mapeo y todo cae en OTROS.
-
-    Salida:
-      - Familia_ID (string)
-      - Familia_Nombre (string)
-    """
-    if df is None or df.empty:
-        df["Familia_ID"] = ""
-        df["Familia_Nombre"] = "SIN FAMILIA"
-        return df
-
-    # ------------------------------------------------------------
-    # Detectar columna ID (prioridad alta a "ID Familia")
-    # ------------------------------------------------------------
-    id_candidates = [
-        "ID Familia", "ID_FAMILIA", "ID FAMILIA", "IDFAMILIA",
-        "Familia_ID", "FamiliaID", "Cse_prod",
-    ]
-    name_candidates = ["Familia", "Familia_Nombre", "FAMILIA"]
-
-    id_col = next((c for c in id_candidates if c in df.columns), None)
-    name_col = next((c for c in name_candidates if c in df.columns), None)
-
-    cat = load_cat_familia()
-
-    # ------------------------------------------------------------
-    # Helper: decide si una serie "parece ID" (numérica) o "parece nombre"
-    # ------------------------------------------------------------
-    def _is_mostly_numeric_like(s: pd.Series, thr: float = 0.80) -> bool:
-        ss = s.astype("string").fillna("").str.strip()
-        nn = ss.replace("", pd.NA).dropna()
-        if len(nn) == 0:
-            return False
-        numlike = nn.str.fullmatch(r"\d+(?:\.0+)?").fillna(False)
-        return float(numlike.mean()) >= float(thr)
-
-    # ------------------------------------------------------------
-    # Caso 1: tenemos ID explícito ("ID Familia", etc.)
-    # ------------------------------------------------------------
-    if id_col is not None:
-        df["Familia_ID"] = _normalize_id_series(df[id_col])
-
-        # Si además existe una columna de nombre ("Familia") y NO parece ID, úsala tal cual.
-        if name_col is not None and name_col != id_col and not _is_mostly_numeric_like(df[name_col]):
-            df["Familia_Nombre"] = df[name_col].astype("string").fillna("").str.strip()
-            df["Familia_Nombre"] = df["Familia_Nombre"].replace("", pd.NA).fillna("SIN FAMILIA")
-            return df
-
-        # Si no, intenta mapear por catálogo
-        if cat is None or cat.empty:
-            df["Familia_Nombre"] = df["Familia_ID"].replace("", pd.NA).fillna("SIN FAMILIA")
-            return df
-
-        m = dict(zip(cat["Familia_ID"].astype("string"), cat["Familia_Nombre"].astype("string")))
-        df["Familia_Nombre"] = df["Familia_ID"].map(m).astype("string")
-        df["Familia_Nombre"] = df["Familia_Nombre"].fillna("OTROS")
-        df.loc[df["Familia_ID"].eq(""), "Familia_Nombre"] = "SIN FAMILIA"
-        return df
-
-    # ------------------------------------------------------------
-    # Caso 2: NO hay ID explícito. Usa "Familia" como:
-    #   - ID si parece numérica
-    #   - nombre si parece texto
-    # ------------------------------------------------------------
-    if name_col is None:
-        df["Familia_ID"] = ""
-        df["Familia_Nombre"] = "SIN FAMILIA"
-        return df
-
-    if _is_mostly_numeric_like(df[name_col]):
-        # Trata "Familia" como ID
-        df["Familia_ID"] = _normalize_id_series(df[name_col])
-        if cat is None or cat.empty:
-            df["Familia_Nombre"] = df["Familia_ID"].replace("", pd.NA).fillna("SIN FAMILIA")
-            return df
-        m = dict(zip(cat["Familia_ID"].astype("string"), cat["Familia_Nombre"].astype("string")))
-        df["Familia_Nombre"] = df["Familia_ID"].map(m).astype("string").fillna("OTROS")
-        df.loc[df["Familia_ID"].eq(""), "Familia_Nombre"] = "SIN FAMILIA"
-        return df
-
-    # Trata "Familia" como NOMBRE
-    df["Familia_Nombre"] = df[name_col].astype("string").fillna("").str.strip()
-    df["Familia_Nombre"] = df["Familia_Nombre"].replace("", pd.NA).fillna("SIN FAMILIA")
-
-    # Opcional: si existe catálogo, intenta derivar Familia_ID por nombre (reverse map)
-    if cat is not None and not cat.empty:
-        # normaliza nombre para matching robusto
-        cat2 = cat.copy()
-        cat2["_NORM"] = _clean_text_series(cat2["Familia_Nombre"])
-        rev = dict(zip(cat2["_NORM"].astype("string"), cat2["Familia_ID"].astype("string")))
-        df["Familia_ID"] = _clean_text_series(df["Familia_Nombre"]).map(rev).astype("string").fillna("")
-    else:
-        df["Familia_ID"] = ""
-
-    return df
-
-    df["Familia_ID"] = _normalize_id_series(df[fam_col])
-    cat = load_cat_familia()
-    if cat is None or cat.empty:
-        # fallback: mostrar ID como "nombre"
-        df["Familia_Nombre"] = df["Familia_ID"].replace("", pd.NA).fillna("SIN FAMILIA")
-        return df
-
-    m = dict(zip(cat["Familia_ID"].astype("string"), cat["Familia_Nombre"].astype("string")))
-    df["Familia_Nombre"] = df["Familia_ID"].map(m).astype("string")
-    df["Familia_Nombre"] = df["Familia_Nombre"].fillna("OTROS")
-    # Si viene vacío, marcarlo explícitamente
-    df.loc[df["Familia_ID"].eq(""), "Familia_Nombre"] = "SIN FAMILIA"
-    return df
-
-# ------------------------------------------------------------
-# Anti-duplicado / Ventas CON IVA
-# ------------------------------------------------------------
-def _safe_total_per_key(df: pd.DataFrame, col: str, key: str) -> pd.Series:
-    """
-    Suma segura por documento:
-      - si el total está repetido por línea, toma 1 vez por doc
-      - si no está repetido, suma normal
-    """
-    g = df.groupby(key)[col]
-    size = g.size()
-    nun = g.nunique(dropna=False)
-    first = g.first()
-    summ = g.sum(min_count=1)
-
-    rep = (nun == 1) & (size > 1)
-    approx = (summ - first * size).abs() <= (first.abs() * 1e-9 + 1e-6)
-    rep = rep & approx
-
-    out = summ.copy()
-    out.loc[rep] = first.loc[rep]
-    return out
-
-def add_total_alloc(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Crea Total_alloc:
-      - Si Total ya viene por línea (NO repetido por doc) -> Total_alloc = Total
-      - Si Total viene repetido por doc -> prorratea vía Sub Total (Factor IVA)
-    Requiere DOC_KEY.
-    """
-    if df.empty:
-        df["Total_alloc"] = 0.0
-        return df
-
-    if "DOC_KEY" not in df.columns:
-        df["Total_alloc"] = pd.to_numeric(df.get("Total", 0.0), errors="coerce").fillna(0.0)
-        return df
-
-    total_col = "Total"
-    sub_col = "Sub Total"
-    if total_col not in df.columns:
-        df["Total_alloc"] = 0.0
-        return df
-    if sub_col not in df.columns:
-        df[sub_col] = 0.0
-
-    df[total_col] = pd.to_numeric(df[total_col], errors="coerce").fillna(0.0)
-    df[sub_col] = pd.to_numeric(df[sub_col], errors="coerce").fillna(0.0)
-
-    # Detecta si Total está repetido por doc
-    nun = df.groupby("DOC_KEY")[total_col].nunique(dropna=False)
-    rep_share = float((nun == 1).mean()) if len(nun) else 1.0
-
-    if rep_share >= 0.90:
-        # Casi todo repetido -> prorratear
-        total_doc = df.groupby("DOC_KEY")[total_col].first()
-        sub_doc = df.groupby("DOC_KEY")[sub_col].sum().replace(0, np.nan)
-        factor = (total_doc / sub_doc).replace([np.inf, -np.inf], np.nan).fillna(1.0)
-        df["Total_alloc"] = (df[sub_col] * df["DOC_KEY"].map(factor)).astype(float)
-    else:
-        # Total ya viene a nivel línea -> usar directo
-        df["Total_alloc"] = df[total_col].astype(float)
-
-    return df
-
-# ------------------------------------------------------------
-# Carga
-# ------------------------------------------------------------
-CSV_USECOLS = [
-    "Año","Mes","Hora",
-    "Almacen","Vendedor","Cliente","Tipo",
-    "Documento",
-    "Familia","Marca",
-    "Cantidad","Costo Entrada",
-    "Sub Total","Total",
-    "Descuento $","Utilidad $",
-    "es_rem","factura_del_dia","nota_facturada","cancelado",
-]
-
-def _ensure_cols(df: pd.DataFrame) -> pd.DataFrame:
-    # Asegurar columnas clave aunque falten
-    for c in ["Descuento $","Utilidad $","es_rem","factura_del_dia","nota_facturada","cancelado"]:
-        if c not in df.columns:
-            df[c] = 0
-    return df
-
-def _coerce_base_types(df: pd.DataFrame) -> pd.DataFrame:
-    for c in ["Año","Mes"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
-    for c in ["Sub Total","Total","Descuento $","Utilidad $"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0.0)
-    for c in ["es_rem","factura_del_dia","nota_facturada","cancelado"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype(int)
-    return df
-
-@st.cache_data(show_spinner=False)
-def load_all() -> Tuple[pd.DataFrame, List[int], List[str], List[str]]:
-    """
-    Lee todos los parquets en ./output/cedro_*.parquet
-    Devuelve: df_all, years, familias (display), marcas
-    """
-    files = sorted(OUTPUT_DIR.glob(PARQUET_GLOB))
-    if not files:
-        return pd.DataFrame(), [], [], []
-
-    dfs = []
-    for fp in files:
-        try:
-            # leer todas las columnas disponibles necesarias (intersección)
-            # Pandas requiere pyarrow en el entorno del usuario (ya lo tienen en Windows)
-            df = pd.read_parquet(fp)
-        except Exception:
-            continue
-        df = _ensure_cols(df)
-        df = _coerce_base_types(df)
-
-        # Canon almacen
-        if "Almacen" in df.columns:
-            df["Almacen_CANON"] = normalize_almacen(df["Almacen"])
-        else:
-            df["Almacen_CANON"] = ""
-
-        # Tipo2 (CONTADO/CREDITO)
-        if "Tipo" in df.columns:
-            t = df["Tipo"].astype("string").fillna("")
-            df["Tipo2"] = np.where(_clean_text_series(t).str.contains("CRED", na=False), "CREDITO", "CONTADO")
-        else:
-            df["Tipo2"] = "CONTADO"
-
-        # Documento string
-        if "Documento" in df.columns:
-            df["Documento"] = df["Documento"].astype("string").fillna("").str.strip()
-        else:
-            df["Documento"] = ""
-
-        # DOC_KEY real: Año|Mes|Almacen|Documento|Tipo2
-        df["DOC_KEY"] = (
-            df["Año"].astype("string").fillna("") + "|" +
-            df["Mes"].astype("string").fillna("") + "|" +
-            df["Almacen_CANON"].astype("string").fillna("") + "|" +
-            df["Documento"].astype("string").fillna("") + "|" +
-            df["Tipo2"].astype("string").fillna("")
-        )
-
-        # Utilidad (SIN IVA) por línea: preferir "Utilidad $" -> columna "Utilidad"
-        df["Utilidad"] = pd.to_numeric(df.get("Utilidad $", 0.0), errors="coerce").fillna(0.0)
-
-        # Total_alloc (CON IVA) correcto
-        df = add_total_alloc(df)
-
-        # Flags inteligentes si faltan
-        if "es_rem" not in df.columns:
-            df["es_rem"] = 0
-        df["incluye_base"] = 1
-        df["incluye_kpi_rem_on"] = 1
-        df["incluye_kpi_rem_off"] = np.where(df["es_rem"].astype(int) == 1, 0, 1)
-
-        # Catálogo familia
-        df = attach_familia_nombre(df)
-
-        # Marca normalizada texto (display)
-        if "Marca" in df.columns:
-            df["Marca"] = df["Marca"].astype("string").fillna("").str.strip()
-            df["Marca_Nombre"] = df["Marca"].replace("", pd.NA).fillna("SIN MARCA")
-        else:
-            df["Marca_Nombre"] = "SIN MARCA"
-
-        # Vendedor normalizado (display)
-        if "Vendedor" in df.columns:
-            df["Vendedor"] = df["Vendedor"].astype("string").fillna("").str.strip()
-            df["Vendedor_Nombre"] = df["Vendedor"].replace("", pd.NA).fillna("SIN VENDEDOR")
-        else:
-            df["Vendedor_Nombre"] = "SIN VENDEDOR"
-
-        # SKU key (para SKUs por ticket)
-        sku_col = None
-        for cand in ["Articulo", "Cve_prod", "SKU", "Clave", "Codbar", "Descripcion"]:
-            if cand in df.columns:
-                sku_col = cand
-                break
-        if sku_col:
-            df["SKU_KEY"] = df[sku_col].astype("string").fillna("").str.strip()
-            df["SKU_KEY"] = df["SKU_KEY"].replace("", pd.NA)
-        else:
-            df["SKU_KEY"] = pd.NA
-
-        dfs.append(df)
-
-    if not dfs:
-        return pd.DataFrame(), [], [], []
-
-    df_all = pd.concat(dfs, ignore_index=True)
-
-    # Limpieza: algunas filas traen "Familia_Nombre" como número (ej. 95, 106.0) por catálogos incompletos.
-    # Para evitar "basura" en filtros/visuales, las marcamos como NA (siguen contando en TODAS, pero no aparecen como opción).
-    fam_num_mask = (
-        df_all["Familia_Nombre"].astype(str).str.strip()
-        .str.fullmatch(r"\d+(?:\.0+)?")
-        .fillna(False)
-    )
-    if fam_num_mask.any():
-        df_all.loc[fam_num_mask, "Familia_Nombre"] = pd.NA
-
-    years = sorted(df_all["Año"].dropna().astype(int).unique().tolist()) if "Año" in df_all.columns else []
-    familias = sorted(df_all["Familia_Nombre"].dropna().astype(str).unique().tolist()) if "Familia_Nombre" in df_all.columns else []
-    # Limpieza: evita "basura" numérica en el selector (IDs sin catálogo)
-    familias = [x for x in familias if not re.fullmatch(r"\d+(?:\.0+)?", x.strip())]
-    marcas = sorted(df_all["Marca_Nombre"].dropna().astype(str).unique().tolist()) if "Marca_Nombre" in df_all.columns else []
-
-    return df_all, years, familias, marcas
-
-# ------------------------------------------------------------
-# Filters
-# ------------------------------------------------------------
-def apply_filters(df: pd.DataFrame,
-                  year: int,
-                  m_start: int,
-                  m_end: int,
-                  sucursal: str,
-                  familia: str,
-                  marca: str,
-                  include_rem: bool,
-                  excluir_credito: bool = False) -> pd.DataFrame:
-    if df.empty:
-        return df
-
-    out = df.copy()
-
-    out = out[out["Año"].astype(int) == int(year)]
-    out = out[out["Mes"].astype(int).between(int(m_start), int(m_end))]
-
-    if sucursal != "CONSOLIDADO":
-        out = out[out["Almacen_CANON"] == sucursal]
-
-    if familia != "TODAS":
-        out = out[out["Familia_Nombre"] == familia]
-
-    if marca != "TODAS":
-        out = out[out["Marca_Nombre"] == marca]
-
-    # REM filter
-    if not include_rem and "es_rem" in out.columns:
-        out = out[out["es_rem"].astype(int) == 0]
-    
-    # Excluir crédito filter
-    if excluir_credito and "Tipo2" in out.columns:
-        out = out[out["Tipo2"] == "CONTADO"]
-
-    return out
-
-def apply_filters_year(df: pd.DataFrame,
-                       year: int,
-                       sucursal: str,
-                       familia: str,
-                       marca: str,
-                       include_rem: bool,
-                       excluir_credito: bool = False) -> pd.DataFrame:
-    """Mismos filtros pero sin recortar meses (para histórico anual)."""
-    return apply_filters(df, year, 1, 12, sucursal, familia, marca, include_rem, excluir_credito)
-
-def _ventas_col(ventas_con_iva: bool) -> str:
-    return "Total_alloc" if ventas_con_iva else "Sub Total"
-
-def count_vendedores_activos(df: pd.DataFrame) -> int:
-    if df.empty:
-        return 0
-    s = df.get("Vendedor_Nombre", pd.Series([], dtype="string")).astype("string").fillna("").str.strip()
-    s = s.replace("TODOS", "", regex=False).replace("", pd.NA)
-    return int(s.dropna().nunique())
-
-# ------------------------------------------------------------
-# KPIs core
-# ------------------------------------------------------------
-def kpis_from_df(df: pd.DataFrame, ventas_con_iva: bool, m2: float) -> Dict[str, float]:
-    if df.empty:
-        return dict(
-            ventas=0.0, ventas_cont=0.0, ventas_cred=0.0,
-            utilidad=0.0, subtotal=0.0, margen=np.nan,
-            txns=0.0, ticket=np.nan,
-            descdol=0.0, descpct=np.nan,
-            vendedores=0.0,
-            ventas_m2=np.nan, utilidad_m2=np.nan,
-        )
-    ventas_col = _ventas_col(ventas_con_iva)
-    ventas = float(df[ventas_col].sum())
-    ventas_cont = float(df.loc[df["Tipo2"]=="CONTADO", ventas_col].sum()) if "Tipo2" in df.columns else ventas
-    ventas_cred = float(df.loc[df["Tipo2"]=="CREDITO", ventas_col].sum()) if "Tipo2" in df.columns else 0.0
-
-    subtotal = float(df["Sub Total"].sum()) if "Sub Total" in df.columns else 0.0
-    utilidad = float(df["Utilidad"].sum()) if "Utilidad" in df.columns else 0.0
-    margen = safe_div(utilidad, subtotal)
-
-    txns = float(df["DOC_KEY"].nunique()) if "DOC_KEY" in df.columns else 0.0
-    ticket = safe_div(ventas, txns) if ventas_con_iva else safe_div(subtotal, txns)
-
-    descdol = float(df["Descuento $"].sum()) if "Descuento $" in df.columns else 0.0
-    descpct = safe_div(descdol, subtotal) if subtotal > 0 else float("nan")
-
-    vend = float(count_vendedores_activos(df))
-    ventas_m2 = safe_div(ventas, m2) if m2 else float("nan")
-    utilidad_m2 = safe_div(utilidad, m2) if m2 else float("nan")
-
-    return dict(
-        ventas=ventas, ventas_cont=ventas_cont, ventas_cred=ventas_cred,
-        utilidad=utilidad, subtotal=subtotal, margen=margen,
-        txns=txns, ticket=ticket,
-        descdol=descdol, descpct=descpct,
-        vendedores=vend,
-        ventas_m2=ventas_m2, utilidad_m2=utilidad_m2,
-    )
-
 # ------------------------------------------------------------
 # KPI cards
 # ------------------------------------------------------------
@@ -1958,95 +1295,7 @@ def render_table(df: pd.DataFrame,
 # ------------------------------------------------------------
 # Agregados mensuales (12 meses) + YoY
 # ------------------------------------------------------------
-def monthly_summary(df_year: pd.DataFrame, ventas_con_iva: bool) -> pd.DataFrame:
-    """
-    Devuelve DF con meses 1..12 aunque no existan filas:
-      MesNum, Mes, Ventas_Cont, Ventas_Cred, Ventas_Total, Utilidad, SubTotal, Margen, TXNS, Ticket, DescPct, Vendedores
-    """
-    base = pd.DataFrame({"MesNum": list(range(1, 13))})
-    if df_year.empty:
-        out = base.copy()
-        out["Mes"] = out["MesNum"].map(MONTHS_FULL)
-        # IMPORTANTE: Ordenar ascendente para que más reciente esté a la derecha
-        out = out.sort_values("MesNum", ascending=True)
-        for c in ["Ventas_Cont","Ventas_Cred","Ventas_Total","Utilidad","SubTotal","Margen","TXNS","Ticket","DescPct","Vendedores"]:
-            out[c] = 0.0
-        out["Margen"] = np.nan
-        out["Ticket"] = np.nan
-        out["DescPct"] = np.nan
-        return out
-
-    ventas_col = _ventas_col(ventas_con_iva)
-
-    g_type = (
-        df_year.groupby(["Mes","Tipo2"], observed=True)
-              .agg(Ventas=(ventas_col,"sum"), SubTotal=("Sub Total","sum"))
-              .reset_index()
-    )
-    pv = g_type.pivot(index="Mes", columns="Tipo2", values="Ventas").fillna(0.0)
-    v_cont = pv.get("CONTADO", pd.Series(0.0, index=pv.index))
-    v_cred = pv.get("CREDITO", pd.Series(0.0, index=pv.index))
-
-    g = (
-        df_year.groupby("Mes", observed=True)
-              .agg(
-                  Utilidad=("Utilidad","sum"),
-                  SubTotal=("Sub Total","sum"),
-                  DescDol=("Descuento $","sum"),
-                  TXNS=("DOC_KEY","nunique"),
-                  Vendedores=("Vendedor_Nombre", lambda s: s.astype("string").fillna("").str.strip().replace("TODOS","").replace("", pd.NA).dropna().nunique())
-              )
-              .reset_index()
-              .set_index("Mes")
-    )
 
-    out = base.copy()
-    out["Ventas_Cont"] = out["MesNum"].map(v_cont).fillna(0.0)
-    out["Ventas_Cred"] = out["MesNum"].map(v_cred).fillna(0.0)
-    out["Ventas_Total"] = out["Ventas_Cont"] + out["Ventas_Cred"]
-    out["Utilidad"] = out["MesNum"].map(g["Utilidad"]).fillna(0.0)
-    out["SubTotal"] = out["MesNum"].map(g["SubTotal"]).fillna(0.0)
-    out["Margen"] = out.apply(lambda r: safe_div(r["Utilidad"], r["SubTotal"]), axis=1)
-    out["TXNS"] = out["MesNum"].map(g["TXNS"]).fillna(0.0)
-    out["Ticket"] = out.apply(lambda r: safe_div(r["Ventas_Total"], r["TXNS"]) if ventas_con_iva else safe_div(r["SubTotal"], r["TXNS"]), axis=1)
-    out["DescPct"] = out.apply(lambda r: safe_div(float(g["DescDol"].get(r["MesNum"], 0.0)), r["SubTotal"]) if r["SubTotal"] > 0 else float("nan"), axis=1)
-    out["Vendedores"] = out["MesNum"].map(g["Vendedores"]).fillna(0.0)
-
-    out["Mes"] = out["MesNum"].map(MONTHS_FULL)
-    # IMPORTANTE: Ordenar ascendente para que más reciente esté a la derecha
-    out = out.sort_values("MesNum", ascending=True)
-    # ORDEN DESCENDENTE: más reciente a la derecha
-    out = out.sort_values("MesNum", ascending=True)
-    return out
-
-def add_yoy_monthly(df_cur: pd.DataFrame, df_prev: pd.DataFrame) -> pd.DataFrame:
-    out = df_cur.copy()
-    prev = df_prev.set_index("MesNum")
-    out["YoY_Ventas_Total"] = out["Ventas_Total"].map(lambda v: np.nan)
-    out["YoY_Ventas_Cont"] = out["Ventas_Cont"].map(lambda v: np.nan)
-    out["YoY_Ventas_Cred"] = out["Ventas_Cred"].map(lambda v: np.nan)
-    out["YoY_Utilidad"] = out["Utilidad"].map(lambda v: np.nan)
-    out["YoY_TXNS"] = out["TXNS"].map(lambda v: np.nan)
-    out["YoY_Ticket"] = out["Ticket"].map(lambda v: np.nan)
-    out["YoY_DescPct_pp"] = out["DescPct"].map(lambda v: np.nan)
-    out["YoY_Margen_pp"] = out["Margen"].map(lambda v: np.nan)
-
-    for i, r in out.iterrows():
-        m = int(r["MesNum"])
-        if m not in prev.index:
-            continue
-        pr = prev.loc[m]
-        out.at[i, "YoY_Ventas_Total"] = yoy(float(r["Ventas_Total"]), float(pr["Ventas_Total"]))
-        out.at[i, "YoY_Ventas_Cont"] = yoy(float(r["Ventas_Cont"]), float(pr["Ventas_Cont"]))
-        out.at[i, "YoY_Ventas_Cred"] = yoy(float(r["Ventas_Cred"]), float(pr["Ventas_Cred"]))
-        out.at[i, "YoY_Utilidad"] = yoy(float(r["Utilidad"]), float(pr["Utilidad"]))
-        out.at[i, "YoY_TXNS"] = yoy(float(r["TXNS"]), float(pr["TXNS"]))
-        out.at[i, "YoY_Ticket"] = yoy(float(r["Ticket"]), float(pr["Ticket"])) if (pd.notna(r["Ticket"]) and pd.notna(pr["Ticket"])) else np.nan
-        # % y margen como pp (delta directo)
-        out.at[i, "YoY_DescPct_pp"] = (float(r["DescPct"]) - float(pr["DescPct"])) * 100 if (pd.notna(r["DescPct"]) and pd.notna(pr["DescPct"])) else np.nan
-        out.at[i, "YoY_Margen_pp"] = (float(r["Margen"]) - float(pr["Margen"])) * 100 if (pd.notna(r["Margen"]) and pd.notna(pr["Margen"])) else np.nan
-
-    return out
 
 # ------------------------------------------------------------
 # Charts
@@ -2171,84 +1420,7 @@ def fig_quadrants(df_q: pd.DataFrame) -> go.Figure:
 # ------------------------------------------------------------
 # Breakdown helpers (Top N con YoY)
 # ------------------------------------------------------------
-def breakdown_dim(df_cur: pd.DataFrame, df_prev: pd.DataFrame, dim_col: str, ventas_con_iva: bool, top_n: int = 20) -> pd.DataFrame:
-    ventas_col = _ventas_col(ventas_con_iva)
-    if df_cur.empty:
-        return pd.DataFrame(columns=[dim_col,"Ventas","Utilidad","SubTotal","Margen","TXNS",
-                                     "YoY_Ventas","YoY_Utilidad","YoY_TXNS","YoY_Margen_pp"])
-
-    cur = (
-        df_cur.groupby(dim_col, observed=True)
-              .agg(Ventas=(ventas_col,"sum"), Utilidad=("Utilidad","sum"), SubTotal=("Sub Total","sum"), TXNS=("DOC_KEY","nunique"))
-              .reset_index()
-    )
-    cur["Margen"] = cur.apply(lambda r: safe_div(r["Utilidad"], r["SubTotal"]), axis=1)
-
-    prev = (
-        df_prev.groupby(dim_col, observed=True)
-              .agg(Ventas_LY=(ventas_col,"sum"), Utilidad_LY=("Utilidad","sum"), SubTotal_LY=("Sub Total","sum"), TXNS_LY=("DOC_KEY","nunique"))
-              .reset_index()
-    )
-    prev["Margen_LY"] = prev.apply(lambda r: safe_div(r["Utilidad_LY"], r["SubTotal_LY"]), axis=1)
-
-    out = cur.merge(prev, on=dim_col, how="left")
-    out["YoY_Ventas"] = out.apply(lambda r: yoy(float(r["Ventas"]), float(r["Ventas_LY"])) if pd.notna(r["Ventas_LY"]) else np.nan, axis=1)
-    out["YoY_Utilidad"] = out.apply(lambda r: yoy(float(r["Utilidad"]), float(r["Utilidad_LY"])) if pd.notna(r["Utilidad_LY"]) else np.nan, axis=1)
-    out["YoY_TXNS"] = out.apply(lambda r: yoy(float(r["TXNS"]), float(r["TXNS_LY"])) if pd.notna(r["TXNS_LY"]) else np.nan, axis=1)
-    out["YoY_Margen_pp"] = out.apply(lambda r: (float(r["Margen"]) - float(r["Margen_LY"])) * 100 if (pd.notna(r["Margen"]) and pd.notna(r["Margen_LY"])) else np.nan, axis=1)
-
-    out = out.sort_values("Ventas", ascending=False).head(int(top_n)).reset_index(drop=True)
-    return out
-
-def vendor_metrics(df_cur: pd.DataFrame, df_prev: pd.DataFrame, ventas_con_iva: bool, top_n: int = 30) -> pd.DataFrame:
-    ventas_col = _ventas_col(ventas_con_iva)
-    if df_cur.empty:
-        return pd.DataFrame(columns=["Vendedor","Ventas","Ventas_Cont","Ventas_Cred","Utilidad","SubTotal","Margen","TXNS","Ticket",
-                                     "YoY_Ventas","YoY_Utilidad","YoY_TXNS","YoY_Ticket","YoY_Margen_pp"])
-
-    cur = (
-        df_cur.groupby("Vendedor_Nombre", observed=True)
-              .agg(
-                  Ventas=(ventas_col,"sum"),
-                  Ventas_Cont=(ventas_col, lambda s: float(df_cur.loc[s.index].loc[df_cur.loc[s.index]["Tipo2"]=="CONTADO", ventas_col].sum()) if "Tipo2" in df_cur.columns else float(s.sum())),
-                  Ventas_Cred=(ventas_col, lambda s: float(df_cur.loc[s.index].loc[df_cur.loc[s.index]["Tipo2"]=="CREDITO", ventas_col].sum()) if "Tipo2" in df_cur.columns else 0.0),
-                  Utilidad=("Utilidad","sum"),
-                  SubTotal=("Sub Total","sum"),
-                  TXNS=("DOC_KEY","nunique"),
-                  Lineas=("DOC_KEY","size"),
-                  SKU_UNQ=("SKU_KEY", lambda s: s.dropna().nunique()),
-              )
-              .reset_index()
-              .rename(columns={"Vendedor_Nombre":"Vendedor"})
-    )
-    cur["Margen"] = cur.apply(lambda r: safe_div(r["Utilidad"], r["SubTotal"]), axis=1)
-    cur["Ticket"] = cur.apply(lambda r: safe_div(r["Ventas"], r["TXNS"]) if ventas_con_iva else safe_div(r["SubTotal"], r["TXNS"]), axis=1)
-    # SKUs por ticket: si no hay SKU, usa líneas por ticket
-    cur["SKUs_x_Ticket"] = cur.apply(lambda r: safe_div(r["SKU_UNQ"] if r["SKU_UNQ"] > 0 else r["Lineas"], r["TXNS"]), axis=1)
-
-    prev = (
-        df_prev.groupby("Vendedor_Nombre", observed=True)
-              .agg(
-                  Ventas_LY=(ventas_col,"sum"),
-                  Utilidad_LY=("Utilidad","sum"),
-                  SubTotal_LY=("Sub Total","sum"),
-                  TXNS_LY=("DOC_KEY","nunique"),
-              )
-              .reset_index()
-              .rename(columns={"Vendedor_Nombre":"Vendedor"})
-    )
-    prev["Margen_LY"] = prev.apply(lambda r: safe_div(r["Utilidad_LY"], r["SubTotal_LY"]), axis=1)
-    prev["Ticket_LY"] = prev.apply(lambda r: safe_div(r["Ventas_LY"], r["TXNS_LY"]) if ventas_con_iva else safe_div(r["SubTotal_LY"], r["TXNS_LY"]), axis=1)
-
-    out = cur.merge(prev, on="Vendedor", how="left")
-    out["YoY_Ventas"] = out.apply(lambda r: yoy(float(r["Ventas"]), float(r["Ventas_LY"])) if pd.notna(r.get("Ventas_LY")) else np.nan, axis=1)
-    out["YoY_Utilidad"] = out.apply(lambda r: yoy(float(r["Utilidad"]), float(r["Utilidad_LY"])) if pd.notna(r.get("Utilidad_LY")) else np.nan, axis=1)
-    out["YoY_TXNS"] = out.apply(lambda r: yoy(float(r["TXNS"]), float(r["TXNS_LY"])) if pd.notna(r.get("TXNS_LY")) else np.nan, axis=1)
-    out["YoY_Ticket"] = out.apply(lambda r: yoy(float(r["Ticket"]), float(r["Ticket_LY"])) if pd.notna(r.get("Ticket_LY")) else np.nan, axis=1)
-    out["YoY_Margen_pp"] = out.apply(lambda r: (float(r["Margen"]) - float(r["Margen_LY"])) * 100 if (pd.notna(r.get("Margen")) and pd.notna(r.get("Margen_LY"))) else np.nan, axis=1)
 
-    out = out.sort_values("Ventas", ascending=False).head(int(top_n)).reset_index(drop=True)
-    return out
 
 # ------------------------------------------------------------
 # Insights
@@ -2315,142 +1487,185 @@ def insight_cards(k_cur: Dict[str,float], k_prev: Dict[str,float], ventas_con_iv
         card("Ventas vs Utilidad", "Calidad", txt, cls)
 
 # ------------------------------------------------------------
-# Sidebar (filtros)
+# Semáforo + narrativa (Comando Central)
 # ------------------------------------------------------------
-with st.sidebar:
-    # Aplicar tema
-    aplicar_tema()
-    
-    # Toggle de tema
-    mostrar_toggle_tema()
-    
-    st.markdown("---")
-    
-    st.markdown("### IMDC — Filtros")
-    modo_tecnico = st.toggle("Modo técnico", value=False, key="modo_tecnico")
-
-    df_all, years, familias, marcas = load_all()
-
-    if df_all.empty:
-        st.error("No se encontraron archivos Parquet en la carpeta ./output (cedro_*.parquet).")
-        st.stop()
-
-    year = st.selectbox("Año", options=years, index=len(years)-1 if years else 0, key=make_key("year"))
-    # mes default: último mes con datos en ese año
-    df_y = df_all[df_all["Año"].astype(int) == int(year)]
-    last_month = int(df_y["Mes"].dropna().astype(int).max()) if not df_y.empty else 12
-    # ⚡ AUTOMÁTICO: Últimos 13 meses (puede cruzar años)
-    meses_disponibles = sorted([int(m) for m in df_y["Mes"].dropna().unique()])
-    if meses_disponibles:
-        ultimo_mes = max(meses_disponibles)
-        m_start = ultimo_mes - 12  # 13 meses hacia atrás
-        m_end = ultimo_mes
-        
-        # Si m_start < 1, significa que cruza al año anterior
-        if m_start < 1:
-            year_inicio = int(year) - 1
-            m_start_display = m_start + 12  # Convertir a mes del año anterior
-        else:
-            year_inicio = int(year)
-            m_start_display = m_start
-            
-        st.info(f"📊 Mostrando últimos 13 meses: {MONTHS_FULL[m_start_display if m_start > 0 else m_start + 12]} {year_inicio} - {MONTHS_FULL[m_end]} {year}")
-    else:
-        m_start, m_end = 1, 12
-
-    sucursal = st.selectbox("Sucursal", options=CATALOGO_SUCURSALES, index=0, key=make_key("sucursal"))
-    familia = st.selectbox("Familia", options=(["TODAS"] + familias), index=0, key=make_key("familia"))
-    marca = st.selectbox("Marca", options=(["TODAS"] + marcas), index=0, key=make_key("marca"))
-
-    ventas_con_iva = st.toggle("Ventas CON IVA", value=True, key=make_key("iva"))
-    include_rem = st.toggle("Incluir REM", value=False, key=make_key("rem"))
-    
-    st.markdown("---")
-    st.markdown("#### 🎯 Filtros Avanzados")
-    excluir_credito = st.checkbox("Excluir ventas de CRÉDITO", value=False, key=make_key("excluir_credito"))
-    if excluir_credito:
-        st.info("📊 Solo se mostrarán ventas de CONTADO")
+def _estado_semaforo(valor: float, tipo: str) -> Tuple[str, str]:
+    """(color, etiqueta) según la variación vs LY: pct en fracción, pp en puntos."""
+    if valor != valor:
+        return ("#94A3B8", "Sin base LY")
+    tolerancia = -0.05 if tipo == "pct" else -1.0
+    if valor >= 0:
+        return ("#10B981", "En crecimiento")
+    if valor >= tolerancia:
+        return ("#F59E0B", "Estable / atención")
+    return ("#EF4444", "En caída")
+
+def semaforo_salud(k_cur: Dict[str, float], k_prev: Dict[str, float]):
+    """Semáforo de salud del período vs el mismo período del año anterior."""
+    d_margin = (k_cur["margen"] - k_prev["margen"]) * 100 if (pd.notna(k_cur["margen"]) and pd.notna(k_prev["margen"])) else np.nan
+    senales = [
+        ("Ventas", yoy(k_cur["ventas"], k_prev["ventas"]), "pct"),
+        ("Utilidad", yoy(k_cur["utilidad"], k_prev["utilidad"]), "pct"),
+        ("Margen", d_margin, "pp"),
+        ("Transacciones", yoy(k_cur["txns"], k_prev["txns"]), "pct"),
+    ]
+    cols = st.columns(len(senales))
+    for col, (nombre, valor, tipo) in zip(cols, senales):
+        color, estado = _estado_semaforo(valor, tipo)
+        _cls, txt = _pill_pct(valor) if tipo == "pct" else _pill_pp(valor)
+        with col:
+            st.markdown(
+                f"""
+                <div class="notranslate" translate="no" style="border-left: 6px solid {color}; border-radius: 8px;
+                     padding: 8px 12px; background: rgba(148, 163, 184, 0.08);">
+                  <div style="font-size: 0.8rem; opacity: 0.8;">● {nombre}</div>
+                  <div style="font-weight: 700; color: {color};">{estado}</div>
+                  <div style="font-size: 0.8rem;">{txt}</div>
+                </div>
+                """,
+                unsafe_allow_html=True,
+            )
 
-    if modo_tecnico:
-        st.markdown("---")
-        if st.button("Recargar datos (limpiar caché)"):
-            st.cache_data.clear()
-            _bump_ui_epoch()
-            st.rerun()
-        st.markdown(f"<div class='tiny'>Versión: {APP_VERSION} | UI epoch: {_ui_epoch()}</div>", unsafe_allow_html=True)
-        # Diagnósticos rápidos
-        st.caption(f"Parquets detectados: {len(list(OUTPUT_DIR.glob(PARQUET_GLOB)))} en {OUTPUT_DIR}")
+def _etiqueta_ventana(m_start: int, m_end: int, year: int) -> str:
+    """'Febrero 2025 – Enero 2026' (m_start < 1 = la ventana empieza en el año anterior)."""
+    if m_start < 1:
+        return f"{MONTHS_FULL[m_start + 12]} {year - 1} – {MONTHS_FULL[m_end]} {year}"
+    if m_start == m_end:
+        return f"{MONTHS_FULL[m_end]} {year}"
+    return f"{MONTHS_FULL[m_start]} – {MONTHS_FULL[m_end]} {year}"
+
+def narrativa_ejecutiva(k_cur: Dict[str, float], k_prev: Dict[str, float],
+                        sucursal: str, m_start: int, m_end: int, year: int):
+    """Resumen en texto del período para lectura rápida."""
+    y_sales = yoy(k_cur["ventas"], k_prev["ventas"])
+    y_profit = yoy(k_cur["utilidad"], k_prev["utilidad"])
+    y_txns = yoy(k_cur["txns"], k_prev["txns"])
 
+    def _vs(v: float) -> str:
+        if v != v:
+            return "sin comparativo del año anterior"
+        return f"{'▲' if v >= 0 else '▼'} {pct_fmt(abs(v))} vs LY"
 
-    # Control de caché
-    mostrar_control_cache()
+    alcance = "el consolidado" if sucursal == "CONSOLIDADO" else f"la sucursal {sucursal}"
+    texto = (
+        f"En **{_etiqueta_ventana(int(m_start), int(m_end), int(year))}**, {alcance} vendió "
+        f"**{money_fmt(k_cur['ventas'])}** ({_vs(y_sales)}) con una utilidad de "
+        f"**{money_fmt(k_cur['utilidad'])}** ({_vs(y_profit)})"
+    )
+    if pd.notna(k_cur["margen"]):
+        texto += f" y margen de **{pct_fmt(k_cur['margen'])}**"
+    texto += f". Se registraron **{num_fmt(k_cur['txns'])}** transacciones ({_vs(y_txns)})"
+    if pd.notna(k_cur["ticket"]):
+        texto += f" con ticket promedio de **{money_fmt(k_cur['ticket'])}**"
+    st.markdown(texto + ".")
 
 # ------------------------------------------------------------
-# Main computations
+# Sidebar (filtros)
 # ------------------------------------------------------------
-# Datos del rango
-# Mostrar progreso durante filtrado
-with st.spinner("Aplicando filtros..."):
-    df_kpi = apply_filters(df_all, int(year), int(m_start), int(m_end), sucursal, familia, marca, include_rem, excluir_credito)
-df_prev = apply_filters(df_all, int(year)-1, int(m_start), int(m_end), sucursal, familia, marca, include_rem, excluir_credito)
+_CLAVES_FILTROS = ("year", "sucursal", "familia", "marca", "iva", "rem", "excluir_credito")
 
-# Datos del año completo (para gráfico histórico)
-df_year = apply_filters_year(df_all, int(year), sucursal, familia, marca, include_rem, excluir_credito)
-df_year_prev = apply_filters_year(df_all, int(year)-1, sucursal, familia, marca, include_rem, excluir_credito)
+def sidebar_filtros(ds: Dataset) -> Filtros:
+    """Dibuja el sidebar (tema, filtros, modo técnico) y devuelve la selección."""
+    # Streamlit descarta el estado de un widget cuando una página no lo dibuja;
+    # re-asignarlo mantiene la selección al cambiar de página.
+    for k in map(make_key, _CLAVES_FILTROS):
+        if k in st.session_state:
+            st.session_state[k] = st.session_state[k]
 
-# m2 según sucursal
-m2 = float(M2_MAP.get(sucursal, M2_MAP["CONSOLIDADO"])) if sucursal in M2_MAP else float(M2_MAP["CONSOLIDADO"])
+    df_all, years, familias, marcas = ds.df_all, ds.years, ds.familias, ds.marcas
 
-k_cur = calcular_kpis_cached(df_kpi, ventas_con_iva, m2)
-k_prev = calcular_kpis_cached(df_prev, ventas_con_iva, m2)
+    with st.sidebar:
+        # Aplicar tema
+        aplicar_tema()
 
-# mensual 12 meses + YoY (mes-a-mes)
+        # Toggle de tema
+        mostrar_toggle_tema()
 
-# ============================================================
-# FIX: COMBINAR DATOS MULTI-AÑO CORRECTAMENTE
-# ============================================================
+        st.markdown("---")
 
-# Si m_start es negativo, significa que cruza al año anterior
-if m_start < 1:
-    # Caso complejo: cruza años (13 meses hacia atrás desde mes actual)
-    # Ejemplo: Si estamos en Ene 2026 (m_end=1), m_start=-11
-    # Queremos: Feb 2025 a Ene 2026 (13 meses)
-    
-    m_start_prev = m_start + 12  # Convertir a mes del año anterior (-11 + 12 = 1)
-    
-    # Tomar meses del año anterior (desde m_start_prev hasta 12)
-    df_prev_months = df_year_prev[df_year_prev["Mes"].astype(int) >= m_start_prev].copy()
-    
-    # Tomar meses del año actual (desde 1 hasta m_end)
-    df_curr_months = df_year[df_year["Mes"].astype(int) <= m_end].copy()
-    
-    # IMPORTANTE: Crear resúmenes separados para evitar que se mezclen los meses
-    # Por ejemplo, Enero 2025 y Enero 2026 no deben sumarse
-    ms_prev_part = resumen_mensual_cached(df_prev_months, ventas_con_iva)
-    ms_curr_part = resumen_mensual_cached(df_curr_months, ventas_con_iva)
-    
-    # Filtrar solo los meses que necesitamos de cada año
-    ms_prev_part = ms_prev_part[ms_prev_part["MesNum"] >= m_start_prev]
-    ms_curr_part = ms_curr_part[ms_curr_part["MesNum"] <= m_end]
-    
-    # Concatenar en orden cronológico: primero año anterior, luego año actual
-    ms_cur = pd.concat([ms_prev_part, ms_curr_part], ignore_index=True)
-    
-    # Ordenar por MesNum ascendente para mantener orden cronológico
-    ms_cur = ms_cur.sort_values("MesNum", ascending=True).reset_index(drop=True)
-    
-else:
-    # Caso simple: todos los meses dentro del mismo año
-    df_combined = df_year[df_year["Mes"].astype(int).between(m_start, m_end)].copy()
-    ms_cur = resumen_mensual_cached(df_combined, ventas_con_iva)
-    
-    # Filtrar solo los meses en el rango
-    ms_cur = ms_cur[ms_cur["MesNum"].between(m_start, m_end)]
+        st.markdown("### IMDC — Filtros")
+        modo_tecnico = st.toggle("Modo técnico", value=False, key="modo_tecnico")
+
+        if df_all.empty:
+            st.error("No se encontraron archivos Parquet en la carpeta ./output (cedro_*.parquet).")
+            st.stop()
+
+        year = st.selectbox("Año", options=years, index=len(years)-1 if years else 0, key=make_key("year"))
+        # mes default: último mes con datos en ese año
+        # ⚡ AUTOMÁTICO: Últimos 13 meses (puede cruzar años)
+        meses_disponibles = meses_con_datos(df_all, int(year))
+        if meses_disponibles:
+            ultimo_mes = max(meses_disponibles)
+            m_start = ultimo_mes - 12  # 13 meses hacia atrás
+            m_end = ultimo_mes
+
+            # Si m_start < 1, significa que cruza al año anterior
+            if m_start < 1:
+                year_inicio = int(year) - 1
+                m_start_display = m_start + 12  # Convertir a mes del año anterior
+            else:
+                year_inicio = int(year)
+                m_start_display = m_start
+
+            st.info(f"📊 Mostrando últimos 13 meses: {MONTHS_FULL[m_start_display if m_start > 0 else m_start + 12]} {year_inicio} - {MONTHS_FULL[m_end]} {year}")
+        else:
+            m_start, m_end = 1, 12
 
-# Crear resumen mensual del año anterior completo (para comparaciones YoY)
-ms_prev = resumen_mensual_cached(df_year_prev, ventas_con_iva)
-ms = add_yoy_monthly(ms_cur, ms_prev)
+        sucursal = st.selectbox("Sucursal", options=CATALOGO_SUCURSALES, index=0, key=make_key("sucursal"))
+        familia = st.selectbox("Familia", options=(["TODAS"] + familias), index=0, key=make_key("familia"))
+        marca = st.selectbox("Marca", options=(["TODAS"] + marcas), index=0, key=make_key("marca"))
 
+        ventas_con_iva = st.toggle("Ventas CON IVA", value=True, key=make_key("iva"))
+        include_rem = st.toggle("Incluir REM", value=False, key=make_key("rem"))
+
+        st.markdown("---")
+        st.markdown("#### 🎯 Filtros Avanzados")
+        excluir_credito = st.checkbox("Excluir ventas de CRÉDITO", value=False, key=make_key("excluir_credito"))
+        if excluir_credito:
+            st.info("📊 Solo se mostrarán ventas de CONTADO")
+
+        if modo_tecnico:
+            _diagnostico_tecnico(ds)
+
+        # Control de caché
+        mostrar_control_cache()
+
+    return Filtros(
+        year=int(year), m_start=int(m_start), m_end=int(m_end),
+        sucursal=sucursal, familia=familia, marca=marca,
+        ventas_con_iva=bool(ventas_con_iva), include_rem=bool(include_rem),
+        excluir_credito=bool(excluir_credito),
+    )
+
+def _diagnostico_tecnico(ds: Dataset):
+    st.markdown("---")
+    if st.button("Recargar datos"):
+        # Sin limpiar cachés de nadie: se arma la versión nueva y se publica al terminar
+        if pedir_refresco():
+            st.toast("🔄 Refresco en segundo plano; los datos nuevos aparecen al terminar.")
+        else:
+            _bump_ui_epoch()
+            st.rerun()
+    st.markdown(f"<div class='tiny'>Versión: {APP_VERSION} | UI epoch: {_ui_epoch()}</div>", unsafe_allow_html=True)
+    # Diagnósticos rápidos
+    st.caption(f"Parquets detectados: {len(list(OUTPUT_DIR.glob(PARQUET_GLOB)))} en {OUTPUT_DIR}")
+    st.caption(f"Snapshots enriquecidos (Año/Mes/Almacen): {len(list(CACHE_DIR.glob('hive_*')))} en {CACHE_DIR}")
+    _ref = refrescador()
+    st.caption(
+        f"Dataset v{ds.version} ({ds.huella}) cargado {datetime.fromtimestamp(ds.cargado).strftime('%H:%M:%S')}"
+        + (f" | refresco cada {int(_ref.intervalo)}s" if _ref is not None and _ref.is_alive() else " | sin refresco en segundo plano")
+    )
+    if _ref is not None and _ref.ultimo_error:
+        st.caption(f"⚠️ Último refresco falló: {_ref.ultimo_error}")
+    _ult = _leer_manifest().get("ultima_carga", {})
+    if _ult:
+        st.caption(f"Última ingesta: {_ult.get('enriquecidas', 0)} archivo(s) re-enriquecido(s), {_ult.get('reusadas', 0)} reutilizado(s)")
+    _n, _hits, _miss = CONSULTAS.estadisticas()
+    st.caption(f"Caché de consultas: {_n} entradas | {_hits} aciertos / {_miss} cálculos")
+    with st.expander("⏱️ Tiempos de importación"):
+        # Diferidos (plotly, gráficos, reportlab...) aparecen recién en su primer uso
+        _imp = pd.DataFrame(reporte_imports(), columns=["modulo", "ms", "a_los_s", "ya_cargado"])
+        st.dataframe(_imp.round({"ms": 1, "a_los_s": 2}), hide_index=True, use_container_width=True)
 
 
 # ============================================================
@@ -2773,10 +1988,10 @@ def drill_down_explorer(df: pd.DataFrame, jerarquia: list):
     
     # Agregar por nivel actual
     if nivel_actual in df_filtrado.columns:
-        resumen = df_filtrado.groupby(nivel_actual).agg({
+        resumen = df_filtrado.groupby(nivel_actual, observed=True).agg({
             'Total_alloc': 'sum',
             'Utilidad': 'sum',
-            'DOC_KEY': 'nunique'
+            'DOC_ID': 'nunique'
         }).reset_index()
         
         resumen.columns = [nivel_actual, 'Ventas', 'Utilidad', 'Transacciones']
@@ -2859,8 +2074,8 @@ def comparador_periodos(df_all: pd.DataFrame, year: int):
         st.metric("Utilidad P1", money_fmt(util1))
         st.metric("Utilidad P2", money_fmt(util2), f"{delta_util:+.1f}%")
     
-    txns1 = df1['DOC_KEY'].nunique()
-    txns2 = df2['DOC_KEY'].nunique()
+    txns1 = df1['DOC_ID'].nunique()
+    txns2 = df2['DOC_ID'].nunique()
     delta_txns = ((txns1 - txns2) / txns2 * 100) if txns2 > 0 else 0
     
     with kpis_comp[2]:
@@ -2972,21 +2187,11 @@ def crear_comparador_unificado_yoy(df_all: pd.DataFrame, year_actual: int, venta
         st.warning("⚠️ Selecciona años diferentes para comparar")
         return
     
-    # Aplicar filtros
-    df_filtrado = df_all.copy()
-    
-    if sucursal_filtro != 'TODAS':
-        df_filtrado = df_filtrado[df_filtrado['Almacen_CANON'] == sucursal_filtro]
-    
-    if familia_filtro != 'TODAS':
-        df_filtrado = df_filtrado[df_filtrado['Familia_Nombre'] == familia_filtro]
-    
-    if marca_filtro != 'TODAS':
-        df_filtrado = df_filtrado[df_filtrado['Marca_Nombre'] == marca_filtro]
-    
-    # Separar por año
-    df_base = df_filtrado[df_filtrado['Año'] == año_base]
-    df_comp = df_filtrado[df_filtrado['Año'] == año_comp]
+    # Aplicar filtros: apply_filters toma las filas de df_all por particiones / índice,
+    # sin copiar el dataset compartido
+    sucursal = 'CONSOLIDADO' if sucursal_filtro == 'TODAS' else sucursal_filtro
+    df_base = apply_filters(df_all, int(año_base), 1, 12, sucursal, familia_filtro, marca_filtro, True)
+    df_comp = apply_filters(df_all, int(año_comp), 1, 12, sucursal, familia_filtro, marca_filtro, True)
     
     ventas_col = "Total_alloc" if ventas_con_iva else "Sub Total"
     
@@ -2994,14 +2199,14 @@ def crear_comparador_unificado_yoy(df_all: pd.DataFrame, year_actual: int, venta
     resumen_base = df_base.groupby('Mes').agg({
         ventas_col: 'sum',
         'Utilidad': 'sum',
-        'DOC_KEY': 'nunique',
+        'DOC_ID': 'nunique',
         'Sub Total': 'sum'
     }).reset_index().sort_values('Mes')
     
     resumen_comp = df_comp.groupby('Mes').agg({
         ventas_col: 'sum',
         'Utilidad': 'sum',
-        'DOC_KEY': 'nunique',
+        'DOC_ID': 'nunique',
         'Sub Total': 'sum'
     }).reset_index().sort_values('Mes')
     
@@ -3068,16 +2273,16 @@ def crear_comparador_unificado_yoy(df_all: pd.DataFrame, year_actual: int, venta
         st.plotly_chart(fig_mensual, use_container_width=True)
         
         # Variación
-        comparacion = resumen_base[['Mes', 'Mes_Nombre', ventas_col]].merge(
-            resumen_comp[['Mes', ventas_col]],
-            on='Mes',
-            how='outer',
-            suffixes=(f'_{año_base}', f'_{año_comp}')
+        comparacion = comparar_yoy(
+            resumen_comp[['Mes', 'Mes_Nombre', ventas_col]],
+            resumen_base[['Mes', 'Mes_Nombre', ventas_col]],
+            ['Mes', 'Mes_Nombre'],
+            pct=[ventas_col],
+            sufijos=(f'_{año_comp}', f'_{año_base}'),
+            como='outer'
         )
         
-        comparacion['Var_Pct'] = ((comparacion[f'{ventas_col}_{año_comp}'] - 
-                                    comparacion[f'{ventas_col}_{año_base}']) / 
-                                   comparacion[f'{ventas_col}_{año_base}']) * 100
+        comparacion['Var_Pct'] = comparacion.pop(f'YoY_{ventas_col}') * 100
         
         colors_var = ['#10B981' if x >= 0 else '#EF4444' for x in comparacion['Var_Pct']]
         
@@ -3449,29 +2654,29 @@ def crear_comparador_mensual_yoy(df_all: pd.DataFrame, year_actual: int, ventas_
     resumen_base = df_base.groupby('Mes').agg({
         ventas_col: 'sum',
         'Utilidad': 'sum',
-        'DOC_KEY': 'nunique',
+        'DOC_ID': 'nunique',
         'Sub Total': 'sum'
     }).reset_index()
     
     resumen_comp = df_comp.groupby('Mes').agg({
         ventas_col: 'sum',
         'Utilidad': 'sum',
-        'DOC_KEY': 'nunique',
+        'DOC_ID': 'nunique',
         'Sub Total': 'sum'
     }).reset_index()
     
     # Calcular métricas
-    resumen_base['Ticket'] = resumen_base[ventas_col] / resumen_base['DOC_KEY']
+    resumen_base['Ticket'] = resumen_base[ventas_col] / resumen_base['DOC_ID']
     resumen_base['Margen'] = resumen_base['Utilidad'] / resumen_base['Sub Total']
     
-    resumen_comp['Ticket'] = resumen_comp[ventas_col] / resumen_comp['DOC_KEY']
+    resumen_comp['Ticket'] = resumen_comp[ventas_col] / resumen_comp['DOC_ID']
     resumen_comp['Margen'] = resumen_comp['Utilidad'] / resumen_comp['Sub Total']
     
     # Mapear métrica seleccionada
     metrica_map = {
         "Ventas": ventas_col,
         "Utilidad": "Utilidad",
-        "Transacciones": "DOC_KEY",
+        "Transacciones": "DOC_ID",
         "Ticket Promedio": "Ticket",
         "Margen %": "Margen"
     }
@@ -3479,11 +2684,14 @@ def crear_comparador_mensual_yoy(df_all: pd.DataFrame, year_actual: int, ventas_
     col_metrica = metrica_map[metrica_comparar]
     
     # Merge para comparación
-    comparacion = resumen_base[['Mes', col_metrica]].merge(
+    comparacion = comparar_yoy(
         resumen_comp[['Mes', col_metrica]],
-        on='Mes',
-        how='outer',
-        suffixes=(f'_{año_base}', f'_{año_comparar}')
+        resumen_base[['Mes', col_metrica]],
+        'Mes',
+        pct=[col_metrica],
+        dif=[col_metrica],
+        sufijos=(f'_{año_comparar}', f'_{año_base}'),
+        como='outer'
     )
     
     comparacion['Mes'] = comparacion['Mes'].astype(int)
@@ -3494,8 +2702,8 @@ def crear_comparador_mensual_yoy(df_all: pd.DataFrame, year_actual: int, ventas_
     col_base = f'{col_metrica}_{año_base}'
     col_comp = f'{col_metrica}_{año_comparar}'
     
-    comparacion['Variacion_Abs'] = comparacion[col_comp] - comparacion[col_base]
-    comparacion['Variacion_Pct'] = ((comparacion[col_comp] - comparacion[col_base]) / comparacion[col_base]) * 100
+    comparacion['Variacion_Abs'] = comparacion.pop(f'Delta_{col_metrica}')
+    comparacion['Variacion_Pct'] = comparacion.pop(f'YoY_{col_metrica}') * 100
     
     # GRÁFICA DE BARRAS AGRUPADAS
     fig_barras = go.Figure()
@@ -3631,23 +2839,23 @@ def crear_comparador_acumulado_yoy(df_all: pd.DataFrame, year_actual: int, venta
     resumen_base = df_base.groupby('Mes').agg({
         ventas_col: 'sum',
         'Utilidad': 'sum',
-        'DOC_KEY': 'nunique'
+        'DOC_ID': 'nunique'
     }).reset_index().sort_values('Mes')
     
     resumen_comp = df_comp.groupby('Mes').agg({
         ventas_col: 'sum',
         'Utilidad': 'sum',
-        'DOC_KEY': 'nunique'
+        'DOC_ID': 'nunique'
     }).reset_index().sort_values('Mes')
     
     # CALCULAR ACUMULADOS
     resumen_base['Ventas_Acum'] = resumen_base[ventas_col].cumsum()
     resumen_base['Utilidad_Acum'] = resumen_base['Utilidad'].cumsum()
-    resumen_base['Txns_Acum'] = resumen_base['DOC_KEY'].cumsum()
+    resumen_base['Txns_Acum'] = resumen_base['DOC_ID'].cumsum()
     
     resumen_comp['Ventas_Acum'] = resumen_comp[ventas_col].cumsum()
     resumen_comp['Utilidad_Acum'] = resumen_comp['Utilidad'].cumsum()
-    resumen_comp['Txns_Acum'] = resumen_comp['DOC_KEY'].cumsum()
+    resumen_comp['Txns_Acum'] = resumen_comp['DOC_ID'].cumsum()
     
     resumen_base['Mes_Nombre'] = resumen_base['Mes'].map(MONTHS_FULL)
     resumen_comp['Mes_Nombre'] = resumen_comp['Mes'].map(MONTHS_FULL)
@@ -3730,21 +2938,18 @@ def crear_comparador_acumulado_yoy(df_all: pd.DataFrame, year_actual: int, venta
     st.markdown("#### 📋 Tabla Acumulada")
     
     # Merge para comparación
-    comparacion_acum = resumen_base[['Mes', 'Mes_Nombre', 'Ventas_Acum', 'Utilidad_Acum', 'Txns_Acum']].merge(
-        resumen_comp[['Mes', 'Ventas_Acum', 'Utilidad_Acum', 'Txns_Acum']],
-        on='Mes',
-        how='outer',
-        suffixes=(f'_{año_base_acum}', f'_{año_comparar_acum}')
+    comparacion_acum = comparar_yoy(
+        resumen_comp[['Mes', 'Mes_Nombre', 'Ventas_Acum', 'Utilidad_Acum', 'Txns_Acum']],
+        resumen_base[['Mes', 'Mes_Nombre', 'Ventas_Acum', 'Utilidad_Acum', 'Txns_Acum']],
+        ['Mes', 'Mes_Nombre'],
+        pct=['Ventas_Acum', 'Utilidad_Acum'],
+        sufijos=(f'_{año_comparar_acum}', f'_{año_base_acum}'),
+        como='outer'
     ).sort_values('Mes')
     
-    # Calcular variaciones
-    comparacion_acum[f'Var_Ventas'] = ((comparacion_acum[f'Ventas_Acum_{año_comparar_acum}'] - 
-                                         comparacion_acum[f'Ventas_Acum_{año_base_acum}']) / 
-                                        comparacion_acum[f'Ventas_Acum_{año_base_acum}']) * 100
-    
-    comparacion_acum[f'Var_Utilidad'] = ((comparacion_acum[f'Utilidad_Acum_{año_comparar_acum}'] - 
-                                          comparacion_acum[f'Utilidad_Acum_{año_base_acum}']) / 
-                                         comparacion_acum[f'Utilidad_Acum_{año_base_acum}']) * 100
+    # Variaciones en %
+    comparacion_acum['Var_Ventas'] = comparacion_acum.pop('YoY_Ventas_Acum') * 100
+    comparacion_acum['Var_Utilidad'] = comparacion_acum.pop('YoY_Utilidad_Acum') * 100
     
     # Formatear tabla
     tabla_acum = comparacion_acum[['Mes_Nombre', 
@@ -3821,293 +3026,204 @@ def crear_comparador_acumulado_yoy(df_all: pd.DataFrame, year_actual: int, venta
 # ============================================================
 # 🎨 NUEVA SECCIÓN HERO - DASHBOARD MEJORADO
 # ============================================================
-
-st.markdown("""
-<div class="hero-section">
-    <div class="hero-title">📊 FERRETERÍA EL CEDRO - Dashboard Ejecutivo</div>
-    <div class="hero-subtitle">
-        Período: Últimos 13 meses | 
-        Actualizado: {}
+def render_hero(p: Periodo):
+    """Sección hero del Comando Central: KPIs con sparkline, heatmap, gauges y objetivos."""
+    k_cur, k_prev, ms_cur, df_kpi = p.k_cur, p.k_prev, p.ms_cur, p.df_kpi
+    ventas_con_iva = p.filtros.ventas_con_iva
+
+    st.markdown("""
+    <div class="hero-section">
+        <div class="hero-title">📊 FERRETERÍA EL CEDRO - Dashboard Ejecutivo</div>
+        <div class="hero-subtitle">
+            Período: Últimos 13 meses | 
+            Actualizado: {}
+        </div>
     </div>
-</div>
-""".format(datetime.now().strftime("%d/%m/%Y %H:%M")), unsafe_allow_html=True)
-
-# ============================================================
-# FILTROS AVANZADOS EN EXPANDER
-# ============================================================
-with st.expander("🔍 Filtros Avanzados y Opciones", expanded=False):
-    col_f1, col_f2, col_f3 = st.columns(3)
-    
-    with col_f1:
-        st.markdown("#### 📅 Período de Análisis")
-        periodo_tipo = st.radio(
-            "Tipo de período:",
-            ["Últimos 13 meses", "Último trimestre", "Año completo", "Personalizado"],
-            index=0,
-            key="periodo_tipo_hero"
-        )
-        
-    with col_f2:
-        st.markdown("#### 💰 Rango de Ventas")
-        if not df_kpi.empty:
-            max_venta = float(df_kpi[_ventas_col(ventas_con_iva)].sum() * 1.2)
-            rango_ventas = st.slider(
-                "Filtrar por rango:",
-                0.0, max_venta,
-                (0.0, max_venta),
-                key="rango_ventas_hero"
+    """.format(datetime.now().strftime("%d/%m/%Y %H:%M")), unsafe_allow_html=True)
+
+    # ============================================================
+    # FILTROS AVANZADOS EN EXPANDER
+    # ============================================================
+    with st.expander("🔍 Filtros Avanzados y Opciones", expanded=False):
+        col_f1, col_f2, col_f3 = st.columns(3)
+    
+        with col_f1:
+            st.markdown("#### 📅 Período de Análisis")
+            periodo_tipo = st.radio(
+                "Tipo de período:",
+                ["Últimos 13 meses", "Último trimestre", "Año completo", "Personalizado"],
+                index=0,
+                key="periodo_tipo_hero"
             )
         
-    with col_f3:
-        st.markdown("#### 📊 Vista Rápida")
-        vista_rapida = st.multiselect(
-            "Mostrar secciones:",
-            ["KPIs", "Gráficas", "Tablas", "Heatmap", "Waterfall"],
-            default=["KPIs", "Gráficas"],
-            key="vista_rapida_hero"
-        )
+        with col_f2:
+            st.markdown("#### 💰 Rango de Ventas")
+            if not df_kpi.empty:
+                max_venta = float(df_kpi[_ventas_col(ventas_con_iva)].sum() * 1.2)
+                rango_ventas = st.slider(
+                    "Filtrar por rango:",
+                    0.0, max_venta,
+                    (0.0, max_venta),
+                    key="rango_ventas_hero"
+                )
+        
+        with col_f3:
+            st.markdown("#### 📊 Vista Rápida")
+            vista_rapida = st.multiselect(
+                "Mostrar secciones:",
+                ["KPIs", "Gráficas", "Tablas", "Heatmap", "Waterfall"],
+                default=["KPIs", "Gráficas"],
+                key="vista_rapida_hero"
+            )
 
-# ============================================================
-# SECCIÓN DE KPIs MEJORADOS CON SPARKLINES
-# ============================================================
+    # ============================================================
+    # SECCIÓN DE KPIs MEJORADOS CON SPARKLINES
+    # ============================================================
 
-st.markdown("### 📊 Indicadores Clave con Tendencia")
+    st.markdown("### 📊 Indicadores Clave con Tendencia")
 
-# Obtener datos históricos para sparklines (últimos 6 meses)
-if not ms_cur.empty:
-    ultimos_meses = ms_cur.tail(6)
-    sparkline_ventas = ultimos_meses['Ventas_Total'].tolist()
-    sparkline_utilidad = ultimos_meses['Utilidad'].tolist()
-    sparkline_txns = ultimos_meses['TXNS'].tolist()
-    sparkline_margen = ultimos_meses['Margen'].tolist()
-else:
-    sparkline_ventas = sparkline_utilidad = sparkline_txns = sparkline_margen = []
-
-# Calcular color de tendencia
-y_sales = (k_cur["ventas"] - k_prev["ventas"]) / k_prev["ventas"] if k_prev["ventas"] > 0 else 0
-trend_color_ventas = "#10B981" if y_sales >= 0 else "#EF4444"
-
-y_profit = (k_cur["utilidad"] - k_prev["utilidad"]) / k_prev["utilidad"] if k_prev["utilidad"] > 0 else 0
-trend_color_utilidad = "#10B981" if y_profit >= 0 else "#EF4444"
-
-# KPIs con sparklines en 4 columnas
-kpi_cols = st.columns(4)
-
-with kpi_cols[0]:
-    cls, txt = _pill_pct(y_sales)
-    kpi_card_with_sparkline(
-        "💰 VENTAS TOTALES" + (" (CON IVA)" if ventas_con_iva else " (SIN IVA)"),
-        money_fmt(k_cur["ventas"]),
-        txt, cls,
-        sparkline_ventas,
-        trend_color_ventas
-    )
+    # Obtener datos históricos para sparklines (últimos 6 meses)
+    if not ms_cur.empty:
+        ultimos_meses = ms_cur.tail(6)
+        sparkline_ventas = ultimos_meses['Ventas_Total'].tolist()
+        sparkline_utilidad = ultimos_meses['Utilidad'].tolist()
+        sparkline_txns = ultimos_meses['TXNS'].tolist()
+        sparkline_margen = ultimos_meses['Margen'].tolist()
+    else:
+        sparkline_ventas = sparkline_utilidad = sparkline_txns = sparkline_margen = []
 
-with kpi_cols[1]:
-    cls, txt = _pill_pct(y_profit)
-    kpi_card_with_sparkline(
-        "📈 UTILIDAD TOTAL",
-        money_fmt(k_cur["utilidad"]),
-        txt, cls,
-        sparkline_utilidad,
-        trend_color_utilidad
-    )
+    # Calcular color de tendencia
+    y_sales = (k_cur["ventas"] - k_prev["ventas"]) / k_prev["ventas"] if k_prev["ventas"] > 0 else 0
+    trend_color_ventas = "#10B981" if y_sales >= 0 else "#EF4444"
 
-with kpi_cols[2]:
-    d_margin_pp = (k_cur["margen"] - k_prev["margen"]) if pd.notna(k_cur["margen"]) and pd.notna(k_prev["margen"]) else 0
-    cls, txt = _pill_pp(d_margin_pp)
-    kpi_card_with_sparkline(
-        "🎯 MARGEN",
-        pct_fmt(k_cur["margen"]) if pd.notna(k_cur["margen"]) else "—",
-        txt, cls,
-        sparkline_margen,
-        "#10B981"
-    )
+    y_profit = (k_cur["utilidad"] - k_prev["utilidad"]) / k_prev["utilidad"] if k_prev["utilidad"] > 0 else 0
+    trend_color_utilidad = "#10B981" if y_profit >= 0 else "#EF4444"
 
-with kpi_cols[3]:
-    y_txns = (k_cur["txns"] - k_prev["txns"]) / k_prev["txns"] if k_prev["txns"] > 0 else 0
-    cls, txt = _pill_pct(y_txns)
-    kpi_card_with_sparkline(
-        "🔄 TRANSACCIONES",
-        num_fmt(k_cur["txns"]),
-        txt, cls,
-        sparkline_txns,
-        "#10B981" if y_txns >= 0 else "#EF4444"
-    )
+    # KPIs con sparklines en 4 columnas
+    kpi_cols = st.columns(4)
 
-# ============================================================
-# HEATMAP DE RENDIMIENTO MENSUAL
-# ============================================================
+    with kpi_cols[0]:
+        cls, txt = _pill_pct(y_sales)
+        kpi_card_with_sparkline(
+            "💰 VENTAS TOTALES" + (" (CON IVA)" if ventas_con_iva else " (SIN IVA)"),
+            money_fmt(k_cur["ventas"]),
+            txt, cls,
+            sparkline_ventas,
+            trend_color_ventas
+        )
 
-if "Heatmap" in vista_rapida or not 'vista_rapida' in locals():
-    st.markdown("---")
-    if not ms_cur.empty:
-        fig_heatmap = create_heatmap_performance(ms_cur)
-        st.plotly_chart(fig_heatmap, use_container_width=True)
+    with kpi_cols[1]:
+        cls, txt = _pill_pct(y_profit)
+        kpi_card_with_sparkline(
+            "📈 UTILIDAD TOTAL",
+            money_fmt(k_cur["utilidad"]),
+            txt, cls,
+            sparkline_utilidad,
+            trend_color_utilidad
+        )
 
-# ============================================================
-# GRÁFICAS COMPARATIVAS LADO A LADO
-# ============================================================
+    with kpi_cols[2]:
+        d_margin_pp = (k_cur["margen"] - k_prev["margen"]) if pd.notna(k_cur["margen"]) and pd.notna(k_prev["margen"]) else 0
+        cls, txt = _pill_pp(d_margin_pp)
+        kpi_card_with_sparkline(
+            "🎯 MARGEN",
+            pct_fmt(k_cur["margen"]) if pd.notna(k_cur["margen"]) else "—",
+            txt, cls,
+            sparkline_margen,
+            "#10B981"
+        )
 
-if "Gráficas" in vista_rapida or not 'vista_rapida' in locals():
-    st.markdown("---")
-    st.markdown("### 📊 Análisis Comparativo")
-    
-    comp_cols = st.columns(2)
-    
-    # GAUGES DE MARGEN Y UTILIDAD
-    with comp_cols[0]:
-        if pd.notna(k_cur["margen"]):
-            fig_gauge_margen = create_gauge_chart(
-                k_cur["margen"],
-                0.5,  # Max 50%
-                "Margen de Utilidad",
-                0.25  # Threshold 25%
-            )
-            st.plotly_chart(fig_gauge_margen, use_container_width=True)
+    with kpi_cols[3]:
+        y_txns = (k_cur["txns"] - k_prev["txns"]) / k_prev["txns"] if k_prev["txns"] > 0 else 0
+        cls, txt = _pill_pct(y_txns)
+        kpi_card_with_sparkline(
+            "🔄 TRANSACCIONES",
+            num_fmt(k_cur["txns"]),
+            txt, cls,
+            sparkline_txns,
+            "#10B981" if y_txns >= 0 else "#EF4444"
+        )
+
+    # ============================================================
+    # HEATMAP DE RENDIMIENTO MENSUAL
+    # ============================================================
+
+    if "Heatmap" in vista_rapida or not 'vista_rapida' in locals():
+        st.markdown("---")
+        if not ms_cur.empty:
+            fig_heatmap = create_heatmap_performance(ms_cur)
+            st.plotly_chart(fig_heatmap, use_container_width=True)
+
+    # ============================================================
+    # GRÁFICAS COMPARATIVAS LADO A LADO
+    # ============================================================
+
+    if "Gráficas" in vista_rapida or not 'vista_rapida' in locals():
+        st.markdown("---")
+        st.markdown("### 📊 Análisis Comparativo")
+    
+        comp_cols = st.columns(2)
+    
+        # GAUGES DE MARGEN Y UTILIDAD
+        with comp_cols[0]:
+            if pd.notna(k_cur["margen"]):
+                fig_gauge_margen = create_gauge_chart(
+                    k_cur["margen"],
+                    0.5,  # Max 50%
+                    "Margen de Utilidad",
+                    0.25  # Threshold 25%
+                )
+                st.plotly_chart(fig_gauge_margen, use_container_width=True)
     
-    # WATERFALL DE UTILIDAD
-    with comp_cols[1]:
-        fig_waterfall = create_waterfall_chart(k_cur, k_prev)
-        st.plotly_chart(fig_waterfall, use_container_width=True)
+        # WATERFALL DE UTILIDAD
+        with comp_cols[1]:
+            fig_waterfall = create_waterfall_chart(k_cur, k_prev)
+            st.plotly_chart(fig_waterfall, use_container_width=True)
 
-# ============================================================
-# BULLET CHARTS DE OBJETIVOS
-# ============================================================
+    # ============================================================
+    # BULLET CHARTS DE OBJETIVOS
+    # ============================================================
 
-st.markdown("---")
-st.markdown("### 🎯 Progreso vs Objetivos")
+    st.markdown("---")
+    st.markdown("### 🎯 Progreso vs Objetivos")
 
-# Calcular objetivos (10% más que año anterior)
-objetivo_ventas = k_prev["ventas"] * 1.10
-objetivo_utilidad = k_prev["utilidad"] * 1.10
-objetivo_txns = k_prev["txns"] * 1.05
+    # Calcular objetivos (10% más que año anterior)
+    objetivo_ventas = k_prev["ventas"] * 1.10
+    objetivo_utilidad = k_prev["utilidad"] * 1.10
+    objetivo_txns = k_prev["txns"] * 1.05
 
-bullet_cols = st.columns(3)
+    bullet_cols = st.columns(3)
 
-with bullet_cols[0]:
-    st.markdown(
-        create_bullet_chart(k_cur["ventas"], objetivo_ventas, "Ventas vs Objetivo (+10% YoY)"),
-        unsafe_allow_html=True
-    )
+    with bullet_cols[0]:
+        st.markdown(
+            create_bullet_chart(k_cur["ventas"], objetivo_ventas, "Ventas vs Objetivo (+10% YoY)"),
+            unsafe_allow_html=True
+        )
 
-with bullet_cols[1]:
-    st.markdown(
-        create_bullet_chart(k_cur["utilidad"], objetivo_utilidad, "Utilidad vs Objetivo (+10% YoY)"),
-        unsafe_allow_html=True
-    )
+    with bullet_cols[1]:
+        st.markdown(
+            create_bullet_chart(k_cur["utilidad"], objetivo_utilidad, "Utilidad vs Objetivo (+10% YoY)"),
+            unsafe_allow_html=True
+        )
 
-with bullet_cols[2]:
-    st.markdown(
-        create_bullet_chart(k_cur["txns"], objetivo_txns, "Transacciones vs Objetivo (+5% YoY)"),
-        unsafe_allow_html=True
-    )
+    with bullet_cols[2]:
+        st.markdown(
+            create_bullet_chart(k_cur["txns"], objetivo_txns, "Transacciones vs Objetivo (+5% YoY)"),
+            unsafe_allow_html=True
+        )
 
-# ============================================================
-# SEPARADOR ANTES DEL CONTENIDO ORIGINAL
-# ============================================================
+    # ============================================================
+    # SEPARADOR ANTES DEL CONTENIDO ORIGINAL
+    # ============================================================
 
-st.markdown("---")
-st.markdown("## 📋 Dashboard Detallado")
-st.markdown("*Vista completa con todas las métricas y análisis*")
+    st.markdown("---")
+    st.markdown("## 📋 Dashboard Detallado")
+    st.markdown("*Vista completa con todas las métricas y análisis*")
 
 # ============================================================
 # FUNCIONES DE ANÁLISIS INTELIGENTE Y RESUMEN EJECUTIVO
 # ============================================================
 
-def analizar_cambios_yoy(k_cur: dict, k_prev: dict, ms_cur: pd.DataFrame, ms_prev: pd.DataFrame) -> dict:
-    """
-    Analiza cambios YoY y determina posibles causas
-    """
-    analisis = {
-        'cambio_ventas': 0,
-        'cambio_utilidad': 0,
-        'cambio_margen': 0,
-        'causas_identificadas': [],
-        'alertas': [],
-        'recomendaciones': []
-    }
-    
-    # Calcular cambios
-    if k_prev["ventas"] > 0:
-        analisis['cambio_ventas'] = ((k_cur["ventas"] - k_prev["ventas"]) / k_prev["ventas"]) * 100
-    
-    if k_prev["utilidad"] > 0:
-        analisis['cambio_utilidad'] = ((k_cur["utilidad"] - k_prev["utilidad"]) / k_prev["utilidad"]) * 100
-    
-    if pd.notna(k_prev["margen"]) and pd.notna(k_cur["margen"]):
-        analisis['cambio_margen'] = (k_cur["margen"] - k_prev["margen"]) * 100
-    
-    # ANÁLISIS DE CAUSAS
-    
-    # 1. Ventas bajaron pero utilidad subió = Mejora de margen
-    if analisis['cambio_ventas'] < 0 and analisis['cambio_utilidad'] > 0:
-        analisis['causas_identificadas'].append({
-            'tipo': 'positivo',
-            'titulo': '💰 Mejora de Rentabilidad',
-            'descripcion': f"Aunque las ventas bajaron {abs(analisis['cambio_ventas']):.1f}%, la utilidad subió {analisis['cambio_utilidad']:.1f}%. Esto indica mejor margen de ganancia."
-        })
-        analisis['recomendaciones'].append("✅ Mantener la estrategia actual de productos más rentables")
-    
-    # 2. Ventas subieron pero utilidad bajó = Problema de margen
-    elif analisis['cambio_ventas'] > 0 and analisis['cambio_utilidad'] < 0:
-        analisis['causas_identificadas'].append({
-            'tipo': 'alerta',
-            'titulo': '⚠️ Crecimiento No Rentable',
-            'descripcion': f"Las ventas subieron {analisis['cambio_ventas']:.1f}% pero la utilidad bajó {abs(analisis['cambio_utilidad']):.1f}%. Posible exceso de descuentos o cambio a productos menos rentables."
-        })
-        analisis['alertas'].append("⚠️ Revisar política de descuentos")
-        analisis['recomendaciones'].append("🔍 Analizar mix de productos vendidos vs año anterior")
-    
-    # 3. Ambos bajaron = Problema general
-    elif analisis['cambio_ventas'] < 0 and analisis['cambio_utilidad'] < 0:
-        if abs(analisis['cambio_utilidad']) > abs(analisis['cambio_ventas']) * 1.5:
-            analisis['causas_identificadas'].append({
-                'tipo': 'critico',
-                'titulo': '🚨 Caída Acelerada de Utilidad',
-                'descripcion': f"Ventas bajaron {abs(analisis['cambio_ventas']):.1f}% pero utilidad cayó {abs(analisis['cambio_utilidad']):.1f}%. El margen está empeorando."
-            })
-            analisis['alertas'].append("🚨 Urgente: Revisar estructura de costos")
-        else:
-            analisis['causas_identificadas'].append({
-                'tipo': 'neutral',
-                'titulo': '📉 Disminución Proporcional',
-                'descripcion': f"Ventas y utilidad bajaron proporcionalmente ({abs(analisis['cambio_ventas']):.1f}% y {abs(analisis['cambio_utilidad']):.1f}%). El margen se mantiene."
-            })
-    
-    # 4. Ambos subieron = Éxito
-    elif analisis['cambio_ventas'] > 0 and analisis['cambio_utilidad'] > 0:
-        if analisis['cambio_utilidad'] > analisis['cambio_ventas'] * 1.2:
-            analisis['causas_identificadas'].append({
-                'tipo': 'excelente',
-                'titulo': '🎉 Crecimiento Acelerado',
-                'descripcion': f"Ventas subieron {analisis['cambio_ventas']:.1f}% y utilidad {analisis['cambio_utilidad']:.1f}%. El margen está mejorando."
-            })
-            analisis['recomendaciones'].append("✅ Identificar qué productos están impulsando este crecimiento")
-        else:
-            analisis['causas_identificadas'].append({
-                'tipo': 'positivo',
-                'titulo': '📈 Crecimiento Saludable',
-                'descripcion': f"Ventas y utilidad crecieron en línea ({analisis['cambio_ventas']:.1f}% y {analisis['cambio_utilidad']:.1f}%)."
-            })
-    
-    # Análisis de transacciones vs ticket
-    if k_prev["txns"] > 0:
-        cambio_txns = ((k_cur["txns"] - k_prev["txns"]) / k_prev["txns"]) * 100
-        cambio_ticket = ((k_cur["ticket"] - k_prev["ticket"]) / k_prev["ticket"]) * 100 if k_prev["ticket"] > 0 else 0
-        
-        if cambio_txns < -10:
-            analisis['alertas'].append(f"⚠️ Transacciones cayeron {abs(cambio_txns):.1f}% - Menos clientes")
-            analisis['recomendaciones'].append("📢 Considerar campaña de atracción de clientes")
-        
-        if cambio_ticket > 15:
-            analisis['causas_identificadas'].append({
-                'tipo': 'positivo',
-                'titulo': '💳 Ticket Promedio Alto',
-                'descripcion': f"El ticket promedio subió {cambio_ticket:.1f}%. Los clientes están comprando más por visita."
-            })
-    
-    return analisis
 
 
 def crear_resumen_ejecutivo(df_kpi: pd.DataFrame, k_cur: dict, k_prev: dict, 
@@ -4168,7 +3284,7 @@ def crear_resumen_ejecutivo(df_kpi: pd.DataFrame, k_cur: dict, k_prev: dict,
         vendedores = df_kpi.groupby("Vendedor_Nombre", observed=True).agg({
             ventas_col: 'sum',
             'Utilidad': 'sum',
-            'DOC_KEY': 'nunique'
+            'DOC_ID': 'nunique'
         }).reset_index()
         
         vendedores.columns = ['Vendedor', 'Ventas', 'Utilidad', 'Transacciones']
@@ -4259,7 +3375,7 @@ def crear_resumen_ejecutivo(df_kpi: pd.DataFrame, k_cur: dict, k_prev: dict,
             top_articulos_ventas = df_kpi.groupby("Articulo", observed=True).agg({
                 ventas_col: 'sum',
                 'Utilidad': 'sum',
-                'DOC_KEY': 'nunique'
+                'DOC_ID': 'nunique'
             }).reset_index()
             
             top_articulos_ventas.columns = ['Artículo', 'Ventas', 'Utilidad', 'Transacciones']
@@ -4281,7 +3397,7 @@ def crear_resumen_ejecutivo(df_kpi: pd.DataFrame, k_cur: dict, k_prev: dict,
             top_articulos_utilidad = df_kpi.groupby("Articulo", observed=True).agg({
                 ventas_col: 'sum',
                 'Utilidad': 'sum',
-                'DOC_KEY': 'nunique'
+                'DOC_ID': 'nunique'
             }).reset_index()
             
             top_articulos_utilidad.columns = ['Artículo', 'Ventas', 'Utilidad', 'Transacciones']
@@ -4304,7 +3420,7 @@ def crear_resumen_ejecutivo(df_kpi: pd.DataFrame, k_cur: dict, k_prev: dict,
             top_marcas = df_kpi.groupby("Marca_Nombre", observed=True).agg({
                 ventas_col: 'sum',
                 'Utilidad': 'sum',
-                'DOC_KEY': 'nunique'
+                'DOC_ID': 'nunique'
             }).reset_index()
             
             top_marcas.columns = ['Marca', 'Ventas', 'Utilidad', 'Transacciones']
@@ -4326,7 +3442,7 @@ def crear_resumen_ejecutivo(df_kpi: pd.DataFrame, k_cur: dict, k_prev: dict,
             top_familias = df_kpi.groupby("Familia_Nombre", observed=True).agg({
                 ventas_col: 'sum',
                 'Utilidad': 'sum',
-                'DOC_KEY': 'nunique'
+                'DOC_ID': 'nunique'
             }).reset_index()
             
             top_familias.columns = ['Familia', 'Ventas', 'Utilidad', 'Transacciones']
@@ -4349,10 +3465,29 @@ def crear_resumen_ejecutivo(df_kpi: pd.DataFrame, k_cur: dict, k_prev: dict,
 # CARGA DE DATOS COMPARTIDA
 # ============================================================
 def get_dashboard_data():
-    if "df_all" not in st.session_state:
-        df_all, years, familias, marcas = load_all()
-        st.session_state.df_all = df_all
-        st.session_state.years = years
-        st.session_state.familias = familias
-        st.session_state.marcas = marcas
+    ds = dataset_actual()
+    if st.session_state.get("dataset_version") != ds.version:
+        # versión nueva publicada por el refresco: la sesión se pasa a ella en este rerun
+        st.session_state.dataset_version = ds.version
+        st.session_state.df_all = ds.df_all
+        st.session_state.years = ds.years
+        st.session_state.familias = ds.familias
+        st.session_state.marcas = ds.marcas
     return st.session_state.df_all, st.session_state.years, st.session_state.familias, st.session_state.marcas
+
+
+# ============================================================
+# ARRANQUE DE PÁGINA
+# ============================================================
+def iniciar_pagina() -> Periodo:
+    """
+    Estilos + sidebar de filtros en cada rerun de la página. Devuelve el
+    Periodo de la selección: cada página lee solo los datos y agregados que
+    dibuja (se calculan al pedirlos).
+    """
+    aplicar_estilos()
+    ds = dataset_actual()
+    return Periodo(ds.df_all, sidebar_filtros(ds), ds.version)
+
+
+registrar_import("utils", _T0_UTILS)